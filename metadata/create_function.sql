@@ -85,7 +85,24 @@ AS $function$
   limit match_count;
 $function$
 
-CREATE OR REPLACE FUNCTION public.match_documents_chunks_smk4_bm25_ngram(query text, match_count integer)
+-- BM25(ngram) 검색: vector_filtered 와 같은 필터 인자 (src/rag/filters.py to_rpc_params, NULL이면 미적용)
+-- - 필터를 RPC 안에서 적용 → 한 사업만 고른 경우에도 match_count 개를 그 사업 안에서 채움
+-- - 인자가 바뀌었으므로 이전 시그니처(query, match_count)는 먼저 삭제 (같은 이름 오버로드 모호성 방지)
+DROP FUNCTION IF EXISTS public.match_documents_chunks_smk4_bm25_ngram(text, integer);
+CREATE OR REPLACE FUNCTION public.match_documents_chunks_smk4_bm25_ngram(
+  query text,
+  match_count integer,
+  filter_announcement_id text DEFAULT NULL,
+  filter_source_file text DEFAULT NULL,
+  filter_project_name text DEFAULT NULL,
+  filter_ordering_agency text DEFAULT NULL,
+  filter_depth_1 text DEFAULT NULL,
+  filter_depth_2 text DEFAULT NULL,
+  filter_budget_min bigint DEFAULT NULL,
+  filter_budget_max bigint DEFAULT NULL,
+  filter_bid_end_from timestamp with time zone DEFAULT NULL,
+  filter_bid_end_to timestamp with time zone DEFAULT NULL
+)
  RETURNS TABLE(chunk_id uuid, announcement_id text, announcement_round integer, project_name text, project_budget bigint, ordering_agency text, published_at text, bid_start_at text, bid_end_at text, text text, source_file text, file_type text, length integer, metadata jsonb, score double precision)
  LANGUAGE sql
  STABLE
@@ -122,7 +139,93 @@ FROM public.documents_chunks_smk_4 d
 CROSS JOIN q
 WHERE to_tsvector('simple', d.ngram_text)
       @@ to_tsquery('simple', q.tsquery)
+  AND (filter_announcement_id IS NULL OR d.announcement_id = filter_announcement_id)
+  AND (filter_source_file IS NULL OR d.source_file = filter_source_file)
+  AND (filter_project_name IS NULL OR d.project_name = filter_project_name)
+  AND (filter_ordering_agency IS NULL OR d.ordering_agency = filter_ordering_agency)
+  AND (filter_depth_1 IS NULL OR d.metadata->'path'->>0 = filter_depth_1)
+  AND (filter_depth_2 IS NULL OR d.metadata->'path'->>1 = filter_depth_2)
+  AND (filter_budget_min IS NULL OR d.project_budget >= filter_budget_min)
+  AND (filter_budget_max IS NULL OR d.project_budget <= filter_budget_max)
+  AND (filter_bid_end_from IS NULL OR d.bid_end_at >= filter_bid_end_from)
+  AND (filter_bid_end_to IS NULL OR d.bid_end_at <= filter_bid_end_to)
 ORDER BY score DESC
 LIMIT match_count;
 $function$
 
+
+----------------------------------------------------------------------------------------------
+-- 메타데이터 필터 검색 (src/rag/filters.py / db.Supabase.query(filters=...))
+-- - 필터 인자는 모두 선택(NULL이면 미적용), depth는 metadata.path [depth_1, depth_2]
+-- - 필터가 있으면 btree 인덱스로 후보를 먼저 줄인 뒤(MATERIALIZED) 정확 거리 계산
+--   → ivfflat 후필터링으로 결과가 match_count보다 적게 나오는 문제 방지
+-- - 필터가 없으면 ivfflat 인덱스 검색 (probes 로 정확도/속도 조절)
+-- - db.Supabase.query 는 필터 유무와 관계없이 이 함수만 호출 (두 분기 모두 사용)
+-- - 테이블: RAG_CHUNKS_TABLE(src/rag/chunk_table.py) 와 같아야 함, BM25 는 같은 테이블의 match_documents_chunks_smk4_bm25_ngram
+--   다른 테이블을 쓰려면 같은 이름 규칙(match_<테이블>_vector_filtered / _bm25_ngram)으로 함수 생성
+CREATE OR REPLACE FUNCTION public.match_documents_chunks_smk4_vector_filtered(
+  query_embedding vector,
+  match_threshold double precision,
+  match_count integer,
+  filter_announcement_id text DEFAULT NULL,
+  filter_source_file text DEFAULT NULL,
+  filter_project_name text DEFAULT NULL,
+  filter_ordering_agency text DEFAULT NULL,
+  filter_depth_1 text DEFAULT NULL,
+  filter_depth_2 text DEFAULT NULL,
+  filter_budget_min bigint DEFAULT NULL,
+  filter_budget_max bigint DEFAULT NULL,
+  filter_bid_end_from timestamp with time zone DEFAULT NULL,
+  filter_bid_end_to timestamp with time zone DEFAULT NULL,
+  probes integer DEFAULT 10
+)
+ RETURNS TABLE(chunk_id uuid, announcement_id text, announcement_round integer, project_name text, project_budget bigint, ordering_agency text, published_at timestamp with time zone, bid_start_at timestamp with time zone, bid_end_at timestamp with time zone, text text, length integer, source_file text, file_type text, metadata jsonb, score double precision)
+ LANGUAGE plpgsql
+ STABLE
+AS $function$
+BEGIN
+  IF filter_announcement_id IS NULL AND filter_source_file IS NULL
+     AND filter_project_name IS NULL AND filter_ordering_agency IS NULL
+     AND filter_depth_1 IS NULL AND filter_depth_2 IS NULL
+     AND filter_budget_min IS NULL AND filter_budget_max IS NULL
+     AND filter_bid_end_from IS NULL AND filter_bid_end_to IS NULL THEN
+    PERFORM set_config('ivfflat.probes', probes::text, true);
+    RETURN QUERY
+    select
+      d.chunk_id, d.announcement_id, d.announcement_round, d.project_name, d.project_budget, d.ordering_agency,
+      d.published_at, d.bid_start_at, d.bid_end_at, d.text, d.length, d.source_file, d.file_type, d.metadata,
+      (1 - (d.embedding <=> query_embedding))::double precision as score
+    from public.documents_chunks_smk_4 d
+    where d.embedding is not null
+      and (1 - (d.embedding <=> query_embedding)) >= match_threshold
+    order by (d.embedding <=> query_embedding) asc
+    limit match_count;
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  with candidates as materialized (
+    select *
+    from public.documents_chunks_smk_4 c
+    where c.embedding is not null
+      and (filter_announcement_id is null or c.announcement_id = filter_announcement_id)
+      and (filter_source_file is null or c.source_file = filter_source_file)
+      and (filter_project_name is null or c.project_name = filter_project_name)
+      and (filter_ordering_agency is null or c.ordering_agency = filter_ordering_agency)
+      and (filter_depth_1 is null or c.metadata->'path'->>0 = filter_depth_1)
+      and (filter_depth_2 is null or c.metadata->'path'->>1 = filter_depth_2)
+      and (filter_budget_min is null or c.project_budget >= filter_budget_min)
+      and (filter_budget_max is null or c.project_budget <= filter_budget_max)
+      and (filter_bid_end_from is null or c.bid_end_at >= filter_bid_end_from)
+      and (filter_bid_end_to is null or c.bid_end_at <= filter_bid_end_to)
+  )
+  select
+    d.chunk_id, d.announcement_id, d.announcement_round, d.project_name, d.project_budget, d.ordering_agency,
+    d.published_at, d.bid_start_at, d.bid_end_at, d.text, d.length, d.source_file, d.file_type, d.metadata,
+    (1 - (d.embedding <=> query_embedding))::double precision as score
+  from candidates d
+  where (1 - (d.embedding <=> query_embedding)) >= match_threshold
+  order by (d.embedding <=> query_embedding) asc
+  limit match_count;
+END;
+$function$
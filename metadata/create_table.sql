@@ -85,4 +85,10 @@ create index IF not exists documents_chunks_smk_4_ordering_agency_idx on public.
 
 create index IF not exists documents_chunks_smk_4_project_name_idx on public.documents_chunks_smk_4 using btree (project_name) TABLESPACE pg_default;
 
-create index IF not exists documents_chunks_smk_4_announcement_id_idx on public.documents_chunks_smk_4 using btree (announcement_id) TABLESPACE pg_default;
\ No newline at end of file
+create index IF not exists documents_chunks_smk_4_announcement_id_idx on public.documents_chunks_smk_4 using btree (announcement_id) TABLESPACE pg_default;
+-- 필터 검색(match_documents_chunks_smk4_vector_filtered)용 depth / 범위 인덱스
+create index IF not exists documents_chunks_smk_4_depth_idx on public.documents_chunks_smk_4 using btree ((metadata->'path'->>0), (metadata->'path'->>1)) TABLESPACE pg_default;
+
+create index IF not exists documents_chunks_smk_4_bid_end_at_idx on public.documents_chunks_smk_4 using btree (bid_end_at) TABLESPACE pg_default;
+
+create index IF not exists documents_chunks_smk_4_source_file_idx on public.documents_chunks_smk_4 using btree (source_file) TABLESPACE pg_default;
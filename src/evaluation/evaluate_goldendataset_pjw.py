@@ -7,6 +7,8 @@
 # 작성이력 :       
 #                 2025.12.18 오민경 최초작성
 #                 2025.12.28 BM25 n-gram 검색 함수 반영(or연산), or 연산으로 timeout시 에러 무시 기능 추가(vector검색만 진행)
+#                 Kiwi 는 공용 tokenizer(src/retrieval/korean_tokenizer.py) 사용: import 시 로드하지 않고 실행 전 warmup
+#                 bge_rerank 를 공용 리랭크 서비스(src/rag/rerank/rerank_service.py)로 변경: 캐시에 없는 쌍만 계산
 #==================================================================
 import json
 import os
@@ -19,14 +21,14 @@ from supabase import create_client
 from tqdm import tqdm
 
 import torch
-from sentence_transformers import CrossEncoder
 
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableLambda
 
 from postgrest.exceptions import APIError
-from kiwipiepy import Kiwi
+from src.rag.rerank.rerank_service import get_rerank_service
+from src.retrieval.korean_tokenizer import get_tokenizer
 
 # ==================================================
 # 0. 환경 로드 + LangSmith 설정
@@ -58,7 +60,7 @@ RERANKER_MODEL = os.getenv(
     "dragonkue/bge-reranker-v2-m3-ko"
 )
 device = "cuda" if torch.cuda.is_available() else "cpu"
-reranker = CrossEncoder(RERANKER_MODEL, device=device)
+reranker = get_rerank_service(RERANKER_MODEL, device=device)  # 점수 캐시 (디스크 캐시로 재실행 시 재사용)
 
 
 # ==================================================
@@ -125,28 +127,13 @@ def vector_search_fn(
     return docs
 
 
-kiwi = Kiwi()
-
 def extract_nouns_query(question: str) -> str:
     """
-    Kiwi 기반 명사 추출 (BM25 n-gram 질의용)
+    Kiwi 기반 명사 추출 (BM25 n-gram 질의용, korean_tokenizer.py 공용 분석기 + 캐시)
     - NN*, NNP, NNB 포함
     - 1글자 토큰 제거
     """
-    if not question:
-        return ""
-
-    result = kiwi.analyze(question)
-    if not result:
-        return ""
-
-    nouns = [
-        token.form
-        for token in result[0][0]
-        if token.tag.startswith("NN") and len(token.form) > 1
-    ]
-
-    return " ".join(nouns)
+    return get_tokenizer().noun_query(question)
 
 
 def bm25_search_fn(
@@ -216,31 +203,7 @@ def bge_rerank(
     docs: List[Dict[str, Any]],
     k: int = 6
 ) -> List[Dict[str, Any]]:
-    if not docs:
-        return []
-
-    pairs = []
-    kept_docs = []
-
-    for d in docs:
-        text = d.get("text", "").strip()
-        if not text:
-            continue
-        pairs.append((question, text))
-        kept_docs.append(d)
-
-    if not pairs:
-        return []
-
-    scores = reranker.predict(pairs)
-    for d, s in zip(kept_docs, scores):
-        d["rerank_score"] = float(s)
-
-    kept_docs.sort(
-        key=lambda x: x.get("rerank_score", 0.0),
-        reverse=True
-    )
-    return kept_docs[:k]
+    return reranker.rerank(question, docs, top_k=k)
 
 
 # ==================================================
@@ -332,6 +295,7 @@ if __name__ == "__main__":
     with open(GOLDEN_PATH, "r", encoding="utf-8") as f:
         golden_data = json.load(f)
 
+    print(f"Kiwi warmup: {get_tokenizer().warmup():.1f}s")
     results = []
 
     for item in tqdm(golden_data):
@@ -9,12 +9,13 @@ from supabase import create_client
 from tqdm import tqdm
 
 import torch
-from sentence_transformers import CrossEncoder
 
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableLambda
 
+from src.rag.rerank.rerank_service import get_rerank_service
+
 
 # ==================================================
 # 0. 환경 로드 + LangSmith 설정
@@ -46,7 +47,7 @@ RERANKER_MODEL = os.getenv(
     "dragonkue/bge-reranker-v2-m3-ko",
 )
 device = "cuda" if torch.cuda.is_available() else "cpu"
-reranker = CrossEncoder(RERANKER_MODEL, device=device)
+reranker = get_rerank_service(RERANKER_MODEL, device=device)  # 점수 캐시 (디스크 캐시로 재실행 시 재사용)
 
 
 # ==================================================
@@ -153,31 +154,7 @@ def bge_rerank(
     docs: List[Dict[str, Any]],
     k: int = 6,
 ) -> List[Dict[str, Any]]:
-    if not docs:
-        return []
-
-    pairs = []
-    kept_docs = []
-
-    for d in docs:
-        txt = d.get("text", "").strip()
-        if not txt:
-            continue
-        pairs.append((question, txt))
-        kept_docs.append(d)
-
-    if not pairs:
-        return []
-
-    scores = reranker.predict(pairs)
-    for d, s in zip(kept_docs, scores):
-        d["rerank_score"] = float(s)
-
-    kept_docs.sort(
-        key=lambda x: x.get("rerank_score", 0.0),
-        reverse=True,
-    )
-    return kept_docs[:k]
+    return reranker.rerank(question, docs, top_k=k)
 
 
 # ==================================================
@@ -7,6 +7,12 @@
 # 작성이력 :       
 #                 2025.12.18 오민경 최초작성
 #                 2025.12.28 BM25 n-gram 검색 함수 반영(or연산), or 연산으로 timeout시 에러 무시 기능 추가(vector검색만 진행)
+#                 RAG_BACKEND=local 이면 vector 검색을 로컬 인덱스(src/rag/local_index.py)로 수행 (오프라인 평가)
+#                 질문 임베딩은 query_cache로 재사용
+#                 RAG_BACKEND=local 이면 BM25도 로컬 역색인(src/retrieval/bm25_index.py)으로 수행
+#                 vector / BM25 동시 실행 + RRF 융합 (src/retrieval/hybrid_retriever.py), hybrid_merge 대체
+#                 Kiwi 는 공용 tokenizer(src/retrieval/korean_tokenizer.py) 사용: import 시 로드하지 않고 실행 전 warmup
+#                 bge_rerank 를 공용 리랭크 서비스(src/rag/rerank/rerank_service.py)로 변경: 캐시에 없는 쌍만 계산
 #==================================================================
 import json
 import os
@@ -19,14 +25,19 @@ from supabase import create_client
 from tqdm import tqdm
 
 import torch
-from sentence_transformers import CrossEncoder
 
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableLambda
 
 from postgrest.exceptions import APIError
-from kiwipiepy import Kiwi
+
+from src.rag.rerank.rerank_service import get_rerank_service
+from src.rag.embed.query_cache import get_query_cache
+from src.rag.local_index import get_retrieval_backend
+from src.retrieval.bm25_index import get_bm25_index
+from src.retrieval.hybrid_retriever import HybridRetriever
+from src.retrieval.korean_tokenizer import get_tokenizer
 
 # ==================================================
 # 0. 환경 로드 + LangSmith 설정
@@ -41,12 +52,19 @@ os.environ["LANGCHAIN_PROJECT"] = os.getenv("LANGCHAIN_PROJECT", "rfp-rag-eval")
 # ==================================================
 # 1. Supabase / Embedding / LLM / Reranker
 # ==================================================
-supabase = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY"),
-)
+RAG_BACKEND = os.getenv("RAG_BACKEND", "supabase")
+
+# local 백엔드는 DB 없이 동작 (vector / BM25 모두 로컬 인덱스)
+supabase = None
+if RAG_BACKEND != "local":
+    supabase = create_client(
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_SERVICE_KEY"),
+    )
 
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+EMBED_MODEL = "text-embedding-3-small"
+embeddings = OpenAIEmbeddings(model=EMBED_MODEL)
+query_cache = get_query_cache(EMBED_MODEL)
 
 llm = ChatOpenAI(
     model=os.getenv("OPENAI_LLM_MODEL", "gpt-4o-mini"),
@@ -58,7 +76,7 @@ RERANKER_MODEL = os.getenv(
     "dragonkue/bge-reranker-v2-m3-ko"
 )
 device = "cuda" if torch.cuda.is_available() else "cpu"
-reranker = CrossEncoder(RERANKER_MODEL, device=device)
+reranker = get_rerank_service(RERANKER_MODEL, device=device)  # 점수 캐시 (디스크 캐시로 재실행 시 재사용)
 
 
 # ==================================================
@@ -107,46 +125,34 @@ def vector_search_fn(
     top_k: int = 20,
     threshold: float = 0.2
 ) -> List[Dict[str, Any]]:
-    q_emb = embeddings.embed_query(question)
-
-    res = supabase.rpc(
-        VECTOR_RPC,
-        {
-            "query_embedding": q_emb,
-            "match_threshold": threshold,
-            "match_count": top_k,
-        },
-    ).execute()
-
-    docs = res.data or []
+    q_emb = query_cache.get_or_embed(question, embeddings.embed_query)
+
+    if RAG_BACKEND == "local":
+        docs = get_retrieval_backend().query(q_emb, top_k, match_threshold=threshold)
+    else:
+        res = supabase.rpc(
+            VECTOR_RPC,
+            {
+                "query_embedding": q_emb,
+                "match_threshold": threshold,
+                "match_count": top_k,
+            },
+        ).execute()
+        docs = res.data or []
+
     for d in docs:
         d["source"] = "vector"
         d["vector_score"] = float(d.get("score", 0.0))
     return docs
 
 
-kiwi = Kiwi()
-
 def extract_nouns_query(question: str) -> str:
     """
-    Kiwi 기반 명사 추출 (BM25 n-gram 질의용)
+    Kiwi 기반 명사 추출 (BM25 n-gram 질의용, korean_tokenizer.py 공용 분석기 + 캐시)
     - NN*, NNP, NNB 포함
     - 1글자 토큰 제거
     """
-    if not question:
-        return ""
-
-    result = kiwi.analyze(question)
-    if not result:
-        return ""
-
-    nouns = [
-        token.form
-        for token in result[0][0]
-        if token.tag.startswith("NN") and len(token.form) > 1
-    ]
-
-    return " ".join(nouns)
+    return get_tokenizer().noun_query(question)
 
 
 def bm25_search_fn(
@@ -159,15 +165,18 @@ def bm25_search_fn(
         if not noun_query.strip():
             return []
 
-        res = supabase.rpc(
-            BM25_RPC,
-            {
-                "query": noun_query,
-                "match_count": top_k,
-            },
-        ).execute()
+        if RAG_BACKEND == "local":
+            docs = get_bm25_index().search(noun_query, top_k, nouns=noun_query.split())
+        else:
+            res = supabase.rpc(
+                BM25_RPC,
+                {
+                    "query": noun_query,
+                    "match_count": top_k,
+                },
+            ).execute()
+            docs = res.data or []
 
-        docs = res.data or []
         for d in docs:
             d["source"] = "bm25"
             d["bm25_score"] = float(d.get("score", 0.0))
@@ -183,29 +192,14 @@ def bm25_search_fn(
         return []
 
 
-def hybrid_merge(
-    vector_docs: List[Dict[str, Any]],
-    bm25_docs: List[Dict[str, Any]]
-) -> List[Dict[str, Any]]:
-    """
-    chunk_id 기준 병합
-    - vector / bm25 / hybrid 명확히 구분
-    """
-    merged: Dict[str, Dict[str, Any]] = {}
-
-    for d in vector_docs:
-        key = str(d["chunk_id"])
-        merged[key] = d
-
-    for d in bm25_docs:
-        key = str(d["chunk_id"])
-        if key in merged:
-            merged[key]["source"] = "hybrid(vector+bm25)"
-            merged[key]["bm25_score"] = d.get("bm25_score")
-        else:
-            merged[key] = d
+hybrid_retriever = HybridRetriever(
+    vector_fn=lambda q, k, f: vector_search_fn(q, k),
+    bm25_fn=lambda q, k, f: bm25_search_fn(q, k),
+)
 
-    return list(merged.values())
+# vector / bm25 각 20개 후보 → 융합 후 최대 40개를 rerank (기존 union 과 같은 후보 수)
+HYBRID_CANDIDATE_K = 20
+HYBRID_TOP_K = 40
 
 
 # ==================================================
@@ -216,31 +210,7 @@ def bge_rerank(
     docs: List[Dict[str, Any]],
     k: int = 6
 ) -> List[Dict[str, Any]]:
-    if not docs:
-        return []
-
-    pairs = []
-    kept_docs = []
-
-    for d in docs:
-        text = d.get("text", "").strip()
-        if not text:
-            continue
-        pairs.append((question, text))
-        kept_docs.append(d)
-
-    if not pairs:
-        return []
-
-    scores = reranker.predict(pairs)
-    for d, s in zip(kept_docs, scores):
-        d["rerank_score"] = float(s)
-
-    kept_docs.sort(
-        key=lambda x: x.get("rerank_score", 0.0),
-        reverse=True
-    )
-    return kept_docs[:k]
+    return reranker.rerank(question, docs, top_k=k)
 
 
 # ==================================================
@@ -275,29 +245,18 @@ def build_contexts(docs: List[Dict[str, Any]]) -> List[str]:
 # ==================================================
 # 6. LangSmith Runnable Pipeline
 # ==================================================
-def step_vector(x):
-    tqdm.write("    [1/5] Vector 검색")
-    return {**x, "vector_docs": vector_search_fn(x["question"])}
-
-
-def step_bm25(x):
-    tqdm.write("    [2/5] BM25 n-gram OR 검색")
-    return {**x, "bm25_docs": bm25_search_fn(x["question"])}
-
-
-def step_merge(x):
-    tqdm.write("    [3/5] Hybrid merge")
-    return {
-        **x,
-        "merged_docs": hybrid_merge(
-            x["vector_docs"],
-            x["bm25_docs"],
-        ),
-    }
+def step_retrieve(x):
+    tqdm.write("    [1/3] Hybrid 검색 (Vector ∥ BM25 n-gram OR → RRF)")
+    docs, timings = hybrid_retriever.search(x["question"], HYBRID_TOP_K, candidate_k=HYBRID_CANDIDATE_K)
+    tqdm.write(
+        f"          vector {timings['vector_ms'] or 0:.0f}ms / bm25 {timings['bm25_ms'] or 0:.0f}ms"
+        f" / total {timings['total_ms']:.0f}ms"
+    )
+    return {**x, "merged_docs": docs, "retrieval_timings": timings}
 
 
 def step_rerank(x):
-    tqdm.write("    [4/5] BGE rerank")
+    tqdm.write("    [2/3] BGE rerank")
     return {
         **x,
         "reranked_docs": bge_rerank(
@@ -308,7 +267,7 @@ def step_rerank(x):
 
 
 def step_answer(x):
-    tqdm.write("    [5/5] LLM answer")
+    tqdm.write("    [3/3] LLM answer")
     contexts = build_contexts(x["reranked_docs"])
     messages = prompt.format_messages(
         question=x["question"],
@@ -320,9 +279,7 @@ def step_answer(x):
 
 rag_pipeline = (
     RunnableLambda(lambda q: {"question": q})
-    | RunnableLambda(step_vector)
-    | RunnableLambda(step_bm25)
-    | RunnableLambda(step_merge)
+    | RunnableLambda(step_retrieve)
     | RunnableLambda(step_rerank)
     | RunnableLambda(step_answer)
 )
@@ -338,6 +295,7 @@ if __name__ == "__main__":
     with open(GOLDEN_PATH, "r", encoding="utf-8") as f:
         golden_data = json.load(f)
 
+    print(f"Kiwi warmup: {get_tokenizer().warmup():.1f}s")
     results = []
 
     for item in tqdm(golden_data):
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.rag.filters import normalize_filters
+from src.rag.upload_manifest import UPLOAD_MANIFEST_PATH, load_manifest, scope_version
+
+#==============================================
+# 프로그램명: answer_cache.py
+# 폴더위치: src/generation/answer_cache.py
+# 프로그램 설명: 반복 질문용 의미 기반 답변 캐시 (app.py, 적중 시 검색/리랭크/생성 모두 생략)
+#   - 범위(scope): (검색 필터, 생성 백엔드) → 같은 사업/카테고리 + 같은 모델의 답변만 재사용
+#   - 적중: 정규화 질문 임베딩(query_cache.py 와 같은 벡터) cosine >= ANSWER_CACHE_THRESHOLD 중 최고 유사도
+#   - 만료: ANSWER_CACHE_TTL 초, 범위당 ANSWER_CACHE_SCOPE_SIZE 개 / 범위 ANSWER_CACHE_SCOPES 개 LRU
+#   - 무효화: 업로드 매니페스트(src/rag/upload_manifest.py) 버전이 저장 시점과 다르면 폐기
+#     · 사업 필터 → 그 사업 재업로드 시, 전체/카테고리 → 모든 업로드 시, 로컬 인덱스 재구축 → 전체
+#     · 매니페스트는 파일 mtime 이 바뀔 때만 다시 읽음
+#   - get_answer_cache(): 모듈 싱글턴 (Streamlit rerun / 세션 간 공유)
+#===============================================
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(6 * 3600)))
+ANSWER_CACHE_SCOPE_SIZE = int(os.getenv("ANSWER_CACHE_SCOPE_SIZE", "128"))
+ANSWER_CACHE_SCOPES = int(os.getenv("ANSWER_CACHE_SCOPES", "256"))
+
+
+def scope_key(filters: dict | None, backend: str) -> str:
+    return json.dumps([normalize_filters(filters), backend], ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _unit(vec) -> np.ndarray:
+    v = np.asarray(vec, dtype=np.float32)
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+
+class SemanticAnswerCache:
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL,
+                 scope_size: int = ANSWER_CACHE_SCOPE_SIZE, max_scopes: int = ANSWER_CACHE_SCOPES,
+                 manifest_path=UPLOAD_MANIFEST_PATH):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.scope_size = scope_size
+        self.max_scopes = max_scopes
+        self.manifest_path = manifest_path
+        self._scopes = OrderedDict()  # scope key -> [entry, ...] (오래된 순)
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._manifest_mtime = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def _current_manifest(self) -> dict:
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+        except OSError:
+            mtime = None
+        if self._manifest is None or mtime != self._manifest_mtime:
+            self._manifest = load_manifest(self.manifest_path)
+            self._manifest_mtime = mtime
+        return self._manifest
+
+    def _valid_entries(self, key: str, version: tuple) -> list:
+        """만료 / 버전 불일치 항목 정리 후 남은 항목 (lock 보유 상태에서 호출)"""
+        entries = self._scopes.get(key)
+        if not entries:
+            return []
+        now = time.time()
+        alive = [e for e in entries if e["version"] == version and (not self.ttl or now - e["created"] <= self.ttl)]
+        self.invalidated += len(entries) - len(alive)
+        self._scopes[key] = alive
+        return alive
+
+    def lookup(self, query_vec, filters: dict | None, backend: str) -> dict | None:
+        """적중 시 {query, answer, similarity, created, meta, ...} 반환"""
+        key = scope_key(filters, backend)
+        version = scope_version(self._current_manifest(), normalize_filters(filters))
+        with self._lock:
+            entries = self._valid_entries(key, version)
+            if not entries:
+                self.misses += 1
+                return None
+            sims = np.stack([e["vec"] for e in entries]) @ _unit(query_vec)
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+            self._scopes.move_to_end(key)
+            entry = entries[best]
+            entry["hits"] += 1
+            self.hits += 1
+            return {**entry, "similarity": float(sims[best])}
+
+    def put(self, query: str, query_vec, answer: str, filters: dict | None, backend: str, meta: dict | None = None):
+        if not answer:
+            return
+        key = scope_key(filters, backend)
+        version = scope_version(self._current_manifest(), normalize_filters(filters))
+        entry = {
+            "query": query,
+            "vec": _unit(query_vec),
+            "answer": answer,
+            "created": time.time(),
+            "version": version,
+            "hits": 0,
+            "meta": meta or {},
+        }
+        with self._lock:
+            entries = self._valid_entries(key, version)
+            entries.append(entry)
+            del entries[:-self.scope_size]
+            self._scopes[key] = entries
+            self._scopes.move_to_end(key)
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": sum(len(v) for v in self._scopes.values()),
+            "scopes": len(self._scopes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidated": self.invalidated,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticAnswerCache()
+        return _cache
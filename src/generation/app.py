@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import os
 import sys
+import time
 from dotenv import load_dotenv
 
 #==============================================
@@ -13,6 +14,16 @@ from dotenv import load_dotenv
 #          12.23 수정 : 한상준 DB 연동 코드 추가
 #          12.24 수정 : 한상준 rerank 추가
 #          12.29 수정 : src/rag/db.py rerank_model.py embedding_model.py 병합
+#          쿼리 임베딩 캐시 통계 사이드바 표시
+#          사이드바 선택(대분류/중분류/사업)을 검색 필터로 전달 (파이썬 후처리 필터 제거)
+#          Vector + BM25 하이브리드 검색(src/retrieval/hybrid_retriever.py) 적용, 단계별 검색 시간 표시
+#          Kiwi 분석기 초기화 시 warmup (첫 질문 BM25 지연 제거, 프로세스당 1회)
+#          rerank 점수 캐시 통계 사이드바 표시
+#          답변 스트리밍 출력 (model_manager.stream_response → message_placeholder), TTFT / tokens/sec 표시
+#          리랭크 청크를 프롬프트 빌더에서 백엔드별 토큰 예산으로 패킹 (context_packer.py), 패킹 결과 표시
+#          프롬프트 빌더 st.cache_resource 로 프로세스당 1회 생성 (YAML 페르소나 메모리 유지, 변경 시 자동 재로드)
+#          의미 기반 답변 캐시(answer_cache.py): 같은 범위/모델의 반복 질문은 검색·생성 없이 답변, 캐시 통계 사이드바 표시
+#          답변 캐시는 대화 첫 질문에서만 조회/저장 (후속 질문은 이전 대화에 의존)
 #===============================================
 
 # [1. 환경 변수 및 경로 설정]
@@ -30,9 +41,14 @@ if root_dir not in sys.path:
 # [2. 모듈 임포트]
 try:
     from src.prompts.RAGPromptBuilder import RAGPromptBuilder
+    from src.prompts.context_packer import budget_for, get_token_counter, pack_context
     from src.generation.model_manager import ModelManager
+    from src.generation.answer_cache import ANSWER_CACHE_ENABLED, get_answer_cache
     from src.rag.embed.embedding_model import EmbeddingModel
     from src.rag.rerank.rerank_model import RerankModel
+    from src.rag.filters import describe_filters
+    from src.retrieval.hybrid_retriever import HybridRetriever, make_bm25_search, make_vector_search
+    from src.retrieval.korean_tokenizer import get_tokenizer
 except ImportError as e:
     st.error(f"❌ 모듈 임포트 실패: {e}")
     st.stop()
@@ -46,6 +62,10 @@ def load_hierarchical_data():
         st.error("🚨 계층 데이터 파일이 없습니다.")
         return None
 
+@st.cache_resource
+def load_prompt_builder(prompt_dir):
+    return RAGPromptBuilder(prompt_dir)
+
 def main():
     st.set_page_config(page_title="RFP Intelligence Platform", layout="wide", page_icon="🏢")
 
@@ -61,6 +81,12 @@ def main():
     try:
         embedding_model = EmbeddingModel("text-embedding-3-small")
         rerank_model = RerankModel("dragonkue/bge-reranker-v2-m3-ko") # L4 GPU 자동 사용됨
+        retriever = HybridRetriever(
+            vector_fn=make_vector_search(embedding_model, threshold=0.3), # 유사도 0.3 이상만
+            bm25_fn=make_bm25_search(embedding_model.db),
+        )
+        get_tokenizer().warmup() # 이미 로드됐으면 즉시 반환
+        answer_cache = get_answer_cache() # 모듈 싱글턴 (세션 간 공유)
     except Exception as e:
         st.error(f"❌ RAG 모델 초기화 실패: {e}")
         st.stop()
@@ -68,7 +94,7 @@ def main():
     # 프롬프트 빌더 초기화
     try:
         prompt_dir = os.path.join(root_dir, 'src', 'prompts')
-        builder = RAGPromptBuilder(prompt_dir)
+        builder = load_prompt_builder(prompt_dir)
     except:
         st.warning("⚠️ 프롬프트 빌더 초기화 실패. 기본 모드로 동작합니다.")
         builder = None
@@ -105,6 +131,22 @@ def main():
             else:
                 st.error(f"❌ 모델 로드 실패. 경로 확인: {model_path}")
 
+        cache_stats = embedding_model.cache_stats()
+        st.caption(
+            f"쿼리 임베딩 캐시: hit {cache_stats['hits'] + cache_stats['disk_hits']} / "
+            f"miss {cache_stats['misses']} ({cache_stats['hit_rate']:.0%})"
+        )
+        rerank_stats = rerank_model.cache_stats()
+        st.caption(
+            f"Rerank 점수 캐시: hit {rerank_stats['hits'] + rerank_stats['disk_hits']} / "
+            f"miss {rerank_stats['misses']} ({rerank_stats['hit_rate']:.0%})"
+        )
+        answer_stats = answer_cache.stats()
+        st.caption(
+            f"답변 캐시: hit {answer_stats['hits']} / miss {answer_stats['misses']} "
+            f"({answer_stats['hit_rate']:.0%}), 저장 {answer_stats['size']}개"
+        )
+
         st.divider()
         st.header("📂 탐색 필터")
 
@@ -113,8 +155,8 @@ def main():
         selected_d1 = st.selectbox("1단계: 대분류", d1_options)
 
         display_title = ""
-        # ⚠️ 필터링 로직: DB 검색을 위해 '선택된 사업명'을 추적해야 함
-        target_project_name_for_db = "%" # 기본값: 전체 검색
+        # ✅ 검색 필터: 선택한 단계까지 DB/로컬 검색 단계에서 적용
+        search_filters = {} # 기본값: 전체 검색
 
         if selected_d1 == "🔍 전체 데이터 (All RFPs)":
             display_title = "전체 RFP 데이터 종합 분석"
@@ -125,9 +167,13 @@ def main():
             d2_options = ["📂 해당 대분류 전체 종합"] + sorted(df[df['Depth_1'] == selected_d1]['Depth_2'].unique().tolist())
             selected_d2 = st.selectbox("2단계: 중분류", d2_options)
 
+            search_filters["depth_1"] = selected_d1
+
             if selected_d2 == "📂 해당 대분류 전체 종합":
                 display_title = f"[{selected_d1}] 카테고리 전체 분석"
             else:
+                search_filters["depth_2"] = selected_d2
+
                 # --- Depth 3: 프로젝트 ---
                 projects_in_cat = df[(df['Depth_1'] == selected_d1) & (df['Depth_2'] == selected_d2)]
                 proj_options = ["🎁 해당 중분류 전체 종합"] + sorted(projects_in_cat['사업명'].tolist())
@@ -137,7 +183,7 @@ def main():
                     display_title = f"[{selected_d2}] 하위 사업 전체 분석"
                 else:
                     display_title = selected_project
-                    target_project_name_for_db = selected_project # ✅ 특정 사업 선택 시 필터 적용
+                    search_filters = {"project_name": selected_project} # ✅ 특정 사업 선택 시 사업명으로만 필터
 
     # ---------------------------------------------------------
     # [Main] UI 레이아웃
@@ -149,7 +195,7 @@ def main():
         st.subheader(f"📊 {display_title}")
 
         st.info("💡 질문을 입력하면 DB에서 가장 관련성 높은 문서를 찾아 답변합니다.")
-        st.markdown(f"**현재 검색 필터:** `{target_project_name_for_db if target_project_name_for_db != '%' else "전체 범위"}`")
+        st.markdown(f"**현재 검색 필터:** `{describe_filters(search_filters)}`")
 
     with col_chat:
         st.subheader("💬 AI 컨설턴트 질의응답")
@@ -179,84 +225,109 @@ def main():
                     message_placeholder.markdown("⏳ DB 검색 진행 중...")
 
                     try:
-                        # ✅ [수정 1] DB 검색 호출 (Threshold 설정)
-                        # 필터 기능이 없는 함수이므로, 일단 넉넉하게(30~50개) 가져옵니다.
-                        initial_results = embedding_model.search(
-                            query=query, 
-                            result_count=40, # 필터링을 위해 넉넉히 조회
-                            threshold=0.3    # 유사도 0.3 이상만
-                        )
-
-                        for doc in initial_results:
-                            if 'text' in doc:
-                                doc['content'] = doc['text']
-                        
-                        # ✅ [수정 2] 파이썬 레벨에서 필터링 (DB 함수가 지원 안 하므로 수동 처리)
-                        filtered_results = []
-
-                        if target_project_name_for_db == "%":
-                            filtered_results = initial_results
-                        else:
-                            for doc in initial_results:
-                                # 1. DB 테이블의 컬럼('project_name') 직접 확인 (가장 정확)
-                                p_name = doc.get('project_name')
-                                
-                                # 2. 혹시 몰라 메타데이터 안쪽도 확인 (이전 호환성)
-                                if not p_name:
-                                    p_name = doc.get('metadata', {}).get('project_name')
-
-                                # 3. 사이드바에서 선택한 사업명과 비교
-                                # (DB에는 띄어쓰기가 다를 수 있으므로 공백 제거 후 비교하는 게 안전할 수 있음)
-                                if p_name and p_name == target_project_name_for_db:
-                                    filtered_results.append(doc)
-
-                        # (디버깅용) 필터링 전후 개수 확인
-                        st.write(f"검색된 {len(initial_results)}개 중 '{target_project_name_for_db}' 관련 문서 {len(filtered_results)}개 필터링 됨")
-
-                        retrieval_results = filtered_results
-
-                        if not retrieval_results:
-                            combined_context = "조건에 맞는 문서를 찾을 수 없습니다."
+                        # ✅ [0] 답변 캐시 조회: 같은 검색 범위 + 같은 모델에서 거의 같은 질문이면 검색/리랭크/생성 생략
+                        #    저장과 같은 조건(대화 첫 질문)에서만 조회 → 후속 질문은 자기 대화 내역으로 생성
+                        first_turn = len(st.session_state.messages) == 1
+                        query_vec = embedding_model.embed_query(query) if ANSWER_CACHE_ENABLED and first_turn else None
+                        cached = answer_cache.lookup(query_vec, search_filters, source_key) if query_vec else None
+
+                        if cached:
+                            response_text = cached["answer"]
+                            message_placeholder.markdown(response_text)
+                            st.caption(
+                                f"💾 캐시된 답변 (유사 질문: \"{cached['query']}\", 유사도 {cached['similarity']:.3f}, "
+                                f"{(time.time() - cached['created']) / 60:.0f}분 전 생성)"
+                            )
+                            st.session_state.messages.append({"role": "assistant", "content": response_text})
                         else:
-                            # 2. Reranking (상위 3개)
-                            reranked_result_obj = rerank_model.rerank(
-                                query, 
-                                retrieval_results, 
-                                top_k=10
+                            # ✅ [수정 1] Vector + BM25 동시 검색 후 RRF 융합 (사이드바 필터를 검색 단계에서 적용)
+                            retrieval_results, timings = retriever.search(
+                                query,
+                                top_k=20, # 필터 적용 후 융합 상위 20개
+                                filters=search_filters
                             )
-                            combined_context = reranked_result_obj.content
 
-                            # [디버깅] Rerank 점수 및 메타데이터 확인
-                            with st.expander("🔍 Rerank 결과 상세 보기"):
-                                st.text(combined_context)
-
-                        # ✅ 프롬프트 조립
-                        if builder:
-                            final_messages = builder.build_messages(
-                                category=selected_d1 if selected_d1 else "General",
-                                title=display_title,
-                                context=combined_context,
-                                history=st.session_state.messages[:-1],
-                                query=query
+                            for doc in retrieval_results:
+                                if 'text' in doc:
+                                    doc['content'] = doc['text']
+
+                            # (디버깅용) 검색 결과 개수 확인
+                            st.write(f"'{describe_filters(search_filters)}' 범위에서 문서 {len(retrieval_results)}개 검색됨")
+                            st.caption(
+                                f"검색 시간: vector {timings['vector_ms'] or 0:.0f}ms ∥ bm25 {timings['bm25_ms'] or 0:.0f}ms"
+                                f" → fusion {timings['fusion_ms']:.1f}ms (총 {timings['total_ms']:.0f}ms)"
                             )
-                        else:
-                            # Fallback
-                            final_messages = [
-                                {"role": "system", "content": "당신은 입찰 전문가입니다."},
-                                {"role": "user", "content": f"참고문서:\n{combined_context}\n\n질문: {query}"}
-                            ]
-
-                        # ✅ 답변 생성
-                        message_placeholder.markdown("⏳ 답변 생성 중...")
-                        response_text = model_manager.generate_response(
-                            messages=final_messages,
-                            source=source_key,
-                            local_llm=local_llm,
-                            openai_client=openai_client
-                        )
-                        
-                        message_placeholder.markdown(response_text)
-                        st.session_state.messages.append({"role": "assistant", "content": response_text})
+
+                            if not retrieval_results:
+                                combined_context = "조건에 맞는 문서를 찾을 수 없습니다."
+                            else:
+                                # 2. Reranking (상위 10개, 토큰 예산 패킹은 프롬프트 빌더에서)
+                                combined_context = rerank_model.rerank_docs(
+                                    query, 
+                                    retrieval_results, 
+                                    top_k=10
+                                )
+
+                            # ✅ 프롬프트 조립
+                            if builder:
+                                final_messages = builder.build_messages(
+                                    category=selected_d1 if selected_d1 else "General",
+                                    title=display_title,
+                                    context=combined_context,
+                                    history=st.session_state.messages[:-1],
+                                    query=query,
+                                    source=source_key,
+                                    local_llm=local_llm
+                                )
+                                packed_context = builder.last_packed_context
+                                pack_stats = builder.last_pack_stats
+                            else:
+                                # Fallback
+                                packed_context, pack_stats = (
+                                    pack_context(combined_context, query, budget_for(source_key),
+                                                 get_token_counter(source_key, local_llm))
+                                    if isinstance(combined_context, list) else (combined_context, {})
+                                )
+                                final_messages = [
+                                    {"role": "system", "content": "당신은 입찰 전문가입니다."},
+                                    {"role": "user", "content": f"참고문서:\n{packed_context}\n\n질문: {query}"}
+                                ]
+
+                            # [디버깅] 패킹된 참고 문서 / 토큰 수 확인
+                            if pack_stats:
+                                st.caption(
+                                    f"참고 문서 {pack_stats['tokens']}/{pack_stats['budget']} tokens · "
+                                    f"청크 {pack_stats['used']}/{pack_stats['candidates']} 사용 "
+                                    f"(중복 {pack_stats['deduped']}, 압축 {pack_stats['compressed']}, 제외 {pack_stats['dropped']})"
+                                )
+                            with st.expander("🔍 Rerank 결과 상세 보기"):
+                                st.text(packed_context)
+
+                            # ✅ 답변 생성 (토큰 단위 스트리밍)
+                            message_placeholder.markdown("⏳ 답변 생성 중...")
+                            gen_stats = {}
+                            response_text = message_placeholder.write_stream(
+                                model_manager.stream_response(
+                                    messages=final_messages,
+                                    source=source_key,
+                                    local_llm=local_llm,
+                                    openai_client=openai_client,
+                                    stats=gen_stats
+                                )
+                            ).strip()
+
+                            message_placeholder.markdown(response_text)
+                            if gen_stats.get("ttft_ms") is not None:
+                                st.caption(
+                                    f"TTFT {gen_stats['ttft_ms']:.0f}ms · 첫 표시 {gen_stats['first_visible_ms'] or 0:.0f}ms · "
+                                    f"{gen_stats['tokens']} tokens · {gen_stats['tokens_per_sec'] or 0:.1f} tok/s"
+                                )
+                            st.session_state.messages.append({"role": "assistant", "content": response_text})
+                            # 대화 첫 질문의 답변만 저장 (이전 대화에 기대는 답변은 다른 세션에서 재사용하지 않음)
+                            # 생성 실패(에러 문구) / 검색 결과 없음은 저장하지 않음
+                            if (query_vec and len(st.session_state.messages) == 2
+                                    and retrieval_results and not gen_stats.get("error")):
+                                answer_cache.put(query, query_vec, response_text, search_filters, source_key)
 
                     except Exception as e:
                         if "CUDA out of memory" in str(e):
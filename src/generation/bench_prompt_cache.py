@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import time
+
+#==============================================
+# 프로그램명: bench_prompt_cache.py
+# 폴더위치: src/generation/bench_prompt_cache.py
+# 프로그램 설명: 로컬 llama.cpp 모델 multi-turn prompt 평가 시간 비교 (prompt 앞부분 재사용 효과 측정)
+#   - 대화: ragas_inputs.json 질문/답변/context 로 app.py 와 같은 메시지 구성 (build_messages, source="local")
+#     · 두 채팅 세션(A/B)을 번갈아 진행 (Streamlit 다중 사용자와 같은 상황)
+#   - 비교 모드
+#     · reset  : 매 턴 llm.reset() → prompt 전체 재평가 (재사용 없음)
+#     · shared : 세션 구분 없이 모델 공유 (ModelManager 기본 동작, llama.cpp 자체 prefix 재사용)
+#   - 지표: 턴별 TTFT(≈ prompt 평가 시간), 평균, 턴 종료 시 KV 토큰 수, 시스템 프롬프트 토큰 수(재사용 가능한 최대치)
+#   - 실행방법: python -m src.generation.bench_prompt_cache --model ../unsloth.Q4_K_M.gguf [--turns 3] [--n-ctx 24576]
+#===============================================
+
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from src.generation.model_manager import ModelManager
+from src.prompts.RAGPromptBuilder import RAGPromptBuilder
+
+
+def load_conversations(path: str, turns: int, sessions: int = 2) -> list[list[dict]]:
+    with open(path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    return [items[s * turns:(s + 1) * turns] for s in range(sessions)]
+
+
+def run_mode(mode: str, llm, manager: ModelManager, builder: RAGPromptBuilder, convs: list, max_tokens: int):
+    llm.reset()
+    histories = [[] for _ in convs]
+    ttfts = []
+    for t in range(len(convs[0])):
+        for s, conv in enumerate(convs):
+            item = conv[t]
+            messages = builder.build_messages(
+                category="IT_정보화",
+                title=f"세션{s} 정보시스템 구축",
+                context="\n\n".join(item["contexts"]),
+                history=histories[s],
+                query=item["question"],
+                source="local",
+                local_llm=llm,
+            )
+            if mode == "reset":
+                llm.reset()
+            stats = {}
+            for _ in manager.stream_response(messages, source="local", local_llm=llm, stats=stats,
+                                             max_tokens=max_tokens):
+                pass
+            ttfts.append((t, s, stats["ttft_ms"], llm.n_tokens))
+            # app.py 와 같이 history 에는 원 질문 / 답변만 저장
+            histories[s] += [{"role": "user", "content": item["question"]},
+                             {"role": "assistant", "content": item["answer"]}]
+    return ttfts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 모델 multi-turn prompt 평가 시간 비교")
+    parser.add_argument("--model", default=os.path.join(BASE_DIR, "unsloth.Q4_K_M.gguf"))
+    parser.add_argument("--input", default=os.path.join(BASE_DIR, "src", "dataset", "ragas_inputs.json"))
+    parser.add_argument("--turns", type=int, default=4, help="세션당 턴 수 (history 는 최근 6개 메시지)")
+    parser.add_argument("--n-ctx", type=int, default=24576)
+    parser.add_argument("--n-gpu-layers", type=int, default=-1)
+    parser.add_argument("--max-tokens", type=int, default=16, help="턴당 생성 토큰 (prompt 평가 측정용으로 짧게)")
+    args = parser.parse_args()
+
+    from llama_cpp import Llama
+
+    llm = Llama(model_path=args.model, n_gpu_layers=args.n_gpu_layers, n_ctx=args.n_ctx, verbose=False)
+    manager = ModelManager(local_model_path=args.model)
+    builder = RAGPromptBuilder(os.path.join(BASE_DIR, "src", "prompts"))
+    convs = load_conversations(args.input, args.turns)
+
+    results = {}
+    for mode in ("reset", "shared"):
+        t0 = time.perf_counter()
+        results[mode] = run_mode(mode, llm, manager, builder, convs, args.max_tokens)
+        print(f"[{mode}] {time.perf_counter() - t0:.1f}s")
+
+    print(f"\n{'turn':>4}{'session':>8}{'kv tokens':>10}" + "".join(f"{m + ' ms':>14}" for m in results))
+    for i, (t, s, _, n_tok) in enumerate(results["reset"]):
+        print(f"{t + 1:>4}{'AB'[s]:>8}{n_tok:>10}" + "".join(f"{results[m][i][2]:>14.0f}" for m in results))
+    print(f"{'mean':>22}" + "".join(
+        f"{sum(x[2] for x in r) / len(r):>14.0f}" for r in results.values()
+    ))
+    system = builder.build_system_prompt("IT_정보화", "세션0 정보시스템 구축")
+    print("system prompt tokens:", len(llm.tokenize(system.encode("utf-8"), add_bos=False)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 import os
-import re
+import threading
+import time
 import torch
 import gc
+import weakref
 import streamlit as st
 from openai import OpenAI
 from langsmith import traceable
@@ -13,8 +15,100 @@ from langsmith import traceable
 # 작성이력: 25.12.23 한상준 최초 작성
 # 25.12.29 정규표현식 전처리 추가
 # 25.12.29 LangSmith 추적 추가
+# 스트리밍 생성 stream_response() 추가 (OpenAI / 로컬 공통, 텍스트 조각 generator)
+#   - <think>...</think> 제거를 정규식 후처리 → 스트림용 상태 머신(ThinkFilter)으로 변경
+#   - 요청별 TTFT / tokens/sec 기록 (stats 인자, self.last_stats)
+#     · OpenAI tokens 는 completion_tokens - reasoning_tokens (첫 조각 이후 생성된 답변 토큰만으로 속도 계산)
+#   - generate_response() 는 stream_response() 를 모두 모아 반환 (기존 호출부 호환)
+# 로컬 모델 prompt 재사용 범위 (세션별 KV save_state/load_state 는 제거)
+#   - llama.cpp 는 직전에 평가한 토큰과 겹치는 prompt 앞부분만 다시 평가하지 않음
+#   - 실제로 겹치는 부분은 시스템 프롬프트(같은 도메인 페르소나)까지
+#     · history 에는 원 질문만 저장되지만 KV 에는 참고 문서가 붙은 이전 user 메시지가 있음 → 이전 대화부터 달라짐
+#     · 4번째 턴부터는 history[-6:] 에서 오래된 메시지가 빠져 시스템 프롬프트 바로 뒤부터 달라짐
+#     → 세션별 KV 전체 복사(save_state) 비용에 비해 얻는 것이 없어 제거, 세션 구분 없이 모델 공유
+#   - Llama 객체는 스레드 안전하지 않아 생성 구간 전체를 모델별 lock 으로 보호 (get_model_lock)
+#   - 벤치마크: python -m src.generation.bench_prompt_cache
 #===============================================
 
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class ThinkFilter:
+    """
+    스트림 조각 단위 <think>...</think> 제거 (re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL) 과 같은 결과)
+    - 태그가 조각 경계에서 잘려 들어와도 처리 (태그 접두어일 수 있는 끝부분은 다음 조각까지 보류)
+    - 닫히지 않은 <think> 는 정규식과 같이 제거하지 않고 끝(flush)에서 그대로 내보냄
+    - 응답 앞쪽 공백은 제거 (.strip() 의 앞부분)
+    """
+
+    def __init__(self):
+        self.inside = False
+        self.pending = ""   # 태그 일부일 수 있어 보류 중인 문자열
+        self.thinking = ""  # <think> 안쪽 내용 (닫히지 않으면 flush 에서 복원)
+        self.started = False
+
+    @staticmethod
+    def _partial_tag_len(text: str, tag: str) -> int:
+        """text 끝이 tag 의 접두어와 겹치는 길이"""
+        for n in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text.endswith(tag[:n]):
+                return n
+        return 0
+
+    def _emit(self, text: str) -> str:
+        if not self.started:
+            text = text.lstrip()
+            self.started = bool(text)
+        return text
+
+    def feed(self, delta: str) -> str:
+        buf = self.pending + delta
+        self.pending = ""
+        out = []
+        while buf:
+            if self.inside:
+                i = buf.find(THINK_CLOSE)
+                if i < 0:
+                    keep = self._partial_tag_len(buf, THINK_CLOSE)
+                    self.thinking += buf[: len(buf) - keep]
+                    self.pending = buf[len(buf) - keep:]
+                    break
+                self.inside = False
+                self.thinking = ""
+                buf = buf[i + len(THINK_CLOSE):]
+            else:
+                i = buf.find(THINK_OPEN)
+                if i < 0:
+                    keep = self._partial_tag_len(buf, THINK_OPEN)
+                    out.append(buf[: len(buf) - keep])
+                    self.pending = buf[len(buf) - keep:]
+                    break
+                out.append(buf[:i])
+                self.inside = True
+                buf = buf[i + len(THINK_OPEN):]
+        return self._emit("".join(out))
+
+    def flush(self) -> str:
+        rest = (THINK_OPEN + self.thinking + self.pending) if self.inside else self.pending
+        self.inside, self.thinking, self.pending = False, "", ""
+        return self._emit(rest)
+
+
+# Llama 객체는 스레드 안전하지 않음 → 모델별 lock 으로 생성 구간 전체 보호
+# 모델 객체가 해제/재로딩되면 lock 도 같이 사라지도록 weak key 사용
+_model_locks = weakref.WeakKeyDictionary()
+_model_locks_lock = threading.Lock()
+
+
+def get_model_lock(llm) -> threading.Lock:
+    with _model_locks_lock:
+        lock = _model_locks.get(llm)
+        if lock is None:
+            lock = _model_locks[llm] = threading.Lock()
+        return lock
+
+
 # 캐싱할 함수는 클래스 밖(또는 staticmethod)에 정의합니다.
 @st.cache_resource
 def _load_llama_cpp_model(model_path: str, n_ctx: int = 24576):
@@ -40,6 +134,7 @@ class ModelManager:
     def __init__(self, local_model_path: str = "../unsloth.Q4_K_M.gguf"):
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.local_model_path = local_model_path
+        self.last_stats = {}
 
     def get_openai_client(self):
         """OpenAI 클라이언트 반환 (가벼운 객체라 캐싱 불필요)"""
@@ -59,41 +154,98 @@ class ModelManager:
         # 여기서 캐싱된 함수 호출 (_load_llama_cpp_model)
         return _load_llama_cpp_model(self.local_model_path)
 
-    @traceable(run_type="llm", name="LLM_Generation")
-    def generate_response(self, messages, source="openai", local_llm=None, openai_client=None):
-        """답변 생성 로직 통합"""
-        try:
-            if source == "openai":
-                if not openai_client:
-                    return "🚨 OpenAI Client가 연결되지 않았습니다."
-                
-                response = openai_client.chat.completions.create(
-                    model="gpt-5-nano",
-                    messages=messages
-                )
-                return response.choices[0].message.content
-            
-            elif source == "local":
-                if not local_llm:
-                    return "🚨 로컬 모델이 로드되지 않았습니다."
-                
-                # 로컬 모델 추론
-                response = local_llm.create_chat_completion(
+    def _iter_raw_deltas(self, messages, source, local_llm, openai_client, stats: dict,
+                         max_tokens: int = 2048):
+        """백엔드별 스트림 → 원문 텍스트 조각 (usage 가 오면 stats["tokens"] 에 기록)"""
+        if source == "openai":
+            stream = openai_client.chat.completions.create(
+                model="gpt-5-nano",
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            for chunk in stream:
+                if chunk.usage is not None:
+                    # completion_tokens 에는 보이지 않는 reasoning 토큰이 포함 → 표시된 답변 토큰만 집계
+                    details = getattr(chunk.usage, "completion_tokens_details", None)
+                    reasoning = (getattr(details, "reasoning_tokens", None) or 0) if details else 0
+                    stats["reasoning_tokens"] = reasoning
+                    stats["tokens"] = max(chunk.usage.completion_tokens - reasoning, 0)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        elif source == "local":
+            with get_model_lock(local_llm):
+                # 로컬 모델 추론 (llama.cpp 는 토큰 단위로 조각 반환)
+                # 직전 요청과 같은 시스템 프롬프트 부분만 재사용되고 이전 대화 이후는 매번 다시 평가됨
+                stream = local_llm.create_chat_completion(
                     messages=messages,
-                    max_tokens=2048,
+                    max_tokens=max_tokens,
                     stop=["<|im_end|>", "<|endoftext|>", "User:"],
-                    temperature=0.1
+                    temperature=0.1,
+                    stream=True,
                 )
-                raw_content = response['choices'][0]['message']['content']
-
-                # ✅ [핵심 수정] <think> ... </think> 태그 제거 로직
-                # re.DOTALL: 줄바꿈이 포함된 내용도 모두 찾음
-                clean_content = re.sub(r'<think>.*?</think>', '', raw_content, flags=re.DOTALL).strip()
-                
-                return clean_content
-                
+                for chunk in stream:
+                    content = chunk["choices"][0]["delta"].get("content")
+                    if content:
+                        yield content
+
+    @traceable(run_type="llm", name="LLM_Generation")
+    def stream_response(self, messages, source="openai", local_llm=None, openai_client=None, stats: dict | None = None,
+                        max_tokens: int = 2048):
+        """
+        답변 스트리밍: 화면에 표시할 텍스트 조각을 yield (<think> 내용 제외)
+        stats (요청별, 끝나면 채워짐):
+          ttft_ms          첫 토큰까지 시간 (모델 출력 기준)
+          first_visible_ms 첫 표시 텍스트까지 시간 (<think> 제외 후)
+          total_ms, tokens, tokens_per_sec (첫 토큰 이후 디코딩 속도)
+          reasoning_tokens OpenAI reasoning 토큰 (첫 조각 전에 생성되므로 tokens / tokens_per_sec 에서 제외)
+          error            실패 시 원인 (표시용 에러 문구는 그대로 yield, 호출 측은 캐시 저장 등 생략)
+        """
+        stats = {} if stats is None else stats
+        stats.update(source=source, ttft_ms=None, first_visible_ms=None, tokens=0, reasoning_tokens=0,
+                     tokens_per_sec=None, error=None)
+        self.last_stats = stats
+
+        if source == "openai" and not openai_client:
+            stats["error"] = "openai client not connected"
+            yield "🚨 OpenAI Client가 연결되지 않았습니다."
+            return
+        if source == "local" and not local_llm:
+            stats["error"] = "local model not loaded"
+            yield "🚨 로컬 모델이 로드되지 않았습니다."
+            return
+
+        think = ThinkFilter()
+        t0 = time.perf_counter()
+        n_chunks = 0
+        try:
+            for delta in self._iter_raw_deltas(messages, source, local_llm, openai_client, stats,
+                                               max_tokens=max_tokens):
+                if stats["ttft_ms"] is None:
+                    stats["ttft_ms"] = (time.perf_counter() - t0) * 1000
+                n_chunks += 1
+                visible = think.feed(delta)
+                if visible:
+                    if stats["first_visible_ms"] is None:
+                        stats["first_visible_ms"] = (time.perf_counter() - t0) * 1000
+                    yield visible
+            rest = think.flush()
+            if rest:
+                yield rest
         except Exception as e:
-            return f"❌ 답변 생성 중 에러 발생: {str(e)}"
+            stats["error"] = repr(e)
+            yield f"❌ 답변 생성 중 에러 발생: {str(e)}"
+        finally:
+            total = (time.perf_counter() - t0) * 1000
+            stats["total_ms"] = total
+            stats["tokens"] = stats["tokens"] or n_chunks
+            if stats["ttft_ms"] is not None and total > stats["ttft_ms"]:
+                stats["tokens_per_sec"] = stats["tokens"] / ((total - stats["ttft_ms"]) / 1000)
+
+    def generate_response(self, messages, source="openai", local_llm=None, openai_client=None):
+        """답변 생성 로직 통합 (스트림을 모두 모아 반환)"""
+        return "".join(self.stream_response(messages, source, local_llm, openai_client)).strip()
 
     def clear_gpu_memory(self):
         """GPU 메모리 캐시를 강제로 비웁니다."""
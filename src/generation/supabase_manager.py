@@ -2,9 +2,10 @@ import os
 import streamlit as st
 from supabase import create_client, Client
 from openai import OpenAI
-from sentence_transformers import CrossEncoder
 import numpy as np
 
+from src.rag.rerank.rerank_service import get_rerank_service
+
 #==============================================
 # 프로그램명: supabase_manager.py
 # 폴더위치: src/generation/supabase_manager.py
@@ -12,6 +13,7 @@ import numpy as np
 # 작성이력: 25.12.23 한상준 최초 작성
 # 25.12.24 rerank 추가
 # 25.12.29 supabase 검색 메서드 업데이트
+# reranker 를 공용 리랭크 서비스(rerank_service.py)로 변경 (점수 캐시 + 길이 정렬 배치, 토큰 기준 본문 자르기)
 #===============================================
 RERANKER_MODEL_ID = "BAAI/bge-reranker-m3-ko"
 
@@ -37,10 +39,10 @@ class SupabaseManager:
         """
         try:
             # print(f"🚀 Reranker 로딩 중: {RERANKER_MODEL_ID}")
-            return CrossEncoder(RERANKER_MODEL_ID, device="cuda", max_length=512)
+            return get_rerank_service(RERANKER_MODEL_ID, device="cuda", max_length=512)
         except Exception as e:
             st.warning(f"⚠️ Reranker 로드 실패 (CPU 모드로 전환): {e}")
-            return CrossEncoder(RERANKER_MODEL_ID, device="cpu")
+            return get_rerank_service(RERANKER_MODEL_ID, device="cpu", max_length=512)
 
     def get_embedding(self, text: str):
         """질문을 벡터로 변환 (데이터 팀이 사용한 모델과 일치해야 함!)"""
@@ -71,14 +73,12 @@ class SupabaseManager:
 
             # --- 2단계: Reranking (Local GPU) ---
             # Reranker 입력 형식: [[질문, 문서1], [질문, 문서2], ...]
-            # 참고: 청크가 4500토큰이어도 Reranker는 앞부분(512토큰) 위주로 판단합니다.
-            rerank_pairs = []
-            for doc in candidates:
-                content = doc.get("content", "") # 컬럼명 확인 필요 (text, content 등)
-                rerank_pairs.append([query, content])
+            # 참고: 긴 청크는 rerank_service 가 리랭커 tokenizer 로 512토큰 이내로 미리 자름
+            #       (RERANK_PASSAGE_MODE=window 면 겹치는 구간별 점수의 max)
+            contents = [doc.get("content", "") for doc in candidates] # 컬럼명 확인 필요 (text, content 등)
 
-            # 점수 계산
-            scores = self.reranker.predict(rerank_pairs)
+            # 점수 계산 (캐시에 없는 (질문, 청크) 쌍만 모델 계산)
+            scores = self.reranker.score(query, contents, [doc.get("chunk_id") for doc in candidates])
 
             # 점수와 문서를 묶어서 정렬
             scored_docs = list(zip(candidates, scores))
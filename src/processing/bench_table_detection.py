@@ -0,0 +1,71 @@
+#==================================================================
+# 프로그램명: bench_table_detection.py
+# 설명:
+#- makechunk_smk_final의 페이지당 표 검출 비용 비교 벤치마크
+#  · 기존: extract_tables() + find_tables() (페이지당 표 검출 2회)
+#  · 변경: PageAnalysis (페이지당 find_tables() 1회, 표 행/bbox 공용)
+#- 두 방식의 표 행/bbox 결과가 동일한지 함께 검증
+#- 실행방법: python -m src.processing.bench_table_detection <pdf 경로> [반복 횟수]
+#==================================================================
+
+import sys
+import time
+
+import pdfplumber
+
+from src.processing.makechunk_smk_final import PageAnalysis
+
+
+def run_legacy(pdf_path):
+    rows, bboxes = [], []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            rows.append(page.extract_tables())
+            bboxes.append([t.bbox for t in page.find_tables()])
+    return rows, bboxes
+
+
+def run_page_analysis(pdf_path):
+    rows, bboxes = [], []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            analysis = PageAnalysis(page)
+            rows.append(analysis.table_rows)
+            bboxes.append(analysis.table_bboxes)
+    return rows, bboxes
+
+
+def best_of(fn, pdf_path, repeat):
+    best = None
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(pdf_path)
+        sec = time.perf_counter() - t0
+        best = sec if best is None else min(best, sec)
+    return best, out
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("사용법: python -m src.processing.bench_table_detection <pdf 경로> [반복 횟수]")
+        sys.exit(1)
+
+    pdf_path = sys.argv[1]
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with pdfplumber.open(pdf_path) as pdf:
+        n_pages = len(pdf.pages)
+
+    legacy_sec, legacy_out = best_of(run_legacy, pdf_path, repeat)
+    new_sec, new_out = best_of(run_page_analysis, pdf_path, repeat)
+
+    print(f"pdf: {pdf_path} ({n_pages} pages, best of {repeat})")
+    print(f"legacy (extract_tables + find_tables): {legacy_sec:.3f}s ({legacy_sec / max(n_pages, 1) * 1000:.1f} ms/page)")
+    print(f"PageAnalysis (find_tables 1회)       : {new_sec:.3f}s ({new_sec / max(n_pages, 1) * 1000:.1f} ms/page)")
+    print(f"saving: {(legacy_sec - new_sec) / max(n_pages, 1) * 1000:.1f} ms/page ({(1 - new_sec / legacy_sec) * 100:.1f}%)")
+    print("same output:", legacy_out == new_out)
+
+
+if __name__ == "__main__":
+    main()
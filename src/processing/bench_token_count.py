@@ -0,0 +1,147 @@
+#==================================================================
+# 프로그램명: bench_token_count.py
+# 설명:
+#- makechunk_smk_final 청킹 단계의 토큰 계산 비용 비교 마이크로 벤치마크 (실제 RFP PDF 1개 기준)
+#  · 기존: 라인마다 enc.encode + flush 때마다 오버랩 버퍼 재인코딩, 표 행도 행마다 encode
+#  · 변경: 문서 라인 전체 encode_batch 1회 + 라인별 토큰 수 캐시 (cold: 캐시 비운 상태 / warm: 캐시 적중)
+#- 청크 개수/경계가 기존 방식과 같은지 함께 출력
+#  (오버랩 버퍼 토큰 수를 라인별 +1 합으로 계산하므로 경계가 1토큰 차이로 달라질 수 있음)
+#- 실행방법: python -m src.processing.bench_token_count <pdf 경로> [반복 횟수]
+#==================================================================
+
+import sys
+import time
+
+from src.processing import makechunk_smk_final as mc
+
+
+# 기존 구현 (비교용)
+def legacy_chunk_lines(paged_lines, max_tokens, overlap_lines=3):
+    chunks, buf, buf_tok = [], [], 0
+
+    def tok_len(s):
+        return len(mc.enc.encode(s))
+
+    def flush():
+        if not buf:
+            return
+        chunks.append({
+            "text": "\n".join(l for _, l in buf),
+            "pages": sorted({p for p, _ in buf}),
+        })
+
+    for page_id, line in paged_lines:
+        t = tok_len(line) + 1
+
+        if t >= max_tokens:
+            flush()
+            buf.clear()
+            chunks.append({"text": line, "pages": [page_id]})
+            continue
+
+        if buf_tok + t > max_tokens and buf:
+            flush()
+            buf[:] = buf[-overlap_lines:]
+            buf_tok = tok_len("\n".join(l for _, l in buf)) if buf else 0
+
+        buf.append((page_id, line))
+        buf_tok += t
+
+    flush()
+    return chunks
+
+
+def legacy_chunk_rows(paged_rows, max_tokens=600):
+    chunks, buf, buf_tok = [], [], 0
+
+    def flush():
+        if not buf:
+            return
+        chunks.append({
+            "text": "\n".join(r for _, r in buf),
+            "pages": sorted({p for p, _ in buf}),
+        })
+
+    for page_id, r in paged_rows:
+        rt = len(mc.enc.encode(r)) + 1
+
+        if rt >= max_tokens:
+            flush()
+            buf.clear()
+            chunks.append({"text": r, "pages": [page_id]})
+            continue
+
+        if buf_tok + rt > max_tokens and buf:
+            flush()
+            buf.clear()
+            buf_tok = 0
+
+        buf.append((page_id, r))
+        buf_tok += rt
+
+    flush()
+    return chunks
+
+
+def run_legacy(paged_text, paged_tables):
+    return (
+        legacy_chunk_lines(paged_text, mc.TEXT_MAX_TOKENS, mc.TEXT_OVERLAP_LINES),
+        legacy_chunk_rows(paged_tables, mc.TABLE_MAX_TOKENS),
+    )
+
+
+def run_batched(paged_text, paged_tables):
+    tok_counts = mc.count_tokens_batch([l for _, l in paged_text] + [r for _, r in paged_tables])
+    return (
+        mc.chunk_lines_by_tokens_with_page_map(paged_text, mc.TEXT_MAX_TOKENS, mc.TEXT_OVERLAP_LINES, tok_counts),
+        mc.chunk_table_rows_with_page_map(paged_tables, mc.TABLE_MAX_TOKENS, tok_counts),
+    )
+
+
+def best_of(fn, repeat, before=None):
+    best = None
+    out = None
+    for _ in range(repeat):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        out = fn()
+        sec = time.perf_counter() - t0
+        best = sec if best is None else min(best, sec)
+    return best, out
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("사용법: python -m src.processing.bench_token_count <pdf 경로> [반복 횟수]")
+        sys.exit(1)
+
+    pdf_path = sys.argv[1]
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    # 청킹 직전 상태까지 준비 (makechunk_smk_final.build_chunk_records와 동일한 정제 순서)
+    table_pages, text_pages = mc.extract_pdf_lines_separately(pdf_path)
+    table_pages = mc.remove_repeating_header_footer(table_pages, mc.TOP_N, mc.BOTTOM_N, mc.MIN_RATIO)
+    text_pages = mc.remove_repeating_header_footer(text_pages, mc.TOP_N, mc.BOTTOM_N, mc.MIN_RATIO)
+    table_pages = [mc.collapse_consecutive_duplicates(mc.clean_lines(p))[0] for p in table_pages]
+    text_pages = [mc.collapse_consecutive_duplicates(mc.clean_lines(p))[0] for p in text_pages]
+
+    paged_text = [(pid, l) for pid, p in enumerate(text_pages, 1) for l in p]
+    paged_tables = [(pid, r) for pid, p in enumerate(table_pages, 1) for r in p]
+    n_lines = len(paged_text) + len(paged_tables)
+    n_unique = len({l for _, l in paged_text} | {r for _, r in paged_tables})
+
+    legacy_sec, legacy_out = best_of(lambda: run_legacy(paged_text, paged_tables), repeat)
+    cold_sec, batched_out = best_of(lambda: run_batched(paged_text, paged_tables), repeat, before=mc._token_len_cache.clear)
+    warm_sec, _ = best_of(lambda: run_batched(paged_text, paged_tables), repeat)
+
+    print(f"pdf: {pdf_path} ({len(text_pages)} pages, {n_lines} lines / {n_unique} unique, best of {repeat})")
+    print(f"legacy (per-line encode)    : {legacy_sec * 1000:8.2f} ms")
+    print(f"batched (cold cache)        : {cold_sec * 1000:8.2f} ms (x{legacy_sec / cold_sec:.1f})")
+    print(f"batched (warm cache)        : {warm_sec * 1000:8.2f} ms (x{legacy_sec / warm_sec:.1f})")
+    print(f"chunks legacy/batched       : text {len(legacy_out[0])}/{len(batched_out[0])}, table {len(legacy_out[1])}/{len(batched_out[1])}")
+    print("same chunks:", legacy_out == batched_out)
+
+
+if __name__ == "__main__":
+    main()
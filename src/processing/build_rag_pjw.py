@@ -15,6 +15,8 @@ from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from src.rag.embed.embedding_store import CachedEmbeddings
+
 # API KEY (보안상 API key 생략)
 os.environ["OPENAI_API_KEY"] = "sk-..." 
 
@@ -26,7 +28,7 @@ MD_DIR = os.path.join(BASE_DIR, "preprocessed_data") # 전처리 한 폴더로 
 JSON_OUTPUT_PATH = os.path.join(BASE_DIR, "real_final_ingest_data.json") # 임베딩용
 
 # 임베딩 모델 설정
-embeddings_model = OpenAIEmbeddings(model="text-embedding-3-small")
+embeddings_model = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-small"), "text-embedding-3-small")  # 임베딩 저장소 재사용
 
 # 튜닝 파라미터
 BATCH_SIZE = 10
@@ -0,0 +1,112 @@
+#==================================================================
+# 프로그램명: bulk_upsert.py
+# 설명:
+# - Supabase(PostgREST) 테이블 대량 upsert 유틸 (upload_chunks_final.py 공용)
+# - 행을 개수(UPSERT_MAX_ROWS) + JSON 페이로드 바이트(UPSERT_MAX_BYTES) 기준으로 묶어 요청 1회에 upsert
+#   · 행마다 1536차원 embedding이 붙어 행당 수십 KB이므로 바이트 상한을 같이 둠
+# - 배치가 거부되면(한 INSERT 문은 행 1개만 잘못돼도 전체 실패) 반으로 나눠 재시도(bisect)
+#   → 실제로 실패하는 행만 골라 (row, 에러메시지) 로 반환, 나머지 행은 정상 적재
+# - 일시적 오류는 나누지 않고 같은 배치를 지수 백오프(+지터)로 재시도 (UPSERT_MAX_RETRIES 회)
+#   · httpx 타임아웃/연결 오류, HTTP 429/5xx, PostgREST 연결 오류(PGRST000~003),
+#     Postgres 연결/자원/타임아웃/직렬화 오류(08*, 53*, 57*, 40001, 40P01)
+#   · 재시도를 다 써도 실패하면 배치 전체를 그 에러로 실패 처리 (장애 중 bisect로 요청이 폭증하지 않게)
+#   · bisect 는 그 외(4xx 데이터 오류 등 행 때문에 거부된 경우)에만 사용
+#==================================================================
+
+import json
+import random
+import time
+
+import httpx
+from postgrest.exceptions import APIError
+
+UPSERT_MAX_ROWS = 200
+UPSERT_MAX_BYTES = 4 * 1024 * 1024
+UPSERT_MAX_RETRIES = 5
+UPSERT_MAX_BACKOFF = 60.0
+
+TRANSIENT_PGRST_CODES = ("PGRST000", "PGRST001", "PGRST002", "PGRST003")
+TRANSIENT_SQLSTATE_PREFIXES = ("08", "53", "57", "40001", "40P01")
+
+
+def row_payload_bytes(row: dict) -> int:
+    return len(json.dumps(row, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def iter_row_batches(rows, max_rows=UPSERT_MAX_ROWS, max_bytes=UPSERT_MAX_BYTES):
+    batch, batch_bytes = [], 0
+    for row in rows:
+        b = row_payload_bytes(row)
+        if batch and (len(batch) >= max_rows or batch_bytes + b > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(row)
+        batch_bytes += b
+    if batch:
+        yield batch
+
+
+def is_transient_error(err) -> bool:
+    """행 내용과 무관하게 다시 보내면 성공할 수 있는 오류인지"""
+    if isinstance(err, httpx.TransportError):  # 타임아웃 / 연결 실패 / 연결 끊김
+        return True
+    if isinstance(err, APIError):
+        code = str(err.code or "")
+        if code.isdigit() and len(code) == 3:  # JSON 아닌 응답 → HTTP 상태 코드
+            return code == "429" or code.startswith("5")
+        return code in TRANSIENT_PGRST_CODES or code.startswith(TRANSIENT_SQLSTATE_PREFIXES)
+    return False
+
+
+def _backoff(attempt: int) -> float:
+    return min(UPSERT_MAX_BACKOFF, 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+def upsert_batch(client, table_name: str, rows: list[dict], on_conflict: str = "chunk_id",
+                 max_retries: int = UPSERT_MAX_RETRIES):
+    """rows 를 요청 1회로 upsert, 일시적 오류는 같은 배치로 백오프 재시도 (그 외 오류 / 재시도 소진 시 예외 전달)"""
+    for attempt in range(max_retries + 1):
+        try:
+            client.table(table_name).upsert(rows, on_conflict=on_conflict).execute()
+            return
+        except Exception as e:
+            if not is_transient_error(e) or attempt == max_retries:
+                raise
+            delay = _backoff(attempt)
+            print(f"⚠️ upsert 재시도 {attempt + 1}/{max_retries} ({len(rows)}행, {type(e).__name__}: {e}) {delay:.1f}s 대기")
+            time.sleep(delay)
+
+
+def upsert_with_bisect(client, table_name: str, rows: list[dict], on_conflict: str = "chunk_id"):
+    """
+    rows를 한 번에 upsert, 데이터 오류로 거부되면 반씩 나눠 재귀 재시도
+    (일시적 오류는 upsert_batch 에서 같은 배치로 재시도, 소진되면 배치 전체 실패)
+    return: (성공 행 수, [(row, 에러메시지), ...])
+    """
+    if not rows:
+        return 0, []
+    try:
+        upsert_batch(client, table_name, rows, on_conflict)
+        return len(rows), []
+    except Exception as e:
+        if len(rows) == 1 or is_transient_error(e):
+            return 0, [(row, str(e)) for row in rows]
+
+    mid = len(rows) // 2
+    ok_l, failed_l = upsert_with_bisect(client, table_name, rows[:mid], on_conflict)
+    ok_r, failed_r = upsert_with_bisect(client, table_name, rows[mid:], on_conflict)
+    return ok_l + ok_r, failed_l + failed_r
+
+
+def upsert_rows_bulk(client, table_name: str, rows, on_conflict: str = "chunk_id",
+                     max_rows: int = UPSERT_MAX_ROWS, max_bytes: int = UPSERT_MAX_BYTES):
+    """
+    rows를 크기 제한 배치로 나눠 upsert
+    return: (성공 행 수, [(row, 에러메시지), ...])
+    """
+    ok_total, failed_total = 0, []
+    for batch in iter_row_batches(rows, max_rows, max_bytes):
+        ok, failed = upsert_with_bisect(client, table_name, batch, on_conflict)
+        ok_total += ok
+        failed_total.extend(failed)
+    return ok_total, failed_total
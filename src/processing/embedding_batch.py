@@ -0,0 +1,118 @@
+#==================================================================
+# 프로그램명: embedding_batch.py
+# 설명:
+# - OpenAI embeddings API 배치 호출 유틸 (upload_chunks_final.py 등 적재 스크립트 공용)
+# - 입력을 요청당 토큰 예산(EMBED_BATCH_MAX_TOKENS) / 입력 개수(EMBED_BATCH_MAX_INPUTS) 이하로 묶어 1회 요청
+#   · 토큰 수는 tiktoken(cl100k_base) 기준
+#   · 단일 입력이 모델 한도(EMBED_INPUT_MAX_TOKENS)를 넘으면 단독 배치로 보내 실패가 다른 입력에 번지지 않게 함
+# - RateLimit(429) / 타임아웃 / 연결 오류 / 5xx 는 지수 백오프(+지터, Retry-After 헤더 우선)로 재시도
+# - 응답은 data[].index 기준으로 정렬하여 입력 순서와 항상 일치
+# - client를 인자로 받으므로 OPENAI_BASE_URL을 fake_embedding_server.py 로 지정해 로컬 테스트 가능
+#==================================================================
+
+import random
+import time
+
+import openai
+import tiktoken
+
+EMBED_MODEL = "text-embedding-3-small"
+
+EMBED_BATCH_MAX_TOKENS = 100_000  # API 요청당 한도(300k)보다 여유 있게
+EMBED_BATCH_MAX_INPUTS = 512      # API 요청당 입력 개수 한도(2048)
+EMBED_INPUT_MAX_TOKENS = 8191     # text-embedding-3-small 단일 입력 한도
+EMBED_MAX_RETRIES = 6
+EMBED_MAX_BACKOFF = 60.0
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+enc = tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(texts):
+    return [len(ids) for ids in enc.encode_ordinary_batch(texts)]
+
+
+def iter_token_batches(items, text_of=lambda x: x, max_tokens=EMBED_BATCH_MAX_TOKENS, max_inputs=EMBED_BATCH_MAX_INPUTS):
+    """
+    items를 순서대로 묶어 (토큰 합 <= max_tokens, 개수 <= max_inputs) 배치 리스트로 yield
+    - items는 iterator여도 됨 (배치 1개 분량만 메모리에 유지)
+    """
+    batch, batch_tok = [], 0
+    pending = []
+
+    def drain(pending):
+        nonlocal batch, batch_tok
+        for item, t in zip(pending, count_tokens([text_of(x) for x in pending])):
+            if t > EMBED_INPUT_MAX_TOKENS:
+                # 한도 초과 입력은 단독 배치
+                if batch:
+                    yield batch
+                    batch, batch_tok = [], 0
+                yield [item]
+                continue
+            if batch and (batch_tok + t > max_tokens or len(batch) >= max_inputs):
+                yield batch
+                batch, batch_tok = [], 0
+            batch.append(item)
+            batch_tok += t
+
+    # 토큰 계산도 encode_batch로 묶어서 처리
+    for item in items:
+        pending.append(item)
+        if len(pending) >= max_inputs:
+            yield from drain(pending)
+            pending = []
+    if pending:
+        yield from drain(pending)
+    if batch:
+        yield batch
+
+
+def _retry_delay(err, attempt):
+    resp = getattr(err, "response", None)
+    if resp is not None:
+        try:
+            retry_after = float(resp.headers.get("retry-after"))
+            return min(retry_after, EMBED_MAX_BACKOFF)
+        except (TypeError, ValueError):
+            pass
+    return min(EMBED_MAX_BACKOFF, 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+def embed_batch(client, texts, model=EMBED_MODEL, max_retries=EMBED_MAX_RETRIES):
+    """
+    texts 전체를 1회 요청으로 임베딩 (재시도 포함)
+    return: texts와 같은 순서의 벡터 리스트
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            resp = client.embeddings.create(model=model, input=texts)
+            data = sorted(resp.data, key=lambda d: d.index)
+            if len(data) != len(texts):
+                raise RuntimeError(f"임베딩 응답 개수 불일치: 요청 {len(texts)} / 응답 {len(data)}")
+            return [d.embedding for d in data]
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = _retry_delay(e, attempt)
+            print(f"⚠️ embedding 재시도 {attempt + 1}/{max_retries} ({type(e).__name__}) {delay:.1f}s 대기")
+            time.sleep(delay)
+
+
+def embed_texts(client, texts, model=EMBED_MODEL):
+    """
+    texts를 토큰 예산 단위 배치로 나눠 임베딩
+    return: texts와 같은 순서의 벡터 리스트
+    """
+    out = [None] * len(texts)
+    for idx_batch in iter_token_batches(range(len(texts)), text_of=lambda i: texts[i]):
+        vecs = embed_batch(client, [texts[i] for i in idx_batch], model)
+        for i, v in zip(idx_batch, vecs):
+            out[i] = v
+    return out
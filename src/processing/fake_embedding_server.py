@@ -0,0 +1,104 @@
+#==================================================================
+# 프로그램명: fake_embedding_server.py
+# 설명:
+# - OpenAI embeddings API(POST /v1/embeddings)를 흉내 내는 로컬 테스트용 서버 (표준 라이브러리만 사용)
+# - 같은 입력 문자열에는 항상 같은 단위 벡터 반환 (sha256 시드)
+# - --rate-limit-every N : N번째 요청마다 429 + Retry-After 응답 (재시도/백오프 확인용)
+# - --latency-ms         : 요청당 인위적 지연 (배치/동시성 효과 확인용)
+# - 실행방법:
+#   python -m src.processing.fake_embedding_server --port 8765
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=dummy python -m src.processing.upload_chunks_final
+#==================================================================
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_vector(text, dim):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    v = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(x * x for x in v)) or 1.0
+    return [x / norm for x in v]
+
+
+def make_handler(dim, rate_limit_every, latency_ms):
+    lock = threading.Lock()
+    stats = {"requests": 0, "inputs": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, body, headers=None):
+            raw = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/embeddings"):
+                self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+                return
+
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            inputs = payload.get("input")
+            if isinstance(inputs, str):
+                inputs = [inputs]
+
+            with lock:
+                stats["requests"] += 1
+                n = stats["requests"]
+            if rate_limit_every and n % rate_limit_every == 0:
+                self._send(429, {"error": {"message": "fake rate limit", "type": "rate_limit_exceeded"}}, {"Retry-After": "0.2"})
+                return
+
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+
+            with lock:
+                stats["inputs"] += len(inputs)
+            n_tokens = sum(len(t) for t in inputs)
+            self._send(200, {
+                "object": "list",
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": fake_vector(t, dim)}
+                    for i, t in enumerate(inputs)
+                ],
+                "model": payload.get("model"),
+                "usage": {"prompt_tokens": n_tokens, "total_tokens": n_tokens},
+            })
+
+        def log_message(self, fmt, *args):
+            print(f"[fake-embed] req={stats['requests']} inputs={stats['inputs']} " + fmt % args)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 가짜 OpenAI embeddings 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.dim, args.rate_limit_every, args.latency_ms))
+    print(f"fake embedding server: http://{args.host}:{args.port}/v1 (dim={args.dim})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,30 @@
 #- converted_pdfs 폴더 내 모든 PDF 순회 처리
 #- pdfplumber + PyMuPDF로 표 / 본문을 분리 추출하며, PyMuPDF 실패 시 pdfplumber로 폴백
 #- 페이지 내 표 영역(bbox)을 제외한 본문만 클리핑 추출
+#  · 표 검출(find_tables)은 PageAnalysis로 페이지당 1회만 수행하여 표 행/bbox에 공용 사용
 #- 페이지 전반에 반복 등장하는 헤더/푸터를 상단 TOP_N, 하단 BOTTOM_N, 출현 비율 MIN_RATIO 기준으로 제거
 #- 유니코드 NFC 정규화 및 컨트롤 문자(NUL 포함) 제거, 잡음 라인(구분선, 페이지 번호 등) 필터링
 #- 연속 반복되는 동일 라인(run)만 1개로 축약하여 중복 텍스트 제거
 #- tiktoken(cl100k_base) 기준 토큰 청킹
 #  · 본문: TEXT_MAX_TOKENS, 라인 오버랩(TEXT_OVERLAP_LINES) 적용
 #  · 표: TABLE_MAX_TOKENS, 행 단위 청킹 (오버랩 없음)
-#- 각 chunk에 UUID 기반 chunk_id 부여 및 페이지 매핑 유지
+#  · 문서 1개의 본문/표 라인 토큰 수를 encode_batch 1회로 계산하고 라인별 토큰 수를 캐시
+#    (반복되는 헤더/푸터/상투 문구는 문서 간에도 재사용, 오버랩 버퍼 토큰 수도 캐시 값 합으로 계산)
+#- 각 chunk에 내용 기반 UUID(uuid5: 파일명 + content_type + 텍스트) chunk_id 부여 및 페이지 매핑 유지
+#  · 같은 PDF/같은 청킹 결과면 매 실행마다 동일한 chunk_id -> 업로드 upsert가 no-op
 #- CSV 메타데이터 + pages + text + length + metadata(content_type, chunk_index) 구조로 레코드 생성
-#- 결과를 chunks_all_pdfs_final.json 파일로 저장
+#- 결과를 chunks_all_pdfs_final.jsonl 파일로 저장 (PDF 1개 처리될 때마다 해당 레코드를 1줄 1레코드로 바로 기록)
+#  · 전체 레코드를 메모리에 모으지 않으므로 코퍼스 크기와 무관하게 메모리 일정
+#  · <OUT_PATH>.progress 에 완료된 PDF 파일명을 기록, MAKECHUNK_RESUME=1 이면 완료 파일은 건너뛰고 이어서 실행
+#    (청킹 설정이 progress 첫 줄에 기록된 설정과 다르면 처음부터 다시 생성)
+#- 병렬 추출 모드: NUM_WORKERS > 1 이면 ProcessPoolExecutor로 PDF(대용량 PDF는 PAGES_PER_TASK 페이지 구간) 단위 추출
+#  · 추출 결과는 파일명 정렬 순서대로 병합하여 순차 실행과 동일한 레코드 순서 보장
+#  · 동시에 처리 중인 PDF는 MAKECHUNK_INFLIGHT(기본 2 * NUM_WORKERS)개까지만 (해시 계산/작업 제출도 이 창 안에서)
+#    → 워커가 앞서가도 추출 결과가 코퍼스 전체만큼 쌓이지 않음, yield 한 파일의 결과는 바로 해제
+#  · 파일별 추출 소요시간 출력 + 종료 시 느린 파일 상위 목록 출력
+#- 추출 캐시: PDF 내용 sha256 + EXTRACTOR_VERSION 키로 페이지별 표/본문 원본 라인을 CACHE_DIR에 저장
+#  · 신규/변경된 PDF만 재추출, 나머지는 캐시 라인으로 정제/청킹만 다시 수행
+#  · 추출 로직(PageAnalysis, 클리핑, 셀 정제 등) 변경 시 EXTRACTOR_VERSION을 올려 캐시 무효화
 #- 처리 완료 후 총 chunk 수, CSV 매칭 실패로 스킵된 PDF 수, run 축약으로 제거된 라인 수 출력
 #- 파일명 매칭 보정 로직
 #  · basename/stem 기반 매칭
@@ -27,9 +42,12 @@
 import os
 import json
 import uuid
+import hashlib
 import re
+import time
 import unicodedata
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
 import pdfplumber
@@ -42,7 +60,14 @@ import fitz  # PyMuPDF
 # =============================
 CSV_PATH  = r"C:\Users\USER\Desktop\project_team2\data\final_classification_hierarchy.csv"
 FILES_DIR = r"C:\Users\USER\Desktop\project_team2\data\converted_pdfs"
-OUT_PATH  = r"C:\Users\USER\Desktop\project_team2\data\chunks_all_pdfs_final_final.json"
+OUT_PATH  = r"C:\Users\USER\Desktop\project_team2\data\chunks_all_pdfs_final.jsonl"
+CACHE_DIR = r"C:\Users\USER\Desktop\project_team2\data\extract_cache"
+
+# 추출 결과(표/본문 원본 라인)에 영향을 주는 코드 변경 시 올릴 것 (정제/청킹 규칙 변경은 해당 없음)
+EXTRACTOR_VERSION = "v2"
+
+# chunk_id(uuid5) 네임스페이스 - 바꾸면 모든 chunk_id가 바뀌므로 고정
+CHUNK_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "rfp-rag-assistant/chunks")
 
 TEXT_MAX_TOKENS = 1024
 TEXT_OVERLAP_LINES = 3
@@ -52,8 +77,20 @@ TOP_N = 3
 BOTTOM_N = 3
 MIN_RATIO = 0.6
 
+# 병렬 추출 설정 (NUM_WORKERS <= 1 이면 기존처럼 순차 처리)
+NUM_WORKERS = int(os.getenv("MAKECHUNK_WORKERS", os.cpu_count() or 1))
+PAGES_PER_TASK = 40  # 이보다 페이지가 많은 PDF는 페이지 구간으로 쪼개 여러 워커에 분배
+MAX_INFLIGHT_FILES = int(os.getenv("MAKECHUNK_INFLIGHT", "0")) or 2 * NUM_WORKERS  # 동시에 제출해 둘 PDF 수
+
+# 중단된 실행 이어서 하기 (progress 파일 기준)
+RESUME = os.getenv("MAKECHUNK_RESUME", "0") == "1"
+
 enc = tiktoken.get_encoding("cl100k_base")
 
+# 라인 -> 토큰 수 캐시 (프로세스 내 문서 간 공유, 상한 초과 시 비움)
+TOKEN_LEN_CACHE_MAX = 200_000
+_token_len_cache = {}
+
 
 # =============================
 # 유니코드/컨트롤 문자 방어 (추가)
@@ -100,9 +137,32 @@ def collapse_consecutive_duplicates(lines):
 # =============================
 # 1) PDF에서 표/본문 분리 추출
 # =============================
-def extract_table_lines(pl_page):
+class PageAnalysis:
+    """
+    ✅ 페이지당 표 검출(find_tables)을 1회만 수행하고 결과를 공유
+    - table_rows   : pl_page.extract_tables()와 동일한 표 행 데이터
+    - table_bboxes : 본문 클리핑(compute_non_table_strips)에 쓰는 표 영역
+    """
+    def __init__(self, pl_page):
+        self.page = pl_page
+        self.tables = pl_page.find_tables()
+
+    @property
+    def bbox(self):
+        return self.page.bbox
+
+    @property
+    def table_rows(self):
+        return [t.extract() for t in self.tables]
+
+    @property
+    def table_bboxes(self):
+        return [t.bbox for t in self.tables]
+
+
+def extract_table_lines(analysis):
     out = []
-    tables = pl_page.extract_tables()
+    tables = analysis.table_rows
     if not tables:
         return out
 
@@ -121,10 +181,6 @@ def extract_table_lines(pl_page):
     return out
 
 
-def extract_table_bboxes(pl_page):
-    return [t.bbox for t in pl_page.find_tables()]
-
-
 def safe_page_text_lines(fz_doc, page_index, pl_page, clip=None):
     """
     ✅ PyMuPDF 터지면(pdf 구조 깨짐 등) pdfplumber.extract_text로 폴백
@@ -182,18 +238,21 @@ def compute_non_table_strips(page_bbox, table_bboxes, min_height=20):
     return strips
 
 
-def extract_normal_lines_excluding_tables(fz_doc, page_index, pl_page):
-    table_bboxes = extract_table_bboxes(pl_page)
-    strips = compute_non_table_strips(pl_page.bbox, table_bboxes)
+def extract_normal_lines_excluding_tables(fz_doc, page_index, analysis):
+    strips = compute_non_table_strips(analysis.bbox, analysis.table_bboxes)
 
     lines = []
     for (x0, y0, x1, y1) in strips:
         clip = fitz.Rect(x0, y0, x1, y1)
-        lines.extend(safe_page_text_lines(fz_doc, page_index, pl_page, clip=clip))
+        lines.extend(safe_page_text_lines(fz_doc, page_index, analysis.page, clip=clip))
     return lines
 
 
-def extract_pdf_lines_separately(pdf_path):
+def extract_pdf_lines_separately(pdf_path, page_start=0, page_end=None):
+    """
+    - page_start ~ page_end(미포함) 구간만 추출 (기본값: 전체 페이지)
+    - 병렬 모드에서 대용량 PDF를 페이지 구간 단위로 나눠 처리할 때 사용
+    """
     table_pages = []
     text_pages = []
 
@@ -203,9 +262,11 @@ def extract_pdf_lines_separately(pdf_path):
         except Exception:
             fz_doc = None
 
-        for i, pl_page in enumerate(pl_pdf.pages):
-            table_pages.append(extract_table_lines(pl_page))
-            text_pages.append(extract_normal_lines_excluding_tables(fz_doc, i, pl_page))
+        for i, pl_page in enumerate(pl_pdf.pages[page_start:page_end], page_start):
+            # 표 검출은 페이지당 1회 (표 행 / 본문 클리핑 bbox 공용)
+            analysis = PageAnalysis(pl_page)
+            table_pages.append(extract_table_lines(analysis))
+            text_pages.append(extract_normal_lines_excluding_tables(fz_doc, i, analysis))
 
         if fz_doc is not None:
             fz_doc.close()
@@ -261,11 +322,27 @@ def clean_lines(lines):
 # =============================
 # 4) 청킹 + 페이지 매핑
 # =============================
-def chunk_lines_by_tokens_with_page_map(paged_lines, max_tokens, overlap_lines=3):
-    chunks, buf, buf_tok = [], [], 0
+def count_tokens_batch(lines):
+    """
+    ✅ 라인별 토큰 수를 한 번에 계산
+    - 캐시에 없는 고유 라인만 모아 enc.encode_batch 1회 호출
+    return: {라인: 토큰 수} (lines의 모든 라인 포함)
+    """
+    missing = list({l for l in lines if l not in _token_len_cache})
+    if missing:
+        if len(_token_len_cache) + len(missing) > TOKEN_LEN_CACHE_MAX:
+            _token_len_cache.clear()
+            missing = list(set(lines))
+        for l, ids in zip(missing, enc.encode_batch(missing)):
+            _token_len_cache[l] = len(ids)
+    return _token_len_cache
+
 
-    def tok_len(s):
-        return len(enc.encode(s))
+def chunk_lines_by_tokens_with_page_map(paged_lines, max_tokens, overlap_lines=3, tok_counts=None):
+    if tok_counts is None:
+        tok_counts = count_tokens_batch([l for _, l in paged_lines])
+
+    chunks, buf, buf_tok = [], [], 0
 
     def flush():
         if not buf:
@@ -276,7 +353,7 @@ def chunk_lines_by_tokens_with_page_map(paged_lines, max_tokens, overlap_lines=3
         })
 
     for page_id, line in paged_lines:
-        t = tok_len(line) + 1
+        t = tok_counts[line] + 1
 
         if t >= max_tokens:
             flush()
@@ -287,7 +364,8 @@ def chunk_lines_by_tokens_with_page_map(paged_lines, max_tokens, overlap_lines=3
         if buf_tok + t > max_tokens and buf:
             flush()
             buf[:] = buf[-overlap_lines:]
-            buf_tok = tok_len("\n".join(l for _, l in buf)) if buf else 0
+            # 오버랩 라인은 캐시된 라인별 토큰 수 합으로 계산 (재인코딩 없음)
+            buf_tok = sum(tok_counts[l] + 1 for _, l in buf)
 
         buf.append((page_id, line))
         buf_tok += t
@@ -296,7 +374,10 @@ def chunk_lines_by_tokens_with_page_map(paged_lines, max_tokens, overlap_lines=3
     return chunks
 
 
-def chunk_table_rows_with_page_map(paged_rows, max_tokens=600):
+def chunk_table_rows_with_page_map(paged_rows, max_tokens=600, tok_counts=None):
+    if tok_counts is None:
+        tok_counts = count_tokens_batch([r for _, r in paged_rows])
+
     chunks, buf, buf_tok = [], [], 0
 
     def flush():
@@ -308,7 +389,7 @@ def chunk_table_rows_with_page_map(paged_rows, max_tokens=600):
         })
 
     for page_id, r in paged_rows:
-        rt = len(enc.encode(r)) + 1
+        rt = tok_counts[r] + 1
 
         if rt >= max_tokens:
             flush()
@@ -329,7 +410,213 @@ def chunk_table_rows_with_page_map(paged_rows, max_tokens=600):
 
 
 # =============================
-# 5) 실행 (PDF 폴더 전부 처리 + CSV 메타 매칭)
+# 5) 추출 캐시 (PDF 내용 해시 기준)
+# =============================
+def file_sha256(path, bufsize=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(bufsize), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def extraction_cache_path(cache_dir, file_hash):
+    return os.path.join(cache_dir, f"{file_hash}_{EXTRACTOR_VERSION}.json")
+
+
+def load_extraction_cache(cache_dir, file_hash):
+    path = extraction_cache_path(cache_dir, file_hash)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data["table_pages"], data["text_pages"]
+    except Exception:
+        # 없음/깨짐 -> 캐시 미스로 처리
+        return None
+
+
+def save_extraction_cache(cache_dir, file_hash, fn, table_pages, text_pages):
+    """
+    ✅ tmp 파일에 쓰고 교체 -> 중간에 죽어도 깨진 캐시 파일이 남지 않음
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = extraction_cache_path(cache_dir, file_hash)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "extractor_version": EXTRACTOR_VERSION,
+            "source_file": fn,
+            "table_pages": table_pages,
+            "text_pages": text_pages,
+        }, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def make_chunk_id(source_file, content_type, text, seen):
+    """
+    ✅ 내용 기반 결정적 chunk_id (uuid5)
+    - 같은 파일 안에서 동일 텍스트 청크가 여러 번 나오면 등장 순번(seen)으로 구분
+    """
+    key = (content_type, text)
+    dup = seen[key]
+    seen[key] += 1
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{source_file}\x1f{content_type}\x1f{dup}\x1f{text}"))
+
+
+# =============================
+# 6) 병렬 추출 (프로세스 풀)
+# =============================
+def count_pdf_pages(pdf_path):
+    try:
+        with fitz.open(pdf_path) as d:
+            return d.page_count
+    except Exception:
+        pass
+    try:
+        with pdfplumber.open(pdf_path) as p:
+            return len(p.pages)
+    except Exception:
+        return 0
+
+
+def split_page_ranges(n_pages, pages_per_task):
+    """
+    - 페이지 수가 pages_per_task 이하(또는 페이지 수 확인 실패)면 파일 전체를 1개 작업으로
+    - 그 외에는 [start, end) 구간 리스트로 분할
+    """
+    if n_pages <= pages_per_task:
+        return [(0, None)]
+    return [(s, min(s + pages_per_task, n_pages)) for s in range(0, n_pages, pages_per_task)]
+
+
+def extract_pdf_task(pdf_path, page_start, page_end):
+    """
+    ✅ 워커 프로세스에서 실행되는 단위 작업 (pickle 가능하도록 모듈 최상위 함수)
+    """
+    t0 = time.perf_counter()
+    table_pages, text_pages = extract_pdf_lines_separately(pdf_path, page_start, page_end)
+    return table_pages, text_pages, time.perf_counter() - t0
+
+
+def iter_extracted_pdfs(targets, num_workers=NUM_WORKERS, pages_per_task=PAGES_PER_TASK, cache_dir=CACHE_DIR,
+                        max_inflight=MAX_INFLIGHT_FILES):
+    """
+    targets: [(파일명, pdf 경로), ...]
+    - (파일명, table_pages, text_pages, 추출 소요초, 캐시 적중 여부) 를 targets 순서 그대로 yield
+    - cache_dir가 있으면 캐시 적중 PDF는 재추출하지 않고, 새로 추출한 PDF는 캐시에 저장
+    - num_workers <= 1 : 순차 처리
+    - num_workers > 1  : 파일/페이지 구간 단위로 워커에 분배 후, 페이지 순서대로 이어붙여 병합
+      (소요초는 구간별 워커 처리시간 합계)
+    - 해시 계산/작업 제출은 max_inflight 개 파일 창 안에서만 (파일 1개를 yield 할 때마다 다음 파일 1개 제출)
+    """
+    targets = iter(targets)
+    window = deque()  # (fn, pdf_path, file_hash, cached, futures), 제출 순서 = yield 순서
+    ex = None
+
+    def submit_next():
+        nonlocal ex
+        item = next(targets, None)
+        if item is None:
+            return False
+        fn, pdf_path = item
+        file_hash = file_sha256(pdf_path) if cache_dir else None
+        cached = file_hash is not None and os.path.exists(extraction_cache_path(cache_dir, file_hash))
+        futures = None
+        if num_workers > 1 and not cached:
+            if ex is None:
+                ex = ProcessPoolExecutor(max_workers=num_workers)
+            ranges = split_page_ranges(count_pdf_pages(pdf_path), pages_per_task)
+            futures = [ex.submit(extract_pdf_task, pdf_path, s, e) for s, e in ranges]
+        window.append((fn, pdf_path, file_hash, cached, futures))
+        return True
+
+    try:
+        while len(window) < max(max_inflight, 1) and submit_next():
+            pass
+
+        while window:
+            # 꺼낸 항목은 창에서 제거 → yield 후 결과가 참조되지 않아 해제됨
+            fn, pdf_path, file_hash, cached, futures = window.popleft()
+            submit_next()
+            if cached:
+                t0 = time.perf_counter()
+                hit = load_extraction_cache(cache_dir, file_hash)
+                if hit is not None:
+                    yield fn, hit[0], hit[1], time.perf_counter() - t0, True
+                    continue
+
+            if futures is None:
+                table_pages, text_pages, elapsed = extract_pdf_task(pdf_path, 0, None)
+            else:
+                table_pages, text_pages, elapsed = [], [], 0.0
+                for fut in futures:
+                    t_pages, x_pages, sec = fut.result()
+                    table_pages.extend(t_pages)
+                    text_pages.extend(x_pages)
+                    elapsed += sec
+
+            if cache_dir:
+                save_extraction_cache(cache_dir, file_hash, fn, table_pages, text_pages)
+            yield fn, table_pages, text_pages, elapsed, False
+    finally:
+        if ex is not None:
+            ex.shutdown()
+
+
+# =============================
+# 7) JSONL 스트리밍 출력 + 이어하기
+# =============================
+def chunk_config_signature():
+    return {
+        "extractor_version": EXTRACTOR_VERSION,
+        "text_max_tokens": TEXT_MAX_TOKENS,
+        "text_overlap_lines": TEXT_OVERLAP_LINES,
+        "table_max_tokens": TABLE_MAX_TOKENS,
+        "top_n": TOP_N,
+        "bottom_n": BOTTOM_N,
+        "min_ratio": MIN_RATIO,
+    }
+
+
+def load_resume_state(out_path):
+    """
+    progress 파일에서 완료된 파일명 집합 로드
+    - progress 첫 줄(청킹 설정)이 현재 설정과 다르면 None (처음부터 다시)
+    - 출력 JSONL은 완료 파일의 레코드만 남기도록 다시 씀 (중간에 끊긴 파일/잘린 마지막 줄 제거)
+    """
+    progress_path = out_path + ".progress"
+    if not (os.path.exists(out_path) and os.path.exists(progress_path)):
+        return None
+
+    with open(progress_path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    if not lines:
+        return None
+    try:
+        if json.loads(lines[0]) != chunk_config_signature():
+            print("⚠️ 청킹 설정이 이전 실행과 달라 처음부터 다시 생성합니다.")
+            return None
+    except ValueError:
+        return None
+    done = set(l for l in lines[1:] if l)
+
+    kept = 0
+    tmp = out_path + ".tmp"
+    with open(out_path, "r", encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as dst:
+        for line in src:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get("source_file") in done:
+                dst.write(line if line.endswith("\n") else line + "\n")
+                kept += 1
+    os.replace(tmp, out_path)
+    return done, kept
+
+
+# =============================
+# 8) 실행 (PDF 폴더 전부 처리 + CSV 메타 매칭)
 # =============================
 def norm_stem(name: str) -> str:
     """
@@ -355,57 +642,45 @@ def norm_stem(name: str) -> str:
     return s.strip().rstrip(".").strip()
 
 
-df = pd.read_csv(CSV_PATH)
-
-# CSV 메타를 stem 기준으로 맵 구성 (hwp/pdf 섞여 있어도 동일 stem이면 매칭됨)
-meta_map = {}
-for _, row in df.iterrows():
-    stem = norm_stem(row.get("파일명"))
-    if not stem:
-        continue
-
-    base_meta = {
-        "source_file": row.get("파일명"),          
-        "project_name": row.get("사업명"),
-        "ordering_agency": row.get("발주 기관"),
-        "project_budget": row.get("사업 금액"),
-        "bid_start_at": row.get("입찰 참여 시작일"),
-        "bid_end_at": row.get("입찰 참여 마감일"),
-        "announcement_id": row.get("공고 번호"),
-        "announcement_round": row.get("공고 차수"),
-        "published_at": row.get("공개 일자"),
-        "summary": row.get("사업 요약"),
-        "file_type": row.get("파일형식"),
-    }
-    base_meta = {k: (None if pd.isna(v) else v) for k, v in base_meta.items()}
-    meta_map[stem] = base_meta
-
-
-records = []
+def build_meta_map(csv_path):
+    df = pd.read_csv(csv_path)
 
-# converted_pdfs 폴더 안 PDF 전부 처리
-pdf_files = [f for f in os.listdir(FILES_DIR) if f.lower().endswith(".pdf")]
-pdf_files.sort()
-
-skipped = 0
-
-# 연속 반복(run) 축약 통계
-run_removed_text = 0
-run_removed_table = 0
-
-for idx, fn in enumerate(pdf_files, 1):
-    # ✅ TQRM = 전체 진행률
-    print(f"[TQRM] {idx}/{len(pdf_files)}: {fn}")
-
-    pdf_path = os.path.join(FILES_DIR, fn)
-    stem = norm_stem(fn)
+    # CSV 메타를 stem 기준으로 맵 구성 (hwp/pdf 섞여 있어도 동일 stem이면 매칭됨)
+    meta_map = {}
+    for _, row in df.iterrows():
+        stem = norm_stem(row.get("파일명"))
+        if not stem:
+            continue
 
-    if stem not in meta_map:
-        print(f"⚠️ CSV 메타 매칭 실패 -> 스킵: {fn}")
-        skipped += 1
-        continue
+        base_meta = {
+            "source_file": row.get("파일명"),          
+            "project_name": row.get("사업명"),
+            "ordering_agency": row.get("발주 기관"),
+            "project_budget": row.get("사업 금액"),
+            "bid_start_at": row.get("입찰 참여 시작일"),
+            "bid_end_at": row.get("입찰 참여 마감일"),
+            "announcement_id": row.get("공고 번호"),
+            "announcement_round": row.get("공고 차수"),
+            "published_at": row.get("공개 일자"),
+            "summary": row.get("사업 요약"),
+            "file_type": row.get("파일형식"),
+        }
+        base_meta = {k: (None if pd.isna(v) else v) for k, v in base_meta.items()}
+        meta_map[stem] = base_meta
+    return meta_map
+
+
+def build_chunk_records(fn, base_meta, table_pages, text_pages):
+    """
+    추출된 페이지별 표/본문 라인 -> 정제 -> 청킹 -> 레코드
+    return: (records, text 청크 수, table 청크 수, run 축약 text 라인 수, run 축약 table 라인 수)
+    """
+    records = []
+    run_removed_text = 0
+    run_removed_table = 0
+    seen = Counter()
 
-    base_meta = dict(meta_map[stem])
+    base_meta = dict(base_meta)
 
     # ✅ source_file은 "실제로 청킹한 변환 PDF 파일명"으로 저장
     base_meta["source_file"] = fn
@@ -414,7 +689,7 @@ for idx, fn in enumerate(pdf_files, 1):
     summary_text = strip_controls(safe_str(base_meta.get("summary")).strip())
     if summary_text:
         records.append({
-            "chunk_id": str(uuid.uuid4()),
+            "chunk_id": make_chunk_id(fn, "summary", summary_text, seen),
             "pages": [],
             **base_meta,
             "text": summary_text,
@@ -425,8 +700,6 @@ for idx, fn in enumerate(pdf_files, 1):
             }
         })
 
-    table_pages, text_pages = extract_pdf_lines_separately(pdf_path)
-
     table_pages = remove_repeating_header_footer(table_pages, top_n=TOP_N, bottom_n=BOTTOM_N, min_ratio=MIN_RATIO)
     text_pages  = remove_repeating_header_footer(text_pages,  top_n=TOP_N, bottom_n=BOTTOM_N, min_ratio=MIN_RATIO)
 
@@ -448,13 +721,18 @@ for idx, fn in enumerate(pdf_files, 1):
         new_table_pages.append(p2)
     table_pages = new_table_pages
 
-    # ---- text ----
     paged_text = [(pid, l) for pid, p in enumerate(text_pages, 1) for l in p]
-    text_chunks = chunk_lines_by_tokens_with_page_map(paged_text, TEXT_MAX_TOKENS, TEXT_OVERLAP_LINES)
+    paged_tables = [(pid, r) for pid, p in enumerate(table_pages, 1) for r in p]
+
+    # ✅ 문서 전체(본문 + 표) 라인 토큰 수를 한 번에 계산
+    tok_counts = count_tokens_batch([l for _, l in paged_text] + [r for _, r in paged_tables])
+
+    # ---- text ----
+    text_chunks = chunk_lines_by_tokens_with_page_map(paged_text, TEXT_MAX_TOKENS, TEXT_OVERLAP_LINES, tok_counts)
 
     for i, ch in enumerate(text_chunks):
         records.append({
-            "chunk_id": str(uuid.uuid4()),
+            "chunk_id": make_chunk_id(fn, "text", ch["text"], seen),
             "pages": ch["pages"],
             **base_meta,
             "text": ch["text"],
@@ -466,12 +744,11 @@ for idx, fn in enumerate(pdf_files, 1):
         })
 
     # ---- table ----
-    paged_tables = [(pid, r) for pid, p in enumerate(table_pages, 1) for r in p]
-    table_chunks = chunk_table_rows_with_page_map(paged_tables, TABLE_MAX_TOKENS)
+    table_chunks = chunk_table_rows_with_page_map(paged_tables, TABLE_MAX_TOKENS, tok_counts)
 
     for i, ch in enumerate(table_chunks):
         records.append({
-            "chunk_id": str(uuid.uuid4()),
+            "chunk_id": make_chunk_id(fn, "table", ch["text"], seen),
             "pages": ch["pages"],
             **base_meta,
             "text": ch["text"],
@@ -482,14 +759,89 @@ for idx, fn in enumerate(pdf_files, 1):
             }
         })
 
-    print(f"✅ 처리 완료: {fn} (text={len(text_chunks)}, table={len(table_chunks)})")
+    return records, len(text_chunks), len(table_chunks), run_removed_text, run_removed_table
+
+
+def main():
+    meta_map = build_meta_map(CSV_PATH)
+
+    # converted_pdfs 폴더 안 PDF 전부 처리
+    pdf_files = [f for f in os.listdir(FILES_DIR) if f.lower().endswith(".pdf")]
+    pdf_files.sort()
+
+    skipped = 0
+
+    # 연속 반복(run) 축약 통계
+    run_removed_text = 0
+    run_removed_table = 0
+
+    resume_state = load_resume_state(OUT_PATH) if RESUME else None
+    done_files, total_chunks = resume_state if resume_state else (set(), 0)
+    if resume_state:
+        print(f"▶ 이어하기: 완료 {len(done_files)}개 파일 / {total_chunks}개 청크 유지")
+
+    targets = []
+    for fn in pdf_files:
+        if norm_stem(fn) not in meta_map:
+            print(f"⚠️ CSV 메타 매칭 실패 -> 스킵: {fn}")
+            skipped += 1
+            continue
+        if fn in done_files:
+            continue
+        targets.append((fn, os.path.join(FILES_DIR, fn)))
+
+    mode = "a" if resume_state else "w"
+    out_f = open(OUT_PATH, mode, encoding="utf-8")
+    progress_f = open(OUT_PATH + ".progress", mode, encoding="utf-8")
+    if not resume_state:
+        progress_f.write(json.dumps(chunk_config_signature()) + "\n")
+        progress_f.flush()
+
+    print(f"workers: {NUM_WORKERS} (pages_per_task={PAGES_PER_TASK}), cache: {CACHE_DIR} ({EXTRACTOR_VERSION})")
+    t_start = time.perf_counter()
+    timings = []
+    cache_hits = 0
+
+    extracted = iter_extracted_pdfs(targets, NUM_WORKERS, PAGES_PER_TASK, CACHE_DIR)
+    for idx, (fn, table_pages, text_pages, elapsed, cached) in enumerate(extracted, 1):
+        # ✅ TQRM = 전체 진행률
+        print(f"[TQRM] {idx}/{len(targets)}: {fn}")
+
+        base_meta = meta_map[norm_stem(fn)]
+        file_records, n_text, n_table, removed_text, removed_table = build_chunk_records(
+            fn, base_meta, table_pages, text_pages
+        )
+        # ✅ 파일 단위로 바로 기록 -> progress에 완료 표시 (레코드가 먼저 flush 된 뒤에만 완료 처리)
+        out_f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in file_records))
+        out_f.flush()
+        progress_f.write(fn + "\n")
+        progress_f.flush()
+        total_chunks += len(file_records)
+
+        run_removed_text += removed_text
+        run_removed_table += removed_table
+        if cached:
+            cache_hits += 1
+        else:
+            timings.append((elapsed, fn))
+
+        src = "cache" if cached else "extract"
+        print(f"✅ 처리 완료: {fn} (text={n_text}, table={n_table}, {src}={elapsed:.2f}s)")
+
+    out_f.close()
+    progress_f.close()
 
+    print("saved:", OUT_PATH)
+    print("total chunks:", total_chunks)
+    print("skipped pdfs (no csv meta):", skipped)
+    print("run_removed_text_lines:", run_removed_text)
+    print("run_removed_table_lines:", run_removed_table)
+    print(f"extract cache hits: {cache_hits}/{len(targets)}")
+    print(f"elapsed: {time.perf_counter() - t_start:.1f}s (workers={NUM_WORKERS})")
+    print("slowest pdfs (extract):")
+    for sec, fn in sorted(timings, reverse=True)[:5]:
+        print(f"  {sec:7.2f}s  {fn}")
 
-with open(OUT_PATH, "w", encoding="utf-8") as f:
-    json.dump(records, f, ensure_ascii=False, indent=2)
 
-print("saved:", OUT_PATH)
-print("total chunks:", len(records))
-print("skipped pdfs (no csv meta):", skipped)
-print("run_removed_text_lines:", run_removed_text)
-print("run_removed_table_lines:", run_removed_table)
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,23 @@
 #==================================================================
 # 프로그램명: upload_chunks_final.py
 # 설명:
-# - 새로 생성한 chunks_all_pdfs_final.json 로드
+# - 새로 생성한 chunks_all_pdfs_final.jsonl 을 1줄씩 지연 로드 (전체를 메모리에 올리지 않음)
+#   · makechunk_smk_final.py가 파일 단위로 연속 기록하므로 source_file 단위 그룹만 정렬해서 처리
+#   · 기존 .json(리스트) 파일도 그대로 지원
 # - final_classification_hierarchy.csv에서 summary/category/depth 등 메타를 파일명 기준으로 매칭
 # - prev_context n_token을 같은 source_file 내 chunk_index 순서로 누적하여 embedding 입력에 포함
-# - documents_chunks_smk_2에 upsert(충돌 방지: chunk_id 기준)
+# - embedding은 embedding_batch.py로 토큰 예산 단위 배치 요청 (429 등은 백오프 재시도, 결과는 청크 순서 유지)
+#   · 요청 전 공용 임베딩 저장소(src/rag/embed/embedding_store.py) 조회 → 입력이 같으면 재임베딩하지 않음
+# - asyncio 파이프라인: 배치 생성(prev_context 선계산) -> embedding 워커 N개 -> DB upsert 워커 M개
+#   · 단계 사이는 크기 제한 큐(UPLOAD_QUEUE_SIZE)로 연결해 앞 단계가 너무 앞서가지 않게 함(backpressure)
+#   · embedding 요청과 DB 쓰기가 겹쳐서 진행되므로 처리량은 API 한도에만 묶임
+#   · 동시성: UPLOAD_EMBED_CONCURRENCY / UPLOAD_UPSERT_CONCURRENCY 환경변수
+# - 체크포인트 저널(upload_journal.py, data/upload_journal_smk.sqlite)
+#   · chunk_id -> input_hash / embedding_hash / 상태(embedded/upserted/failed)
+#   · 재실행 시 같은 입력으로 이미 upsert된 청크는 건너뜀 (prev_context 선계산은 전체 대상으로 유지)
+#   · --retry-failed : upload_failed_chunks_smk_2.txt 에 기록된 chunk_id만 다시 처리
+# - RAG_CHUNKS_TABLE(기본 documents_chunks_smk_4, src/rag/chunk_table.py)에 upsert(충돌 방지: chunk_id 기준)
+#   · bulk_upsert.py로 행 개수/페이로드 바이트 제한 배치 단위 upsert, 거부된 배치는 bisect로 실패 행만 골라 기록
 # - 파일명 매칭: trim + NBSP/BOM 제거 + basename + stem(strip) 매칭 + 보조키(공백/구분자 정규화) 매칭
 # - 텍스트 내 \u0000 같은 NUL 제거(Postgres text/JSON/embedding 입력 안전)
 # - timestamptz 입력 안전: "YYYY-MM-DD HH:MM:SS" -> ISO8601로 정규화
@@ -13,6 +26,12 @@
 #      "[사업 요약]\n{요약텍스트}"
 # - metadata.embedding_source:
 #   "project_name + metadata + prev_context + text (summary chunk: text is labeled)"
+# - 실행방법: python -m src.processing.upload_chunks_final [--retry-failed]
+#   (로컬 테스트: fake_embedding_server.py 실행 후 OPENAI_BASE_URL=http://127.0.0.1:8765/v1 지정)
+# - 업로드 종료(중단 포함) 시 upsert 된 사업명을 업로드 매니페스트(src/rag/upload_manifest.py)에 기록
+#   · 앱의 답변 캐시(answer_cache.py)가 해당 사업의 캐시 답변을 무효화
+# - ngram_text: 텍스트의 문자 bigram (SQL make_ngram(text, 2)와 같은 형태, bm25_index.char_bigrams)
+#   · match_<테이블>_bm25_ngram RPC 가 이 컬럼만 검색하므로 비어 있으면 BM25 검색에 나오지 않음
 #==================================================================
 
 from supabase import create_client
@@ -20,32 +39,62 @@ from dotenv import load_dotenv
 from openai import OpenAI
 import os
 import json
+import asyncio
+import argparse
 import re
+from itertools import groupby
 import pandas as pd
 import tiktoken
 from pathlib import Path
 from tqdm import tqdm
 
+from src.processing.embedding_batch import EMBED_MODEL, embed_batch, iter_token_batches
+from src.processing.bulk_upsert import upsert_rows_bulk
+from src.processing.upload_journal import UploadJournal, input_hash
+from src.rag.chunk_table import RAG_CHUNKS_TABLE
+from src.rag.upload_manifest import bump_versions
+from src.rag.embed.embedding_store import get_embedding_store
+from src.retrieval.bm25_index import char_bigrams
+
 BASE_DIR = Path(__file__).resolve().parents[1]
 ENV_PATH = BASE_DIR / ".env"
 load_dotenv(dotenv_path=ENV_PATH)
 
-SUPABASE_URL = os.environ["SUPABASE_URL"]
-SUPABASE_KEY = os.environ["SUPABASE_SERVICE_KEY"]
-OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
-
-TABLE_NAME = "documents_chunks_smk_3"
+TABLE_NAME = RAG_CHUNKS_TABLE  # 앱 검색 RPC 와 같은 테이블 (src/rag/chunk_table.py)
 CSV_PATH = BASE_DIR / "data" / "final_classification_hierarchy.csv"
 
-CHUNKS_JSON_PATH = BASE_DIR / "data" / "chunks_all_pdfs_final.json"
+CHUNKS_JSON_PATH = BASE_DIR / "data" / "chunks_all_pdfs_final.jsonl"
+JOURNAL_PATH = BASE_DIR / "data" / "upload_journal_smk.sqlite"
+NO_MATCH_PATH = BASE_DIR / "data" / "embedding_no_match_files_smk_2.txt"
+FAILED_PATH = BASE_DIR / "data" / "upload_failed_chunks_smk_2.txt"
 
 PREV_CONTEXT_TOKENS = 300
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+EMBED_CONCURRENCY = int(os.getenv("UPLOAD_EMBED_CONCURRENCY", "4"))
+UPSERT_CONCURRENCY = int(os.getenv("UPLOAD_UPSERT_CONCURRENCY", "2"))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", "8"))  # 큐당 대기 배치 수
 
 enc = tiktoken.get_encoding("cl100k_base")
 
+# -----------------------------
+# clients (처음 쓸 때 생성)
+# - 모듈 import만으로는 환경변수/네트워크가 필요 없도록 (build_local_index 등에서 helper 재사용)
+# -----------------------------
+_supabase = None
+_openai_client = None
+
+def get_supabase():
+    global _supabase
+    if _supabase is None:
+        _supabase = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_KEY"])
+    return _supabase
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    return _openai_client
+
 # -----------------------------
 # helpers (string / filename)
 # -----------------------------
@@ -119,12 +168,11 @@ def to_iso_timestamptz_or_none(v):
 # -----------------------------
 # embedding
 # -----------------------------
-def embed_text(text: str) -> list[float]:
-    resp = openai_client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
+def embed_texts_batch(texts: list[str]) -> list[list[float]]:
+    # 저장소에 없는 입력만 1회 요청으로 (재시도/순서 보장은 embedding_batch.embed_batch)
+    return get_embedding_store().get_or_embed(
+        EMBED_MODEL, texts, lambda missing: embed_batch(get_openai_client(), missing, EMBED_MODEL)
     )
-    return resp.data[0].embedding
 
 def last_n_tokens(text: str, n_tokens: int) -> str:
     text = strip_nul(text or "")
@@ -237,9 +285,13 @@ def build_embedding_input(chunk: dict, prev_context: str) -> str:
     return "\n".join([p for p in parts if p]).strip()
 
 # -----------------------------
-# build row for DB insert (documents_chunks_smk_2)
+# build row for DB insert (RAG_CHUNKS_TABLE)
 # - metadata에서 depth_1/depth_2/summary 제외
+# - ngram_text: BM25 RPC 검색 대상 (공백 구분 문자 bigram)
 # -----------------------------
+def make_ngram_text(text: str) -> str:
+    return " ".join(char_bigrams(text))
+
 def build_db_row(chunk: dict, csv_meta: dict | None, embedding: list[float]):
     md = chunk.get("metadata") or {}
     content_type = md.get("content_type")
@@ -279,6 +331,7 @@ def build_db_row(chunk: dict, csv_meta: dict | None, embedding: list[float]):
         "bid_end_at": to_iso_timestamptz_or_none(chunk.get("bid_end_at")),
 
         "text": strip_nul(chunk.get("text") or ""),
+        "ngram_text": make_ngram_text(strip_nul(chunk.get("text") or "")),
         "length": to_int_or_none(chunk.get("length")) or len(strip_nul(chunk.get("text") or "")),
 
         "content_type": content_type,
@@ -292,45 +345,69 @@ def build_db_row(chunk: dict, csv_meta: dict | None, embedding: list[float]):
     }
 
 # -----------------------------
-# main
+# chunk 로드 (JSONL 지연 로드)
 # -----------------------------
-def main():
-    stem_map, loose_map = build_csv_meta_map(CSV_PATH)
-    print("CSV meta(stem) count:", len(stem_map))
-    print("CSV meta(loose) count:", len(loose_map))
-
-    with open(CHUNKS_JSON_PATH, "r", encoding="utf-8") as f:
-        chunks = json.load(f)
-
-    print("Chunks loaded:", len(chunks))
-
-    # ✅ 같은 파일 내에서 summary -> text -> table 순서로 고정 (prev_context 흐름 안정화)
-    def key_fn(c):
-        sf = c.get("source_file") or ""
-        md = c.get("metadata") or {}
-        ct = md.get("content_type") or ""
-
-        type_rank = {"summary": 0, "text": 1, "table": 2}.get(ct, 9)
-
-        ci = md.get("chunk_index")
-        try:
-            ci = int(ci)
-        except Exception:
-            ci = 0
+def iter_chunks(path: Path):
+    """
+    - .jsonl : 1줄씩 yield (깨진 줄은 경고 후 건너뜀 - 중단된 청킹 실행의 잘린 마지막 줄 등)
+    - 그 외   : 기존 json 리스트 파일
+    """
+    if path.suffix.lower() != ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"⚠️ JSONL 파싱 실패 -> 스킵: line {line_no}")
+
+def count_chunks(path: Path) -> int:
+    if path.suffix.lower() != ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            return len(json.load(f))
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+# ✅ 같은 파일 내에서 summary -> text -> table 순서로 고정 (prev_context 흐름 안정화)
+def chunk_sort_key(c):
+    sf = c.get("source_file") or ""
+    md = c.get("metadata") or {}
+    ct = md.get("content_type") or ""
+
+    type_rank = {"summary": 0, "text": 1, "table": 2}.get(ct, 9)
+
+    ci = md.get("chunk_index")
+    try:
+        ci = int(ci)
+    except Exception:
+        ci = 0
 
-        return (norm_basename(sf), type_rank, ci)
+    return (norm_basename(sf), type_rank, ci)
 
-    chunks = sorted(chunks, key=key_fn)
-
-    no_match_files = set()
-    inserted = 0
-    failed = 0
-    failed_rows = []  # ✅ 실패 chunk_id/파일명 기록
+def iter_sorted_by_file(chunks):
+    """
+    source_file이 연속된 구간(=파일 1개) 단위로만 정렬해서 yield
+    - 메모리에는 파일 1개 분량의 청크만 유지
+    """
+    for _, group in groupby(chunks, key=lambda c: norm_basename(c.get("source_file") or "")):
+        yield from sorted(group, key=chunk_sort_key)
 
+# -----------------------------
+# prev_context 선계산 (순차, 저비용)
+# - 같은 source_file 내 직전 청크의 마지막 PREV_CONTEXT_TOKENS 토큰
+# - embedding 입력까지 만들어 (chunk, csv_meta, embedding_input) 으로 yield
+# -----------------------------
+def iter_upload_jobs(chunks, stem_map: dict, loose_map: dict, no_match_files: set):
     prev_file = None
     prev_tail = ""
 
-    for chunk in tqdm(chunks, desc="Uploading chunks", unit="chunk"):
+    for chunk in chunks:
         source_file = chunk.get("source_file") or ""
         cur_file = norm_basename(source_file)
 
@@ -343,34 +420,192 @@ def main():
         if not csv_meta:
             no_match_files.add(source_file)
 
-        prev_context = prev_tail
-
         emb_input = build_embedding_input(
             chunk=chunk,
-            prev_context=prev_context
+            prev_context=prev_tail
         )
-
-        try:
-            emb = embed_text(emb_input)
-            row = build_db_row(chunk, csv_meta, emb)
-            supabase.table(TABLE_NAME).upsert(row, on_conflict="chunk_id").execute()
-            inserted += 1
-        except Exception as e:
-            failed += 1
-            failed_rows.append((chunk.get("chunk_id"), source_file, str(e)))
-            print(f"\n❌ upload fail chunk_id={chunk.get('chunk_id')} file={source_file}\n   {e}\n")
+        yield chunk, csv_meta, emb_input
 
         # 다음 chunk를 위한 prev_tail 갱신
         prev_tail = last_n_tokens(chunk.get("text") or "", PREV_CONTEXT_TOKENS)
 
+# -----------------------------
+# 저널 기준 처리 대상 필터
+# - 이미 같은 input_hash로 upsert된 청크 / (--retry-failed 시) 실패 목록에 없는 청크는 건너뜀
+# - (chunk, csv_meta, embedding_input, input_hash) 으로 yield
+# -----------------------------
+def iter_pending_jobs(jobs, upserted: dict, only_ids: set | None, stats: dict):
+    for chunk, csv_meta, emb_input in jobs:
+        cid = chunk.get("chunk_id")
+        if only_ids is not None and cid not in only_ids:
+            stats["skipped"] += 1
+            continue
+        ih = input_hash(TABLE_NAME, EMBED_MODEL, emb_input, csv_meta)
+        if upserted.get(cid) == ih:
+            stats["skipped"] += 1
+            continue
+        yield chunk, csv_meta, emb_input, ih
+
+def load_failed_chunk_ids(path: Path) -> set:
+    ids = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            cid = line.split("\t", 1)[0].strip()
+            if cid and cid != "None":
+                ids.add(cid)
+    return ids
+
+# -----------------------------
+# 동시 업로드 파이프라인 (embedding / upsert 겹쳐 실행)
+# - 블로킹 호출(배치 생성, embedding, upsert)은 asyncio.to_thread로 실행
+# - stats/pbar/저널 갱신은 이벤트 루프 스레드에서만 하므로 락 불필요
+#   (stats["skipped"]만 배치 생성 스레드에서 증가, pbar 반영은 생산자 코루틴에서)
+# - 종료: 생산자 -> embedding 워커 -> upsert 워커 순으로 None(sentinel) 전달
+# -----------------------------
+def record_failed(stats: dict, chunk_id, source_file: str, err: str):
+    stats["failed"] += 1
+    stats["failed_rows"].append((chunk_id, source_file or "", err))
+
+async def run_pipeline(batches, stats: dict, pbar, journal: UploadJournal | None = None,
+                       embed_concurrency: int = EMBED_CONCURRENCY,
+                       upsert_concurrency: int = UPSERT_CONCURRENCY,
+                       queue_size: int = UPLOAD_QUEUE_SIZE):
+    embed_q = asyncio.Queue(maxsize=queue_size)
+    upsert_q = asyncio.Queue(maxsize=queue_size)
+
+    async def producer():
+        # prev_context는 여기(순차)에서 이미 계산되어 있으므로 이후 단계는 순서와 무관
+        shown_skipped = 0
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            pbar.update(stats["skipped"] - shown_skipped)
+            shown_skipped = stats["skipped"]
+            if batch is None:
+                break
+            await embed_q.put(batch)
+        for _ in range(embed_concurrency):
+            await embed_q.put(None)
+
+    async def embed_worker():
+        while True:
+            batch = await embed_q.get()
+            if batch is None:
+                return
+            hashes = {chunk.get("chunk_id"): ih for chunk, _, _, ih in batch}
+            try:
+                embeddings = await asyncio.to_thread(embed_texts_batch, [emb_input for _, _, emb_input, _ in batch])
+            except Exception as e:
+                # 재시도 후에도 실패한 배치는 배치 내 청크 전부 실패로 기록
+                for chunk, _, _, _ in batch:
+                    record_failed(stats, chunk.get("chunk_id"), chunk.get("source_file"), f"embedding: {e}")
+                if journal:
+                    journal.mark_failed([(cid, ih, f"embedding: {e}") for cid, ih in hashes.items()])
+                print(f"\n❌ embedding fail batch({len(batch)} chunks)\n   {e}\n")
+                pbar.update(len(batch))
+                continue
+
+            if journal:
+                journal.mark_embedded([(chunk.get("chunk_id"), ih, emb) for (chunk, _, _, ih), emb in zip(batch, embeddings)])
+
+            rows = []
+            for (chunk, csv_meta, _, ih), emb in zip(batch, embeddings):
+                try:
+                    rows.append(build_db_row(chunk, csv_meta, emb))
+                except Exception as e:
+                    record_failed(stats, chunk.get("chunk_id"), chunk.get("source_file"), str(e))
+                    if journal:
+                        journal.mark_failed([(chunk.get("chunk_id"), ih, str(e))])
+            await upsert_q.put((len(batch), rows, hashes))
+
+    async def upsert_worker():
+        while True:
+            item = await upsert_q.get()
+            if item is None:
+                return
+            n_chunks, rows, hashes = item
+            # ✅ 배치 upsert (거부 시 bisect로 실패 행만 분리)
+            ok, rejected = await asyncio.to_thread(upsert_rows_bulk, get_supabase(), TABLE_NAME, rows, "chunk_id")
+            stats["inserted"] += ok
+            for row, err in rejected:
+                record_failed(stats, row.get("chunk_id"), row.get("source_file"), err)
+                print(f"\n❌ upload fail chunk_id={row.get('chunk_id')} file={row.get('source_file')}\n   {err}\n")
+            rejected_ids = {row.get("chunk_id") for row, _ in rejected}
+            stats["projects"].update(row.get("project_name") for row in rows if row["chunk_id"] not in rejected_ids)
+            if journal:
+                journal.mark_upserted([row["chunk_id"] for row in rows if row["chunk_id"] not in rejected_ids])
+                journal.mark_failed([(row.get("chunk_id"), hashes.get(row.get("chunk_id")), err) for row, err in rejected])
+            pbar.update(n_chunks)
+
+    writers = [asyncio.create_task(upsert_worker()) for _ in range(upsert_concurrency)]
+    await asyncio.gather(producer(), *(embed_worker() for _ in range(embed_concurrency)))
+    for _ in writers:
+        await upsert_q.put(None)
+    await asyncio.gather(*writers)
+
+# -----------------------------
+# main
+# -----------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="청크 embedding + Supabase 업로드")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help=f"{FAILED_PATH.name} 에 기록된 chunk_id만 다시 처리")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    only_ids = None
+    if args.retry_failed:
+        if not FAILED_PATH.exists():
+            print("실패 목록 없음:", FAILED_PATH)
+            return
+        only_ids = load_failed_chunk_ids(FAILED_PATH)
+        print("retry failed chunks:", len(only_ids))
+
+    journal = UploadJournal(JOURNAL_PATH)
+    upserted = journal.upserted_hashes()
+    print("journal(upserted):", len(upserted))
+
+    stem_map, loose_map = build_csv_meta_map(CSV_PATH)
+    print("CSV meta(stem) count:", len(stem_map))
+    print("CSV meta(loose) count:", len(loose_map))
+
+    total = count_chunks(CHUNKS_JSON_PATH)
+    print("Chunks found:", total)
+
+    chunks = iter_sorted_by_file(iter_chunks(CHUNKS_JSON_PATH))
+
+    no_match_files = set()
+    stats = {"inserted": 0, "failed": 0, "skipped": 0, "failed_rows": [],  # ✅ 실패 chunk_id/파일명 기록
+             "projects": set()}  # upsert 된 사업명 (업로드 매니페스트 기록용)
+
+    # prev_context는 전체 청크 기준으로 계산한 뒤 저널/재시도 대상 필터 적용
+    jobs = iter_upload_jobs(chunks, stem_map, loose_map, no_match_files)
+    jobs = iter_pending_jobs(jobs, upserted, only_ids, stats)
+    batches = iter_token_batches(jobs, text_of=lambda j: j[2])
+
+    try:
+        with tqdm(total=total, desc="Uploading chunks", unit="chunk") as pbar:
+            asyncio.run(run_pipeline(batches, stats, pbar, journal))
+    finally:
+        journal_counts = journal.counts()
+        journal.close()
+        if stats["projects"]:
+            manifest = bump_versions(stats["projects"])
+            print(f"upload manifest: version={manifest['version']} projects={len(stats['projects'])}")
+
+    inserted = stats["inserted"]
+    failed = stats["failed"]
+    failed_rows = stats["failed_rows"]
+
     # CSV 매칭 실패 파일 저장
-    out_path = BASE_DIR / "data" / "embedding_no_match_files_smk_2.txt"
+    out_path = NO_MATCH_PATH
     with open(out_path, "w", encoding="utf-8") as f:
         for fn in sorted(no_match_files):
             f.write(fn + "\n")
 
     # 업로드 실패 chunk 저장
-    fail_path = BASE_DIR / "data" / "upload_failed_chunks_smk_2.txt"
+    fail_path = FAILED_PATH
     with open(fail_path, "w", encoding="utf-8") as f:
         for cid, fn, err in failed_rows:
             f.write(f"{cid}\t{fn}\t{err}\n")
@@ -378,6 +613,8 @@ def main():
     print("\n=== DONE ===")
     print("inserted/upserted:", inserted)
     print("failed:", failed)
+    print("skipped(journal/retry):", stats["skipped"])
+    print("journal:", journal_counts)
     print("no_match_files:", len(no_match_files))
     print("saved(no_match_files):", out_path)
     print("saved(failed_chunks):", fail_path)
@@ -0,0 +1,117 @@
+#==================================================================
+# 프로그램명: upload_journal.py
+# 설명:
+# - upload_chunks_final.py 재실행/중단 복구용 로컬 체크포인트 저널 (SQLite, 표준 라이브러리만 사용)
+# - chunk_id 별 상태 기록:
+#   · input_hash     : embedding 입력 + CSV 메타 + 대상 테이블/모델 해시 (내용이 바뀌면 다시 업로드)
+#   · embedding_hash : 받은 embedding(float32 바이트) 해시
+#   · status         : embedded / upserted / failed (+ error)
+# - 같은 input_hash로 upserted 된 청크는 재실행 시 건너뜀 (embedding 비용 재지불 방지)
+# - 접근은 업로드 파이프라인의 이벤트 루프 스레드에서만 함 (배치 단위로 commit)
+#==================================================================
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+STATUS_EMBEDDED = "embedded"
+STATUS_UPSERTED = "upserted"
+STATUS_FAILED = "failed"
+
+
+def input_hash(table_name: str, model: str, emb_input: str, csv_meta: dict | None) -> str:
+    h = hashlib.sha256()
+    for part in (table_name, model, emb_input, json.dumps(csv_meta or {}, ensure_ascii=False, sort_keys=True)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def embedding_hash(embedding) -> str:
+    return hashlib.sha256(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+
+class UploadJournal:
+    def __init__(self, path: Path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS upload_journal (
+                chunk_id       TEXT PRIMARY KEY,
+                input_hash     TEXT NOT NULL,
+                embedding_hash TEXT,
+                status         TEXT NOT NULL,
+                error          TEXT,
+                updated_at     REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def upserted_hashes(self) -> dict:
+        """status=upserted 인 chunk_id -> input_hash"""
+        cur = self.conn.execute(
+            "SELECT chunk_id, input_hash FROM upload_journal WHERE status = ?", (STATUS_UPSERTED,)
+        )
+        return dict(cur.fetchall())
+
+    def failed_ids(self) -> set:
+        cur = self.conn.execute("SELECT chunk_id FROM upload_journal WHERE status = ?", (STATUS_FAILED,))
+        return {r[0] for r in cur.fetchall()}
+
+    def mark_embedded(self, items):
+        """items: [(chunk_id, input_hash, embedding), ...]"""
+        now = time.time()
+        self.conn.executemany(
+            """
+            INSERT INTO upload_journal (chunk_id, input_hash, embedding_hash, status, error, updated_at)
+            VALUES (?, ?, ?, ?, NULL, ?)
+            ON CONFLICT(chunk_id) DO UPDATE SET
+                input_hash = excluded.input_hash,
+                embedding_hash = excluded.embedding_hash,
+                status = excluded.status,
+                error = NULL,
+                updated_at = excluded.updated_at
+            """,
+            [(cid, ih, embedding_hash(emb), STATUS_EMBEDDED, now) for cid, ih, emb in items],
+        )
+        self.conn.commit()
+
+    def mark_upserted(self, chunk_ids):
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE upload_journal SET status = ?, error = NULL, updated_at = ? WHERE chunk_id = ?",
+            [(STATUS_UPSERTED, now, cid) for cid in chunk_ids],
+        )
+        self.conn.commit()
+
+    def mark_failed(self, items):
+        """items: [(chunk_id, input_hash, error), ...]"""
+        now = time.time()
+        self.conn.executemany(
+            """
+            INSERT INTO upload_journal (chunk_id, input_hash, embedding_hash, status, error, updated_at)
+            VALUES (?, ?, NULL, ?, ?, ?)
+            ON CONFLICT(chunk_id) DO UPDATE SET
+                input_hash = excluded.input_hash,
+                status = excluded.status,
+                error = excluded.error,
+                updated_at = excluded.updated_at
+            """,
+            [(cid, ih, STATUS_FAILED, err, now) for cid, ih, err in items],
+        )
+        self.conn.commit()
+
+    def counts(self) -> dict:
+        cur = self.conn.execute("SELECT status, COUNT(*) FROM upload_journal GROUP BY status")
+        return dict(cur.fetchall())
+
+    def close(self):
+        self.conn.close()
@@ -1,14 +1,29 @@
+import glob
 import os
+import threading
+import time
 import yaml
 
+from src.prompts.context_packer import budget_for, get_token_counter, pack_context, pack_text
+
 #==============================================
 # 프로그램명: RAGPromptBuilder.py
 # 폴더위치: src/prompts/RAGPromptBuilder.py
 # 프로그램 설명: 선택한 사업의 분류에 따라서 다른 상세 프롬프트를 배정하는 클래스
 # 작성이력: 25.12.17 한상준 최초 작성
 # 25.12.23 한상준 build_message 함수 수정 (history 부분 프롬프트 배치 변경)
+# context 글자 수 자르기(str(context)[:30000]) → 백엔드별 토큰 예산 패킹 (context_packer.py), 패킹 통계 last_pack_stats
+# 패킹된 참고 문서 문자열 last_packed_context 노출 (app.py 디버깅 표시용)
+# 토큰 수 함수는 context_packer.get_token_counter 로 백엔드별 1회 생성 후 재사용
+# extract_*.yaml 페르소나 생성 시 일괄 로드 + mtime 변경 시 재로드 (PROMPT_RELOAD_INTERVAL 초마다 확인),
+#   (category, title) 라우팅 결과 메모이즈, prompt_dir 인자 반영, 시간 측정: bench_prompt_builder.py
+# 시스템 프롬프트 조립을 build_system_prompt() 로 분리 (bench_prompt_builder.py 가 이 구간만 측정)
 #===============================================
 
+PROMPT_RELOAD_INTERVAL = float(os.getenv("PROMPT_RELOAD_INTERVAL", "2.0"))  # 파일 변경 확인 주기 (초), 0 이면 매번
+ROUTE_CACHE_SIZE = 1024
+DEFAULT_PERSONA = "B2G 공공입찰 컨설팅 AI"
+
 class RAGPromptBuilder:
     def __init__(self, prompt_dir):
         """
@@ -16,8 +31,8 @@ class RAGPromptBuilder:
         객체 생성 시 프롬프트 파일이 저장된 경로를 고정하고, 
         대화의 기본 골격인 rag_chat_core.yaml을 미리 로드하여 성능을 최적화합니다.
         """
-        self.prompt_dir = os.path.dirname(os.path.abspath(__file__))
-        self.core_path = os.path.join(prompt_dir, 'rag_chat_core.yaml')
+        self.prompt_dir = prompt_dir or os.path.dirname(os.path.abspath(__file__))
+        self.core_path = os.path.join(self.prompt_dir, 'rag_chat_core.yaml')
         
         if os.path.exists(self.core_path):
             with open(self.core_path, 'r', encoding='utf-8') as f:
@@ -28,8 +43,40 @@ class RAGPromptBuilder:
                 'system_prompt_template': "당신은 {domain} 전문가입니다. {role}로서 답변하세요.",
                 'user_prompt_template': "### 참고 문서\n{context}\n\n### 질문\n{query}"
             }
+        self._local = threading.local()  # 패킹 통계 (Streamlit 세션 스레드별, 빌더는 세션 간 공유)
+
+        # 도메인 YAML 페르소나: 파일명 -> (mtime, 역할 문장)
+        self.personas = {}
+        self.route_cache = {}
+        self.persona_loads = 0
+        self._last_check = 0.0
+        for path in sorted(glob.glob(os.path.join(self.prompt_dir, 'extract_*.yaml'))):
+            self._load_persona(os.path.basename(path))
+
+    @property
+    def last_pack_stats(self):
+        return getattr(self._local, 'pack_stats', {})
+
+    @last_pack_stats.setter
+    def last_pack_stats(self, stats):
+        self._local.pack_stats = stats
+
+    @property
+    def last_packed_context(self):
+        """마지막 build_messages 에서 user 템플릿에 넣은 [참고 문서] 문자열 (스레드별)"""
+        return getattr(self._local, 'packed_context', "")
 
     def _determine_yaml(self, llm_category, title):
+        """(category, title) 별 라우팅 결과 메모이즈 → _route_yaml"""
+        key = (str(llm_category), str(title))
+        target = self.route_cache.get(key)
+        if target is None:
+            if len(self.route_cache) >= ROUTE_CACHE_SIZE:
+                self.route_cache.clear()
+            target = self.route_cache[key] = self._route_yaml(llm_category, title)
+        return target
+
+    def _route_yaml(self, llm_category, title):
         """
         [작성 의도: 2단계 라우팅]
         - 1단계: LLM이 판단한 대분류(Category_LLM)를 기준으로 비IT 사업을 먼저 걸러냅니다.
@@ -61,30 +108,49 @@ class RAGPromptBuilder:
         # 위 조건에 해당하지 않는 일반적인 IT 사업은 SI로 간주
         return 'extract_si.yaml'
 
-    def _get_persona(self, yaml_filename):
+    def _load_persona(self, yaml_filename):
         """
         [작용] 
         선택된 YAML 파일에서 'system_prompt'의 첫 줄(역할 정의)만 추출하여 
-        대화형 시스템 프롬프트에 주입합니다.
+        self.personas 에 (mtime, 역할) 로 저장합니다.
         """
         path = os.path.join(self.prompt_dir, yaml_filename)
         try:
+            mtime = os.path.getmtime(path)
             with open(path, 'r', encoding='utf-8') as f:
                 config = yaml.safe_load(f)
                 # "당신은 ~입니다." 부분만 가져오기
-                return config.get('system_prompt', "B2G 입찰 분석 전문가").split('\n')[0]
+                role = config.get('system_prompt', "B2G 입찰 분석 전문가").split('\n')[0]
         except:
-            return "B2G 공공입찰 컨설팅 AI"
+            mtime, role = None, DEFAULT_PERSONA
+        self.personas[yaml_filename] = (mtime, role)
+        self.persona_loads += 1
+        return role
 
-    def build_messages(self, category, title, context, history, query):
-        """
-        [작성 의도] app.py로부터 데이터를 받아 LLM에 전송할 최종 메시지 리스트를 조립합니다.
-        [인자] category, title, context, history, query (app.py의 키워드와 1:1 매칭)
-        [개선된 구조]
-        1. 시스템 프롬프트 (페르소나 + 절대 규칙)
-        2. 대화 내역 (User <-> Assistant 티키타카)
-        3. 현재 턴 (문서 컨텍스트 + 사용자 질문)
-        """
+    def _reload_changed(self):
+        """PROMPT_RELOAD_INTERVAL 마다 YAML mtime 확인 → 바뀐 파일만 다시 로드"""
+        now = time.monotonic()
+        if now - self._last_check < PROMPT_RELOAD_INTERVAL:
+            return
+        self._last_check = now
+        for name, (mtime, _) in list(self.personas.items()):
+            try:
+                current = os.path.getmtime(os.path.join(self.prompt_dir, name))
+            except OSError:
+                current = None
+            if current != mtime:
+                self._load_persona(name)
+
+    def _get_persona(self, yaml_filename):
+        """메모리의 페르소나 반환 (없는 파일은 처음 요청 시 1회 로드)"""
+        self._reload_changed()
+        cached = self.personas.get(yaml_filename)
+        if cached is None:
+            return self._load_persona(yaml_filename)
+        return cached[1]
+
+    def build_system_prompt(self, category, title):
+        """라우팅 → 페르소나 → 시스템 프롬프트 템플릿 (bench_prompt_builder.py 측정 구간)"""
         # 1. 적절한 도메인 YAML 파일 선택
         target_file = self._determine_yaml(category, title)
         
@@ -92,10 +158,26 @@ class RAGPromptBuilder:
         role = self._get_persona(target_file)
         
         # 3. 시스템 프롬프트 조립
-        system_msg = self.core['system_prompt_template'].format(
+        return self.format_system_prompt(target_file, role)
+
+    def format_system_prompt(self, target_file, role):
+        return self.core['system_prompt_template'].format(
             domain=target_file.replace('extract_', '').replace('.yaml', '').upper(),
             role=role
         )
+
+    def build_messages(self, category, title, context, history, query, source="openai", local_llm=None):
+        """
+        [작성 의도] app.py로부터 데이터를 받아 LLM에 전송할 최종 메시지 리스트를 조립합니다.
+        [인자] category, title, context, history, query (app.py의 키워드와 1:1 매칭)
+              context 는 리랭크 결과 청크 리스트(list[dict]) 또는 문자열
+              source/local_llm 으로 토큰 예산과 토크나이저 결정 (context_packer.py)
+        [개선된 구조]
+        1. 시스템 프롬프트 (페르소나 + 절대 규칙)
+        2. 대화 내역 (User <-> Assistant 티키타카)
+        3. 현재 턴 (문서 컨텍스트 + 사용자 질문)
+        """
+        system_msg = self.build_system_prompt(category, title)
         
         # 최종 메세지 리스트 구성
         messages = [{"role": "system", "content": system_msg}]
@@ -105,9 +187,17 @@ class RAGPromptBuilder:
             # 최근 3턴(6개 메시지)만 유지하여 컨텍스트 낭비 방지
             messages.extend(history[-6:])
         
+        # 참고 문서를 토큰 예산에 맞게 패킹 (청크 단위 선택 / 중복 제거 / 저점수 청크 압축)
+        count_tokens = get_token_counter(source, local_llm)
+        if isinstance(context, list):
+            packed, self.last_pack_stats = pack_context(context, query, budget_for(source), count_tokens)
+        else:
+            packed, self.last_pack_stats = pack_text(str(context), budget_for(source), count_tokens)
+        self._local.packed_context = packed
+
         # 사용자 메시지 조립 (문서 + 질문)
         user_content = self.core['user_prompt_template'].format(
-            context=str(context)[:30000],
+            context=packed,
             history="",
             query=query
         )
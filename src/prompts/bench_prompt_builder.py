@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import time
+
+#==============================================
+# 프로그램명: bench_prompt_builder.py
+# 폴더위치: src/prompts/bench_prompt_builder.py
+# 프로그램 설명: RAGPromptBuilder 시스템 프롬프트 조립 시간 측정 (페르소나/라우팅 캐시 효과)
+#   - uncached : 매 턴 라우팅 키워드 검사 + extract_*.yaml 파일 읽기/파싱 (이전 동작)
+#   - cached   : _determine_yaml 메모이즈 + 메모리 페르소나 (mtime 확인은 PROMPT_RELOAD_INTERVAL 마다)
+#   - 측정 범위: 시스템 프롬프트 조립만 (라우팅 + 페르소나 + 템플릿 format)
+#     · context 패킹 / 토큰 수 계산(build_messages 의 나머지)은 캐시와 무관하고 시간이 커서 제외
+#   - 실행방법: python -m src.prompts.bench_prompt_builder [--turns 2000]
+#===============================================
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from src.prompts.RAGPromptBuilder import RAGPromptBuilder
+
+# (대분류, 사업명) → extract_*.yaml 라우팅이 모두 나오도록 구성
+CASES = [
+    ("IT_정보화", "차세대 정보화 전략계획(ISP) 수립"),
+    ("IT_정보화", "통합 유지보수 및 운영 위탁 용역"),
+    ("IT_정보화", "빅데이터 분석 플랫폼 구축"),
+    ("IT_정보화", "서버 및 네트워크 장비 도입"),
+    ("IT_정보화", "기관 홈페이지 UI/UX 개편"),
+    ("IT_정보화", "학사행정 시스템 구축"),
+    ("시설_건설", "청사 청소 용역"),
+]
+
+
+def run(builder: RAGPromptBuilder, turns: int, uncached: bool) -> float:
+    """턴당 평균 μs"""
+    t0 = time.perf_counter()
+    for i in range(turns):
+        category, title = CASES[i % len(CASES)]
+        if uncached:
+            target = builder._route_yaml(category, title)
+            builder.format_system_prompt(target, builder._load_persona(target))
+        else:
+            builder.build_system_prompt(category, title)
+    return (time.perf_counter() - t0) / turns * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAGPromptBuilder 조립 시간 측정")
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    builder = RAGPromptBuilder(os.path.dirname(os.path.abspath(__file__)))
+    init_ms = (time.perf_counter() - t0) * 1000
+    print(f"init (YAML {builder.persona_loads}개 로드): {init_ms:.1f}ms")
+
+    run(builder, len(CASES), uncached=False)  # warmup
+    uncached = run(builder, args.turns, uncached=True)
+    cached = run(builder, args.turns, uncached=False)
+    print(f"uncached: {uncached:8.1f} μs/turn")
+    print(f"cached  : {cached:8.1f} μs/turn ({uncached / cached:.0f}x)")
+    print(f"routes={len(builder.route_cache)} persona_loads={builder.persona_loads}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import os
+import re
+import threading
+import weakref
+
+#==============================================
+# 프로그램명: context_packer.py
+# 폴더위치: src/prompts/context_packer.py
+# 프로그램 설명: 리랭크 결과 청크 → 백엔드별 토큰 예산 안의 [참고 문서] 문자열 (RAGPromptBuilder 에서 사용)
+#   - 토큰 수는 실제 모델 토크나이저 기준 (make_token_counter)
+#     · local  : llama.cpp Llama.tokenize
+#     · openai : tiktoken o200k_base (미설치 시 글자 수 근사)
+#     · get_token_counter(): 백엔드(로컬은 모델 객체)별로 한 번만 만들어 재사용 (매 턴 인코딩 로드 생략)
+#   - 예산: CONTEXT_BUDGET_LOCAL / CONTEXT_BUDGET_OPENAI (참고 문서 부분만, 시스템 프롬프트/대화 내역 제외)
+#   - pack_context(): rerank_score 내림차순으로 예산을 채움
+#     · rerank_score < CONTEXT_MIN_SCORE 인 청크 제외 (최상위 1개는 항상 사용)
+#     · 중복 제거: 이미 넣은 문장(줄)은 다시 넣지 않음 (청크 overlap / 같은 본문 중복), 새 문장이 적으면 청크 제외
+#     · 압축: rerank_score < CONTEXT_COMPRESS_SCORE 이거나 남은 예산보다 긴 청크는 질문 명사가 들어간 문장만 유지
+#     · 청크 중간을 자르지 않음 (문장 단위), 단 최상위 청크의 문장이 하나도 안 들어가면 토큰 예산 안의 앞부분
+#   - pack_text(): 이미 문자열인 context 를 문단 단위로 예산에 맞춤 (기존 str(context)[:30000] 대체)
+#     · 첫 문단부터 예산을 넘으면 문장 단위, 문장 경계도 없으면 토큰 예산 안의 앞부분 (compressed 1)
+#   - 반환: (context 문자열, 통계 dict)
+#===============================================
+
+CONTEXT_BUDGET_LOCAL = int(os.getenv("CONTEXT_BUDGET_LOCAL", "6000"))
+CONTEXT_BUDGET_OPENAI = int(os.getenv("CONTEXT_BUDGET_OPENAI", "12000"))
+CONTEXT_MIN_SCORE = float(os.getenv("CONTEXT_MIN_SCORE", "0.05"))
+CONTEXT_COMPRESS_SCORE = float(os.getenv("CONTEXT_COMPRESS_SCORE", "0.3"))
+CONTEXT_MIN_NEW_RATIO = float(os.getenv("CONTEXT_MIN_NEW_RATIO", "0.3"))  # 새 문장 비율이 이보다 낮으면 중복 청크
+OPENAI_ENCODING = "o200k_base"
+APPROX_CHARS_PER_TOKEN = 1.5  # 토크나이저 없을 때 한국어 근사
+
+_SENT_SPLIT = re.compile(r"(?<=[.!?。])\s+")
+_SPACES = re.compile(r"\s+")
+LONG_LINE_CHARS = 200  # 이보다 긴 줄만 문장 단위로 나눔
+MIN_DEDUP_CHARS = 10   # 짧은 조각("1.", "목차")은 중복 판단에서 제외
+
+
+def budget_for(source: str) -> int:
+    return CONTEXT_BUDGET_LOCAL if source == "local" else CONTEXT_BUDGET_OPENAI
+
+
+def _approx_tokens(text: str) -> int:
+    return int(len(text) / APPROX_CHARS_PER_TOKEN) + 1
+
+
+def make_token_counter(source: str, local_llm=None):
+    """text -> 토큰 수 함수 (백엔드 토크나이저)"""
+    if source == "local" and local_llm is not None:
+        return lambda text: len(local_llm.tokenize(text.encode("utf-8"), add_bos=False))
+    if source == "openai":
+        try:
+            import tiktoken
+            enc = tiktoken.get_encoding(OPENAI_ENCODING)
+            return lambda text: len(enc.encode(text, disallowed_special=()))
+        except Exception:
+            pass
+    return _approx_tokens
+
+
+_counters = {}                                 # source -> 토큰 수 함수 (openai / 근사)
+_local_counters = weakref.WeakKeyDictionary()  # Llama 객체 -> 토큰 수 함수 (모델 해제 시 같이 정리)
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(source: str, local_llm=None):
+    """make_token_counter 결과를 백엔드별로 재사용"""
+    with _counters_lock:
+        if source == "local" and local_llm is not None:
+            counter = _local_counters.get(local_llm)
+            if counter is None:
+                counter = _local_counters[local_llm] = make_token_counter(source, local_llm)
+            return counter
+        if source not in _counters:
+            _counters[source] = make_token_counter(source)
+        return _counters[source]
+
+
+def _sentences(text: str) -> list[str]:
+    """줄 단위 (긴 줄은 문장 단위) 조각"""
+    out = []
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if len(line) > LONG_LINE_CHARS:
+            out.extend(s for s in _SENT_SPLIT.split(line) if s)
+        else:
+            out.append(line)
+    return out
+
+
+def _sent_key(sentence: str) -> str | None:
+    key = _SPACES.sub("", sentence)
+    return key if len(key) >= MIN_DEDUP_CHARS else None
+
+
+def _query_terms(query: str) -> list[str]:
+    try:
+        from src.retrieval.korean_tokenizer import extract_nouns
+        terms = extract_nouns(query)
+    except Exception:
+        terms = []
+    return terms or [w for w in query.split() if len(w) > 1]
+
+
+def _doc_header(i: int, doc: dict) -> str:
+    parts = [doc.get("project_name"), doc.get("source_file")]
+    label = " | ".join(str(p) for p in parts if p)
+    return f"[문서 {i}] {label}".rstrip()
+
+
+def _fit_sentences(sentences: list[str], budget: int, count_tokens) -> list[str]:
+    """앞에서부터 예산 안에 들어가는 문장까지"""
+    out, used = [], 0
+    for s in sentences:
+        n = count_tokens(s) + 1
+        if used + n > budget:
+            break
+        out.append(s)
+        used += n
+    return out
+
+
+def pack_context(docs: list[dict], query: str, budget: int, count_tokens=_approx_tokens,
+                 text_key: str = "content", min_score: float = CONTEXT_MIN_SCORE,
+                 compress_score: float = CONTEXT_COMPRESS_SCORE) -> tuple[str, dict]:
+    """
+    docs : 리랭크 결과 (rerank_score 가 없으면 score 사용)
+    반환 : ([참고 문서] 문자열, {tokens, budget, used, dropped, deduped, compressed})
+    """
+    def score(d):
+        return float(d.get("rerank_score", d.get("score")) or 0.0)
+
+    ranked = sorted(docs, key=score, reverse=True)
+    terms = None
+    seen = set()
+    blocks, used_tokens = [], 0
+    stats = {"budget": budget, "candidates": len(ranked), "used": 0, "dropped": 0, "deduped": 0, "compressed": 0}
+
+    for rank, doc in enumerate(ranked):
+        if rank > 0 and score(doc) < min_score:
+            stats["dropped"] += len(ranked) - rank
+            break
+
+        sents = _sentences(doc.get(text_key) or doc.get("text") or "")
+        keys = [_sent_key(s) for s in sents]
+        n_long = sum(k is not None for k in keys)
+        n_new = sum(k is not None and k not in seen for k in keys)
+        fresh = [s for s, k in zip(sents, keys) if k is None or k not in seen]
+        if not n_new or n_new < n_long * CONTEXT_MIN_NEW_RATIO:
+            stats["deduped"] += 1
+            continue
+
+        header = _doc_header(len(blocks) + 1, doc)
+        remaining = budget - used_tokens - count_tokens(header) - 2
+        body = "\n".join(fresh)
+        n_body = count_tokens(body)
+
+        if score(doc) < compress_score or n_body > remaining:
+            if terms is None:
+                terms = _query_terms(query)
+            relevant = [s for s in fresh if any(t in s for t in terms)]
+            # 관련 문장이 없는 최상위 청크는 앞부분이라도 사용
+            kept = _fit_sentences(relevant or (fresh if not blocks else []), remaining, count_tokens)
+            truncated = False
+            if not kept and not blocks:
+                # 첫 문장부터 예산을 넘는 최상위 청크 (긴 표 한 줄 등) → 앞부분이라도 사용
+                head = _token_prefix("\n".join(relevant or fresh), remaining, count_tokens)
+                kept, truncated = ([head], True) if head else ([], False)
+            if not kept:
+                stats["dropped"] += 1
+                continue
+            if truncated or len(kept) < len(fresh):
+                stats["compressed"] += 1
+            fresh, body = kept, "\n".join(kept)
+            n_body = count_tokens(body)
+
+        if n_body > remaining:
+            stats["dropped"] += 1
+            continue
+
+        seen.update(k for k in map(_sent_key, fresh) if k is not None)
+        blocks.append(f"{header}\n{body}")
+        used_tokens += count_tokens(header) + n_body + 2
+        stats["used"] += 1
+
+    text = "\n\n".join(blocks)
+    stats["tokens"] = count_tokens(text) if text else 0
+    return text, stats
+
+
+def _token_prefix(text: str, budget: int, count_tokens) -> str:
+    """문장 경계가 없는 긴 문자열: 예산 안에 들어가는 가장 긴 앞부분 (글자 수 이진 탐색)"""
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+def pack_text(text: str, budget: int, count_tokens=_approx_tokens) -> tuple[str, dict]:
+    """문자열 context: 문단(빈 줄) 단위로 예산까지, 첫 문단이 넘치면 문장 단위 → 그래도 없으면 토큰 예산 앞부분"""
+    paragraphs = [p for p in re.split(r"\n\s*\n", text or "") if p.strip()]
+    out, used, truncated = [], 0, 0
+    for p in paragraphs:
+        n = count_tokens(p) + 2
+        if used + n > budget:
+            if not out:
+                head = "\n".join(_fit_sentences(_sentences(p), budget, count_tokens))
+                head = head or _token_prefix(p.strip(), budget, count_tokens)
+                if head:
+                    out.append(head)
+                    truncated = 1
+            break
+        out.append(p)
+        used += n
+    packed = "\n\n".join(out)
+    return packed, {
+        "budget": budget,
+        "candidates": len(paragraphs),
+        "used": len(out),
+        "dropped": len(paragraphs) - len(out),
+        "deduped": 0,
+        "compressed": truncated,
+        "tokens": count_tokens(packed) if packed else 0,
+    }
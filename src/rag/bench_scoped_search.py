@@ -0,0 +1,104 @@
+# ==============================================
+# 프로그램명: bench_scoped_search.py
+# 폴더위치: ./src/rag/bench_scoped_search.py
+# 프로그램 설명: 단일 문서 범위(source_file) 질의 검색 방식 비교 벤치마크 (local_index.py)
+#   - partition  : 문서 파티션 연속 구간 정확 검색 (query(filters={"source_file": ...}) 기본 경로)
+#   - mask       : 메타데이터 마스크로 row 선택 후 정확 검색 (필터 row 캐시 비운 상태)
+#   - ivf+filter : 전체 IVF 근사 검색(상위 --oversample 개) 후 문서 필터
+#   - exact+filter : 전체 정확 검색 후 문서 필터
+#   - 지표: 질의당 지연(ms), recall@k (partition 결과 기준), 반환 개수 평균
+#   - 실행방법:
+#     python -m src.rag.bench_scoped_search                      (LOCAL_INDEX_DIR 인덱스 사용)
+#     python -m src.rag.bench_scoped_search --synthetic 300,300,1536  (문서 수, 문서당 청크 수, 차원)
+# ==============================================
+import argparse
+import os
+import time
+
+import numpy as np
+
+from src.rag.local_index import DEFAULT_INDEX_DIR, LocalVectorIndex
+
+
+def make_synthetic(n_docs: int, per_doc: int, dim: int, seed: int = 0) -> LocalVectorIndex:
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(max(8, n_docs // 10), dim)).astype(np.float32)
+    doc_centers = topics[rng.integers(0, len(topics), n_docs)] + rng.normal(0, 0.5, (n_docs, dim)).astype(np.float32)
+    vectors = np.repeat(doc_centers, per_doc, axis=0) + rng.normal(0, 0.8, (n_docs * per_doc, dim)).astype(np.float32)
+    records = [
+        {"chunk_id": f"{d}-{i}", "source_file": f"doc{d}.hwp", "announcement_id": str(d), "project_name": f"사업{d}"}
+        for d in range(n_docs) for i in range(per_doc)
+    ]
+    index = LocalVectorIndex.build(records, vectors)
+    index.build_ivf()
+    return index
+
+
+def timed(fn, queries):
+    t0 = time.perf_counter()
+    out = [fn(q, sf) for q, sf in queries]
+    return (time.perf_counter() - t0) / len(queries) * 1000, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="단일 문서 범위 검색 벤치마크")
+    parser.add_argument("--index-dir", default=os.getenv("LOCAL_INDEX_DIR") or DEFAULT_INDEX_DIR)
+    parser.add_argument("--synthetic", default=None, help="문서수,문서당청크수,차원")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversample", type=int, default=100, help="ivf/exact+filter 에서 먼저 가져올 후보 수")
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        n_docs, per_doc, dim = map(int, args.synthetic.split(","))
+        index = make_synthetic(n_docs, per_doc, dim)
+    else:
+        index = LocalVectorIndex.load(args.index_dir)
+        if index.centroids is None:
+            index.build_ivf()
+
+    files = list(index.partitions["source_file"])
+    rng = np.random.default_rng(1)
+    queries = []
+    for sf in rng.choice(files, args.queries):
+        s, e = index.partitions["source_file"][sf][0]
+        row = rng.integers(s, e)
+        q = index.vectors[row] + rng.normal(0, 0.05, index.vectors.shape[1]).astype(np.float32)
+        queries.append((q / np.linalg.norm(q), sf))
+
+    k = args.k
+    sf_col = np.array([r.get("source_file") for r in index.records], dtype=object)
+
+    def partition(q, sf):
+        return index.search_slices(q, k, index.partition_slices({"source_file": sf})[1])[0]
+
+    def mask(q, sf):
+        index._filter_rows.clear()
+        return index.search_rows(q, k, index.filter_rows({"source_file": sf}))[0]
+
+    def ivf_filter(q, sf):
+        idx, _ = index.search_ivf(q, args.oversample, args.nprobe)
+        return idx[sf_col[idx] == sf][:k]
+
+    def exact_filter(q, sf):
+        idx, _ = index.search_exact(q, args.oversample)
+        return idx[sf_col[idx] == sf][:k]
+
+    print(f"index: {len(index)} chunks, {len(files)} docs, dim={index.vectors.shape[1]}, "
+          f"nlist={index.meta.get('nlist')}, queries={len(queries)}, k={k}")
+    base_ms, truth = timed(partition, queries)
+    rows = [("partition", base_ms, truth)]
+    for name, fn in (("mask", mask), ("ivf+filter", ivf_filter), ("exact+filter", exact_filter)):
+        ms, out = timed(fn, queries)
+        rows.append((name, ms, out))
+
+    print(f"{'method':<14}{'ms/query':>10}{'recall@k':>10}{'avg hits':>10}")
+    for name, ms, out in rows:
+        recall = np.mean([len(set(a) & set(t)) / max(len(t), 1) for a, t in zip(out, truth)])
+        hits = np.mean([len(a) for a in out])
+        print(f"{name:<14}{ms:>10.3f}{recall:>10.3f}{hits:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# ==============================================
+# 프로그램명: chunk_table.py
+# 폴더위치: ./src/rag/chunk_table.py
+# 프로그램 설명: 검색/업로드 대상 청크 테이블 설정 (한 곳에서 관리)
+#   - RAG_CHUNKS_TABLE (기본 documents_chunks_smk_4)
+#     · upload_chunks_final.py 업로드 대상 테이블
+#     · db.py vector RPC / hybrid_retriever.py BM25 RPC 이름을 이 테이블 이름에서 만듦
+#       (vector / bm25 결과의 chunk_id 가 같은 테이블 기준이어야 RRF 융합이 의미 있음)
+#   - RPC 이름 규칙 (metadata/create_function.sql):
+#       documents_chunks_smk_4          → match_documents_chunks_smk4_<종류>
+#       documents_chunks_structural_pjw → match_documents_chunks_structural_pjw_<종류>
+# ==============================================
+import os
+import re
+
+RAG_CHUNKS_TABLE = os.getenv("RAG_CHUNKS_TABLE", "documents_chunks_smk_4")
+
+
+def rpc_name(kind: str, table: str = RAG_CHUNKS_TABLE) -> str:
+    """kind: vector_filtered / bm25_ngram / vector ..."""
+    base = re.sub(r"_(\d+)$", r"\1", table)
+    return f"match_{base}_{kind}"
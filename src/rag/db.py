@@ -6,12 +6,22 @@
 # 작성이력: 2025.12.26 정예진 최초 작성
 # 25.12.29 한상준 query 함수에 filter_source 인자 추가
 # 25.12.29 supabase DB 검색 함수를 match_rag_chunks >> match_documents_chunks_structural_vector 함수로 변경
+# query 에 filters(메타데이터 필터, src/rag/filters.py) 추가
+#   RPC 이름은 환경변수 VECTOR_RPC / VECTOR_RPC_PROBES 로 변경 가능
+# 필터 유무와 관계없이 같은 테이블(RAG_CHUNKS_TABLE, chunk_table.py)의 VECTOR_RPC 하나만 호출
+#   (필터 없음 → RPC 내부 ivfflat 분기, 필터 있음 → 후보 축소 후 정확 거리), VECTOR_FILTERED_RPC 제거
 # ==============================================
 import os
 
 from pydantic import Json
 from supabase import create_client
 
+from src.rag.chunk_table import rpc_name
+from src.rag.filters import to_rpc_params
+
+VECTOR_RPC = os.getenv("VECTOR_RPC") or rpc_name("vector_filtered")
+VECTOR_RPC_PROBES = int(os.getenv("VECTOR_RPC_PROBES", "10"))
+
 class Supabase:
     def __init__(self):
         url = os.getenv("SUPABASE_URL")
@@ -23,14 +33,16 @@ class Supabase:
         print("insert 진행합니다.")
         return True
 
-    def query(self, embedded_query:list[float], result_count:int, match_threshold:float=0.3) -> list[dict]:
+    def query(self, embedded_query:list[float], result_count:int, match_threshold:float=0.3, filters:dict|None=None) -> list[dict]:
+        params = {
+            "query_embedding": embedded_query,
+            "match_threshold": match_threshold,
+            "match_count": result_count,
+            "probes": VECTOR_RPC_PROBES,
+            **to_rpc_params(filters),  # 없는 필터는 RPC 기본값(NULL, 미적용)
+        }
+
         try:
-            return self.client.rpc(
-                "match_documents_chunks_structural_vector",
-                {
-                    "query_embedding": embedded_query,
-                    "match_threshold": match_threshold,
-                    "match_count": result_count
-                }).execute().data
+            return self.client.rpc(VECTOR_RPC, params).execute().data
         except Exception as e:
-            raise Exception(f"[db.py] match_documents_chunks_structural_vector 실행 실패: {e}")
\ No newline at end of file
+            raise Exception(f"[db.py] {VECTOR_RPC} 실행 실패: {e}")
\ No newline at end of file
@@ -5,30 +5,44 @@
 # 작성이력: 2025.12.26 정예진 최초 작성
 # 25.12.29 한상준 filter_source 인자 추가 및 전달, LangSmith 추적 추가
 # 25.12.29 db.query 호출할 때 변경된 인자(match_threshold) 전달
+# 쿼리 임베딩을 공용 임베딩 저장소(embedding_store.py)에서 먼저 조회
+# 쿼리 임베딩 LRU/TTL 캐시(query_cache.py) 적용, 캐시 통계 cache_stats()
+# 검색 백엔드 선택 (RAG_BACKEND=local 이면 로컬 벡터 인덱스, local_index.py)
+# search 에 filters(메타데이터 필터) 인자 추가, 검색 단계에서 적용
+# embed_query 추가 (캐시된 질문 임베딩, app.py 답변 캐시 조회용)
 #==============================================
 
 import openai
 from langchain_openai import OpenAIEmbeddings
 from langsmith import traceable
 
-from src.rag.db import Supabase
+from src.rag.local_index import get_retrieval_backend
+from src.rag.embed.query_cache import get_query_cache
 
 
 class EmbeddingModel:
     def __init__(self, model_name: str):
         super().__init__()
         self.model = OpenAIEmbeddings(model=model_name)
-        self.db = Supabase()
+        self.query_cache = get_query_cache(model_name)  # 모듈 싱글턴 (rerun 사이 유지)
+        self.db = get_retrieval_backend()
 
     @traceable(run_type="retriever", name="Supabase_Dense_Search")
-    def search(self, query:str, result_count:int=10, threshold:float=0.3) -> list[dict]:
+    def search(self, query:str, result_count:int=10, threshold:float=0.3, filters:dict|None=None) -> list[dict]:
         if query == "":
             raise Exception("질문이 비어있습니다.")
         try:
-            embedded_query = self.model.embed_query(query)
+            embedded_query = self.query_cache.get_or_embed(query, self.model.embed_query)
 
-            return self.db.query(embedded_query, result_count, match_threshold=threshold)
+            return self.db.query(embedded_query, result_count, match_threshold=threshold, filters=filters)
         except openai.NotFoundError as e:
             raise Exception(f"[embedding_model.py] 임베딩 모델 에러: {e}")
 
+    def embed_query(self, query:str) -> list[float]:
+        """검색과 같은 질문 임베딩 (query_cache 경유 → 이후 search 에서는 재임베딩하지 않음)"""
+        return self.query_cache.get_or_embed(query, self.model.embed_query)
+
+    def cache_stats(self) -> dict:
+        return self.query_cache.stats()
+
 
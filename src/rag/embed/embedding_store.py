@@ -0,0 +1,193 @@
+#==============================================
+# 프로그램명: embedding_store.py
+# 폴더위치: ./src/rag/embed/embedding_store.py
+# 프로그램 설명: 임베딩 결과 디스크 캐시 (적재 스크립트 / EmbeddingModel 공용)
+#   - 키: (모델명, sha256(임베딩 입력 문자열)) → 같은 입력은 OpenAI 재호출 없이 재사용
+#   - 모델별 디렉터리: vectors.f32 (float32 행렬, append-only) + keys.txt (행 번호 순 sha256) + meta.json (dim)
+#   - 조회는 np.memmap 으로 필요한 행만 읽음 (전체를 메모리에 올리지 않음)
+#   - 쓰기 순서: 벡터 append → 키 append. 중간에 죽으면 다음 로드 때 키 개수 기준으로 벡터 파일 정리
+#   - 같은 프로세스 안에서는 스레드 안전(Lock), 여러 프로세스가 동시에 같은 저장소에 쓰는 것은 지원하지 않음
+#   - 위치: 환경변수 EMBEDDING_STORE_DIR (기본 src/data/embedding_store)
+#   - CachedEmbeddings: langchain Embeddings(embed_documents/embed_query) 래퍼
+#==============================================
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_STORE_DIR = Path(__file__).resolve().parents[2] / "data" / "embedding_store"
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class _ModelShard:
+    """모델 1개 분량 저장소 (vectors.f32 + keys.txt)"""
+
+    def __init__(self, root: Path, model: str):
+        safe = re.sub(r"[^0-9A-Za-z._-]+", "_", model)
+        self.dir = root / safe
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vec_path = self.dir / "vectors.f32"
+        self.key_path = self.dir / "keys.txt"
+        self.meta_path = self.dir / "meta.json"
+        self.model = model
+        self.dim = None
+        self.index = {}
+        self._mmap = None
+        self._load()
+
+    def _load(self):
+        if self.meta_path.exists():
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        if self.dim is None:
+            return
+
+        keys = []
+        if self.key_path.exists():
+            with open(self.key_path, "r", encoding="utf-8") as f:
+                raw = f.read()
+            lines = raw.split("\n")
+            # 마지막 줄이 개행 없이 잘렸으면 버림
+            keys = [k for k in lines[:-1] if len(k) == 64]
+
+        row_bytes = self.dim * 4
+        n_vec = self.vec_path.stat().st_size // row_bytes if self.vec_path.exists() else 0
+        keys = keys[:n_vec]
+
+        # 키/벡터 개수를 맞춰 정리 (중단된 쓰기 복구)
+        if self.vec_path.exists() and self.vec_path.stat().st_size != len(keys) * row_bytes:
+            with open(self.vec_path, "r+b") as f:
+                f.truncate(len(keys) * row_bytes)
+        with open(self.key_path, "w", encoding="utf-8") as f:
+            f.write("".join(k + "\n" for k in keys))
+
+        self.index = {k: i for i, k in enumerate(keys)}
+
+    def _matrix(self):
+        n = len(self.index)
+        if self._mmap is None or self._mmap.shape[0] < n:
+            self._mmap = np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(n, self.dim)) if n else None
+        return self._mmap
+
+    def get(self, keys):
+        rows = [self.index.get(k) for k in keys]
+        hit = [i for i, r in enumerate(rows) if r is not None]
+        out = [None] * len(keys)
+        if hit:
+            mat = self._matrix()
+            vecs = np.asarray(mat[[rows[i] for i in hit]])
+            for i, v in zip(hit, vecs):
+                out[i] = v
+        return out
+
+    def put(self, keys, vectors):
+        pairs = [(k, v) for k, v in zip(keys, vectors) if k not in self.index]
+        # 같은 배치 안 중복 키 제거
+        seen = {}
+        for k, v in pairs:
+            seen.setdefault(k, v)
+        if not seen:
+            return
+
+        mat = np.asarray(list(seen.values()), dtype=np.float32)
+        if self.dim is None:
+            self.dim = int(mat.shape[1])
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model, "dim": self.dim}, f)
+        if mat.shape[1] != self.dim:
+            raise ValueError(f"[embedding_store.py] 차원 불일치: 저장소 {self.dim} / 입력 {mat.shape[1]}")
+
+        with open(self.vec_path, "ab") as f:
+            f.write(np.ascontiguousarray(mat).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.key_path, "a", encoding="utf-8") as f:
+            f.write("".join(k + "\n" for k in seen))
+
+        base = len(self.index)
+        for i, k in enumerate(seen):
+            self.index[k] = base + i
+
+
+class EmbeddingStore:
+    def __init__(self, root: str | Path | None = None):
+        self.root = Path(root or os.getenv("EMBEDDING_STORE_DIR") or DEFAULT_STORE_DIR)
+        self._shards = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _shard(self, model: str) -> _ModelShard:
+        if model not in self._shards:
+            self._shards[model] = _ModelShard(self.root, model)
+        return self._shards[model]
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(s.index) for s in self._shards.values())
+
+    def get_many(self, model: str, texts: list[str]) -> list:
+        """저장된 벡터(np.float32 배열) 또는 None 리스트"""
+        with self._lock:
+            return self._shard(model).get([text_key(t) for t in texts])
+
+    def put_many(self, model: str, texts: list[str], vectors):
+        with self._lock:
+            self._shard(model).put([text_key(t) for t in texts], vectors)
+
+    def get_or_embed(self, model: str, texts: list[str], embed_fn) -> list[list[float]]:
+        """
+        저장소에 없는 입력만 embed_fn(texts) 로 임베딩 후 저장
+        return: texts와 같은 순서의 벡터(list[float]) 리스트
+        """
+        cached = self.get_many(model, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        self.hits += len(texts) - sum(v is None for v in cached)
+        self.misses += len(missing)
+
+        fresh = {}
+        if missing:
+            vectors = embed_fn(missing)
+            self.put_many(model, missing, vectors)
+            fresh = dict(zip(missing, vectors))
+
+        return [list(map(float, v)) if v is not None else list(fresh[t]) for t, v in zip(texts, cached)]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(root: str | Path | None = None) -> EmbeddingStore:
+    """저장소 경로별 프로세스 공용 인스턴스"""
+    key = str(Path(root or os.getenv("EMBEDDING_STORE_DIR") or DEFAULT_STORE_DIR).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = EmbeddingStore(key)
+        return _stores[key]
+
+
+class CachedEmbeddings:
+    """
+    langchain Embeddings 래퍼: embed_documents / embed_query 전에 EmbeddingStore 조회
+    - base: OpenAIEmbeddings 등 (embed_documents / embed_query 제공)
+    """
+
+    def __init__(self, base, model_name: str, store: EmbeddingStore | None = None):
+        self.base = base
+        self.model_name = model_name
+        self.store = store or get_embedding_store()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.store.get_or_embed(self.model_name, texts, self.base.embed_documents)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.store.get_or_embed(self.model_name, [text], lambda t: [self.base.embed_query(t[0])])[0]
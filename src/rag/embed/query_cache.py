@@ -0,0 +1,118 @@
+#==============================================
+# 프로그램명: query_cache.py
+# 폴더위치: ./src/rag/embed/query_cache.py
+# 프로그램 설명: 질문(query) 임베딩 프로세스 내 LRU/TTL 캐시
+#   - 키: 정규화한 질문 (NFC + 공백 정리) → "사업 금액은?" / "사업  금액은? " 같은 입력은 같은 키
+#   - 1차: 메모리 LRU (QUERY_CACHE_SIZE 개, QUERY_CACHE_TTL 초 후 만료)
+#   - 2차(선택): 질문 전용 디스크 저장소 조회 (QUERY_CACHE_DISK=0 이면 사용 안 함)
+#     · EmbeddingStore 형식이지만 위치는 QUERY_CACHE_DIR (기본 src/data/query_embedding_store)
+#     · 청크 임베딩 저장소(EMBEDDING_STORE_DIR)와 분리 → 앱이 질문을 쓰는 동안 업로더가 같은 shard 에 append 하지 않음
+#       (embedding_store.py 는 여러 프로세스 동시 쓰기 미지원, 앱과 평가 스크립트를 같이 돌릴 때는 QUERY_CACHE_DIR 를 다르게)
+#   - hit/miss 카운터 제공 (stats)
+#   - get_query_cache(model_name): 모델별 모듈 단위 싱글턴 → Streamlit rerun 사이에도 유지
+#==============================================
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from src.rag.embed.embedding_store import DEFAULT_STORE_DIR, EmbeddingStore, get_embedding_store
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", str(24 * 3600)))
+QUERY_CACHE_DISK = os.getenv("QUERY_CACHE_DISK", "1") == "1"
+QUERY_CACHE_DIR = os.getenv("QUERY_CACHE_DIR") or str(DEFAULT_STORE_DIR.parent / "query_embedding_store")
+
+
+def normalize_query(query: str) -> str:
+    q = unicodedata.normalize("NFC", query or "")
+    return re.sub(r"\s+", " ", q).strip()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, model_name: str, maxsize: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL,
+                 store: EmbeddingStore | None = None):
+        self.model_name = model_name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self._data = OrderedDict()  # 정규화 질문 -> (저장 시각, 벡터)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _get_memory(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            ts, vec = item
+            if self.ttl and time.monotonic() - ts > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return vec
+
+    def _put_memory(self, key: str, vec: list[float]):
+        with self._lock:
+            self._data[key] = (time.monotonic(), vec)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_embed(self, query: str, embed_fn) -> list[float]:
+        """
+        embed_fn(정규화 질문) -> 벡터
+        메모리 → 디스크 → embed_fn 순으로 조회
+        """
+        key = normalize_query(query)
+
+        vec = self._get_memory(key)
+        if vec is not None:
+            self.hits += 1
+            return vec
+
+        if self.store is not None:
+            cached = self.store.get_many(self.model_name, [key])[0]
+            if cached is not None:
+                vec = list(map(float, cached))
+                self.disk_hits += 1
+                self._put_memory(key, vec)
+                return vec
+
+        self.misses += 1
+        vec = list(embed_fn(key))
+        if self.store is not None:
+            self.store.put_many(self.model_name, [key], [vec])
+        self._put_memory(key, vec)
+        return vec
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_query_cache(model_name: str) -> QueryEmbeddingCache:
+    with _caches_lock:
+        if model_name not in _caches:
+            store = get_embedding_store(QUERY_CACHE_DIR) if QUERY_CACHE_DISK else None
+            _caches[model_name] = QueryEmbeddingCache(model_name, store=store)
+        return _caches[model_name]
@@ -0,0 +1,116 @@
+# ==============================================
+# 프로그램명: filters.py
+# 폴더위치: ./src/rag/filters.py
+# 프로그램 설명: 검색 메타데이터 필터 (Supabase RPC / 로컬 인덱스 공용)
+#   - 지원 키:
+#     announcement_id, source_file                     : 값 일치 (문서 단위 범위 → 로컬 인덱스 파티션 경로)
+#     project_name, ordering_agency, depth_1, depth_2 : 값 일치
+#     budget_min, budget_max                           : project_budget 범위 (이상/이하)
+#     bid_end_from, bid_end_to                         : bid_end_at 범위 (ISO8601 문자열 또는 datetime)
+#   - None / 빈 문자열 값은 "필터 없음"으로 취급
+#   - depth_1/depth_2 는 metadata.path [depth_1, depth_2] 기준
+#   - to_rpc_params  : vector_filtered / bm25_ngram RPC 공용 필터 인자
+#   - record_matches : 필터를 지원하지 않는 검색 결과의 후처리용
+# ==============================================
+from datetime import datetime, timezone
+
+FILTER_KEYS = (
+    "announcement_id",
+    "source_file",
+    "project_name",
+    "ordering_agency",
+    "depth_1",
+    "depth_2",
+    "budget_min",
+    "budget_max",
+    "bid_end_from",
+    "bid_end_to",
+)
+
+# 필터 키 -> RPC(match_documents_chunks_smk4_vector_filtered / _bm25_ngram) 인자명
+RPC_PARAM_NAMES = {
+    "announcement_id": "filter_announcement_id",
+    "source_file": "filter_source_file",
+    "project_name": "filter_project_name",
+    "ordering_agency": "filter_ordering_agency",
+    "depth_1": "filter_depth_1",
+    "depth_2": "filter_depth_2",
+    "budget_min": "filter_budget_min",
+    "budget_max": "filter_budget_max",
+    "bid_end_from": "filter_bid_end_from",
+    "bid_end_to": "filter_bid_end_to",
+}
+
+
+def normalize_filters(filters: dict | None) -> dict:
+    if not filters:
+        return {}
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"[filters.py] 지원하지 않는 필터: {sorted(unknown)}")
+    out = {}
+    for k, v in filters.items():
+        if v is None or (isinstance(v, str) and not v.strip()):
+            continue
+        if k in ("budget_min", "budget_max"):
+            v = int(v)
+        elif k == "announcement_id":
+            v = str(v)
+        elif k in ("bid_end_from", "bid_end_to"):
+            v = v.isoformat() if isinstance(v, datetime) else str(v)
+        out[k] = v
+    return out
+
+
+def to_rpc_params(filters: dict) -> dict:
+    return {RPC_PARAM_NAMES[k]: v for k, v in normalize_filters(filters).items()}
+
+
+def to_timestamp(value) -> float | None:
+    """ISO8601 문자열 -> epoch 초 (timezone 없으면 UTC로 간주, DB timestamptz 와 동일)"""
+    if value is None or value == "":
+        return None
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def record_depths(record: dict) -> tuple:
+    path = (record.get("metadata") or {}).get("path") or []
+    return (path[0] if len(path) > 0 else None, path[1] if len(path) > 1 else None)
+
+
+def record_matches(record: dict, filters: dict | None) -> bool:
+    f = normalize_filters(filters)
+    if not f:
+        return True
+    depth_1, depth_2 = record_depths(record)
+    values = {**record, "depth_1": depth_1, "depth_2": depth_2}
+    for k in ("announcement_id", "source_file", "project_name", "ordering_agency", "depth_1", "depth_2"):
+        if k not in f:
+            continue
+        v = values.get(k)
+        if (str(v) if k == "announcement_id" and v is not None else v) != f[k]:
+            return False
+    budget = record.get("project_budget")
+    if ("budget_min" in f or "budget_max" in f) and budget is None:
+        return False
+    if "budget_min" in f and budget < f["budget_min"]:
+        return False
+    if "budget_max" in f and budget > f["budget_max"]:
+        return False
+    if "bid_end_from" in f or "bid_end_to" in f:
+        bid_end = to_timestamp(record.get("bid_end_at"))
+        if bid_end is None:
+            return False
+        if "bid_end_from" in f and bid_end < to_timestamp(f["bid_end_from"]):
+            return False
+        if "bid_end_to" in f and bid_end > to_timestamp(f["bid_end_to"]):
+            return False
+    return True
+
+
+def describe_filters(filters: dict | None) -> str:
+    f = normalize_filters(filters)
+    return ", ".join(f"{k}={v}" for k, v in f.items()) if f else "전체 범위"
@@ -0,0 +1,355 @@
+# ==============================================
+# 프로그램명: local_index.py
+# 폴더위치: ./src/rag/local_index.py
+# 프로그램 설명: 로컬(in-process) 벡터 인덱스 - Supabase RPC 대신 쓸 수 있는 검색 백엔드
+#   - query(embedded_query, result_count, match_threshold) : db.Supabase.query 와 같은 계약/반환 형태
+#     (레코드 컬럼 + score(cosine 유사도), 유사도 내림차순, match_threshold 이상만)
+#   - exact : 정규화된 float32 연속 행렬 @ 질의 벡터 (행렬곱 1회 + argpartition)
+#   - ivf   : numpy k-means 중심점 + 리스트별 row id (CSR) → nprobe 개 리스트만 계산하는 근사 검색
+#   - filters(src/rag/filters.py) : 메타데이터 컬럼 배열로 대상 row를 먼저 고른 뒤 그 안에서 정확 검색
+#     (조건에 맞는 청크가 충분하면 항상 result_count 개 반환, 필터별 row 목록은 캐시)
+#   - 문서 파티션: 행을 source_file 단위로 연속 배치 → announcement_id / source_file / project_name 별 연속 구간(slice)
+#     해당 키 필터만 있는 질의(단일 RFP 질의)는 자동으로 slice 정확 검색 (마스크/복사 없음)
+#     비교 벤치마크: python -m src.rag.bench_scoped_search
+#   - 인덱스 디렉터리: vectors.npy / records.jsonl / meta.json / (ivf.npz)
+#     빌드: python -m src.vectorstore.build_local_index
+#   - 백엔드 선택: get_retrieval_backend()
+#     환경변수 RAG_BACKEND=local 이면 LocalVectorIndex(LOCAL_INDEX_DIR), 그 외 db.Supabase
+#     LOCAL_INDEX_MODE=exact|ivf, LOCAL_INDEX_NPROBE
+# ==============================================
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from src.rag.filters import normalize_filters, record_depths, to_timestamp
+
+DEFAULT_INDEX_DIR = Path(__file__).resolve().parents[1] / "data" / "local_index"
+
+LOCAL_INDEX_MODE = os.getenv("LOCAL_INDEX_MODE", "exact")
+LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "8"))
+FILTER_CACHE_SIZE = 64
+
+# 연속 구간으로 관리하는 문서 단위 키 (행은 source_file 순서로 묶여 있음)
+PARTITION_KEYS = ("source_file", "announcement_id", "project_name")
+
+
+def _normalize_rows(x: np.ndarray) -> np.ndarray:
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _safe_timestamp(value) -> float:
+    try:
+        ts = to_timestamp(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return np.nan if ts is None else ts
+
+
+def _topk(scores: np.ndarray, k: int) -> np.ndarray:
+    """scores 내림차순 상위 k개 인덱스 (정렬됨)"""
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def _group_by_source_file(records: list[dict]) -> np.ndarray:
+    """source_file 첫 등장 순서를 유지하며 같은 파일 행이 연속되도록 하는 정렬 순서"""
+    first = {}
+    keys = np.array([first.setdefault(r.get("source_file") or "", i) for i, r in enumerate(records)])
+    return np.argsort(keys, kind="stable")
+
+
+def _spherical_kmeans(x: np.ndarray, k: int, iters: int = 20, seed: int = 0, block: int = 16384):
+    """cosine 기준 k-means (x는 정규화된 행) → (centroids, assign)"""
+    rng = np.random.default_rng(seed)
+    cent = x[rng.choice(len(x), k, replace=False)].copy()
+
+    def assign_all(c):
+        out = np.empty(len(x), dtype=np.int32)
+        for s in range(0, len(x), block):
+            out[s:s + block] = np.argmax(x[s:s + block] @ c.T, axis=1)
+        return out
+
+    assign = assign_all(cent)
+    for _ in range(iters):
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = counts > 0
+        sums = np.zeros_like(cent)
+        sums[nonempty] = np.add.reduceat(x[order], starts[nonempty], axis=0)
+        # 빈 리스트는 임의 점으로 다시 시작
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            sums[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+        cent = _normalize_rows(sums)
+
+        new_assign = assign_all(cent)
+        if np.array_equal(new_assign, assign):
+            break
+        assign = new_assign
+    return cent, assign
+
+
+class LocalVectorIndex:
+    def __init__(self, vectors: np.ndarray, records: list[dict], meta: dict | None = None):
+        self.vectors = vectors  # (N, D) 정규화 float32, C-contiguous
+        self.records = records
+        self.meta = meta or {}
+        self.centroids = None   # (nlist, D)
+        self.list_offsets = None  # (nlist + 1,) CSR offset
+        self.list_ids = None    # (N,) 리스트 순서로 나열한 row id
+        self._columns = None    # 필터용 메타데이터 컬럼 배열 (처음 필터 검색 때 생성)
+        self._filter_rows = OrderedDict()  # 정규화 필터 -> 대상 row id
+        self._filter_lock = threading.Lock()
+        self.partitions = self._build_partitions()  # 키 -> 값 -> [(start, end), ...]
+
+    # -----------------------------
+    # 빌드 / 저장 / 로드
+    # -----------------------------
+    @classmethod
+    def build(cls, records: list[dict], vectors, model: str | None = None):
+        mat = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        if len(records) != len(mat):
+            raise ValueError(f"[local_index.py] 레코드 {len(records)} / 벡터 {len(mat)} 개수 불일치")
+        order = _group_by_source_file(records)
+        if not np.array_equal(order, np.arange(len(records))):
+            records = [records[i] for i in order]
+            mat = np.ascontiguousarray(mat[order])
+        meta = {"model": model, "count": len(records), "dim": int(mat.shape[1]) if len(mat) else 0,
+                "built_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        return cls(mat, records, meta)
+
+    def build_ivf(self, nlist: int | None = None, iters: int = 20, seed: int = 0):
+        n = len(self.vectors)
+        if n == 0:
+            return
+        nlist = min(nlist or max(1, int(np.sqrt(n))), n)
+        self.centroids, assign = _spherical_kmeans(self.vectors, nlist, iters, seed)
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        counts = np.bincount(assign, minlength=nlist)
+        self.list_ids = order
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.meta["nlist"] = int(nlist)
+
+    def save(self, index_dir: str | Path):
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        np.save(index_dir / "vectors.npy", self.vectors)
+        with open(index_dir / "records.jsonl", "w", encoding="utf-8") as f:
+            for r in self.records:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        if self.centroids is not None:
+            np.savez(index_dir / "ivf.npz", centroids=self.centroids,
+                     list_offsets=self.list_offsets, list_ids=self.list_ids)
+        elif (index_dir / "ivf.npz").exists():
+            (index_dir / "ivf.npz").unlink()
+        with open(index_dir / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, index_dir: str | Path):
+        index_dir = Path(index_dir)
+        if not (index_dir / "vectors.npy").exists():
+            raise FileNotFoundError(f"[local_index.py] 로컬 인덱스 없음: {index_dir} (build_local_index 먼저 실행)")
+        vectors = np.ascontiguousarray(np.load(index_dir / "vectors.npy"), dtype=np.float32)
+        with open(index_dir / "records.jsonl", "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        meta = {}
+        if (index_dir / "meta.json").exists():
+            with open(index_dir / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        index = cls(vectors, records, meta)
+        if (index_dir / "ivf.npz").exists():
+            ivf = np.load(index_dir / "ivf.npz")
+            index.centroids = ivf["centroids"]
+            index.list_offsets = ivf["list_offsets"]
+            index.list_ids = ivf["list_ids"]
+        return index
+
+    def __len__(self):
+        return len(self.records)
+
+    def _build_partitions(self) -> dict:
+        """PARTITION_KEYS 별 같은 값이 연속된 구간(run) 목록"""
+        parts = {key: {} for key in PARTITION_KEYS}
+        for key in PARTITION_KEYS:
+            runs = parts[key]
+            start, cur = 0, None
+            for i, r in enumerate(self.records):
+                v = r.get(key)
+                v = None if v is None else str(v)
+                if i == 0:
+                    cur = v
+                elif v != cur:
+                    if cur is not None:
+                        runs.setdefault(cur, []).append((start, i))
+                    start, cur = i, v
+            if self.records and cur is not None:
+                runs.setdefault(cur, []).append((start, len(self.records)))
+        return parts
+
+    def partition_slices(self, filters: dict) -> tuple[str, list] | None:
+        """
+        필터 중 문서 단위 키가 있으면 (가장 작은 범위의 키, 구간 목록)
+        - filters는 normalize_filters 결과
+        """
+        best = None
+        for key in PARTITION_KEYS:
+            if key not in filters:
+                continue
+            slices = self.partitions[key].get(str(filters[key]), [])
+            size = sum(e - s for s, e in slices)
+            if best is None or size < best[2]:
+                best = (key, slices, size)
+        return None if best is None else (best[0], best[1])
+
+    # -----------------------------
+    # 검색
+    # -----------------------------
+    def _query_vector(self, embedded_query) -> np.ndarray:
+        q = np.asarray(embedded_query, dtype=np.float32).ravel()
+        norm = np.linalg.norm(q)
+        return q / norm if norm else q
+
+    def search_exact(self, q: np.ndarray, k: int):
+        scores = self.vectors @ q
+        idx = _topk(scores, k)
+        return idx, scores[idx]
+
+    def search_ivf(self, q: np.ndarray, k: int, nprobe: int = LOCAL_INDEX_NPROBE):
+        if self.centroids is None:
+            return self.search_exact(q, k)
+        probe = _topk(self.centroids @ q, min(nprobe, len(self.centroids)))
+        cand = np.concatenate([self.list_ids[self.list_offsets[j]:self.list_offsets[j + 1]] for j in probe])
+        scores = self.vectors[cand] @ q
+        top = _topk(scores, k)
+        return cand[top], scores[top]
+
+    # -----------------------------
+    # 메타데이터 필터
+    # - NULL(None/NaN) 값은 어떤 조건에도 맞지 않음 (SQL 과 동일)
+    # -----------------------------
+    def _filter_columns(self) -> dict:
+        if self._columns is None:
+            depths = [record_depths(r) for r in self.records]
+            budgets = [r.get("project_budget") for r in self.records]
+            self._columns = {
+                "announcement_id": np.array([None if r.get("announcement_id") is None else str(r.get("announcement_id"))
+                                             for r in self.records], dtype=object),
+                "source_file": np.array([r.get("source_file") for r in self.records], dtype=object),
+                "project_name": np.array([r.get("project_name") for r in self.records], dtype=object),
+                "ordering_agency": np.array([r.get("ordering_agency") for r in self.records], dtype=object),
+                "depth_1": np.array([d[0] for d in depths], dtype=object),
+                "depth_2": np.array([d[1] for d in depths], dtype=object),
+                "project_budget": np.array([np.nan if b is None else float(b) for b in budgets], dtype=np.float64),
+                "bid_end_at": np.array([_safe_timestamp(r.get("bid_end_at")) for r in self.records], dtype=np.float64),
+            }
+        return self._columns
+
+    def filter_rows(self, filters: dict | None) -> np.ndarray | None:
+        """필터에 맞는 row id (필터 없으면 None)"""
+        f = normalize_filters(filters)
+        if not f:
+            return None
+        key = tuple(sorted(f.items()))
+        with self._filter_lock:
+            if key in self._filter_rows:
+                self._filter_rows.move_to_end(key)
+                return self._filter_rows[key]
+
+        cols = self._filter_columns()
+        mask = np.ones(len(self.records), dtype=bool)
+        for k in ("announcement_id", "source_file", "project_name", "ordering_agency", "depth_1", "depth_2"):
+            if k in f:
+                mask &= cols[k] == f[k]
+        with np.errstate(invalid="ignore"):
+            if "budget_min" in f:
+                mask &= cols["project_budget"] >= f["budget_min"]
+            if "budget_max" in f:
+                mask &= cols["project_budget"] <= f["budget_max"]
+            if "bid_end_from" in f:
+                mask &= cols["bid_end_at"] >= to_timestamp(f["bid_end_from"])
+            if "bid_end_to" in f:
+                mask &= cols["bid_end_at"] <= to_timestamp(f["bid_end_to"])
+        rows = np.flatnonzero(mask)
+
+        with self._filter_lock:
+            self._filter_rows[key] = rows
+            while len(self._filter_rows) > FILTER_CACHE_SIZE:
+                self._filter_rows.popitem(last=False)
+        return rows
+
+    def search_slices(self, q: np.ndarray, k: int, slices: list):
+        """연속 구간(문서 파티션) 안에서 정확 검색 - 행렬 slice는 복사 없이 view"""
+        if not slices:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if len(slices) == 1:
+            s, e = slices[0]
+            scores = self.vectors[s:e] @ q
+            top = _topk(scores, k)
+            return top + s, scores[top]
+        scores = np.concatenate([self.vectors[s:e] @ q for s, e in slices])
+        rows = np.concatenate([np.arange(s, e) for s, e in slices])
+        top = _topk(scores, k)
+        return rows[top], scores[top]
+
+    def search_rows(self, q: np.ndarray, k: int, rows: np.ndarray):
+        """지정 row 집합 안에서 정확 검색"""
+        scores = self.vectors[rows] @ q
+        top = _topk(scores, k)
+        return rows[top], scores[top]
+
+    def query(self, embedded_query: list[float], result_count: int, match_threshold: float = 0.3,
+              filters: dict | None = None, mode: str | None = None) -> list[dict]:
+        q = self._query_vector(embedded_query)
+        f = normalize_filters(filters)
+        scoped = self.partition_slices(f) if f else None
+        if scoped is not None and len(f) == 1:
+            # 단일 문서/사업 범위 질의 → 파티션 정확 검색
+            idx, scores = self.search_slices(q, result_count, scoped[1])
+        elif f:
+            idx, scores = self.search_rows(q, result_count, self.filter_rows(f))
+        elif (mode or LOCAL_INDEX_MODE) == "ivf":
+            idx, scores = self.search_ivf(q, result_count)
+        else:
+            idx, scores = self.search_exact(q, result_count)
+
+        out = []
+        for i, s in zip(idx, scores):
+            if s < match_threshold:
+                break
+            out.append({**self.records[i], "score": float(s)})
+        return out
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_retrieval_backend():
+    """
+    RAG_BACKEND=local → LocalVectorIndex (프로세스당 1회 로드)
+    그 외            → db.Supabase (RPC)
+    """
+    global _backend
+    if os.getenv("RAG_BACKEND", "supabase") != "local":
+        from src.rag.db import Supabase
+        return Supabase()
+
+    with _backend_lock:
+        if _backend is None:
+            _backend = LocalVectorIndex.load(os.getenv("LOCAL_INDEX_DIR") or DEFAULT_INDEX_DIR)
+        return _backend
@@ -0,0 +1,123 @@
+#==============================================
+# 프로그램명: bench_onnx_reranker.py
+# 폴더위치: ./src/rag/rerank/bench_onnx_reranker.py
+# 프로그램 설명: CPU 리랭커 비교 벤치마크 (PyTorch CrossEncoder vs ONNX fp32 vs ONNX int8)
+#   - 입력: src/dataset/ragas_inputs.json (golden dataset 질문 + 검색 context)
+#     · 질문마다 자기 context + 다른 질문 context 를 섞어 --pairs 개 후보 구성 (서비스의 25~40쌍 재현)
+#   - 정확도 (PyTorch 기준): 점수 최대/평균 절대오차, 질문별 Spearman 순위상관, top-1 일치율, top-k 겹침
+#   - 지연: 질문당 ms (p50 / p95), 모든 백엔드 같은 스레드 수 / max_length / 길이 정렬 배치
+#   - 실행방법:
+#     python -m src.rag.rerank.bench_onnx_reranker [--limit 50] [--pairs 30] [--threads 0] [--fp32]
+#==============================================
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.rag.rerank.onnx_reranker import OnnxCrossEncoder, export_onnx, model_dir_for, onnx_file
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+DEFAULT_INPUT = BASE_DIR / "src" / "dataset" / "ragas_inputs.json"
+
+
+def build_queries(items: list[dict], n_pairs: int, seed: int = 0) -> list[tuple[str, list[str]]]:
+    rng = np.random.default_rng(seed)
+    pool = [c for it in items for c in it.get("contexts") or []]
+    queries = []
+    for it in items:
+        ctx = list(it.get("contexts") or [])
+        extra = max(0, n_pairs - len(ctx))
+        ctx += [pool[i] for i in rng.choice(len(pool), extra, replace=False)] if extra else []
+        # 서비스와 같이 길이순 정렬 (padding 최소화)
+        ctx.sort(key=len, reverse=True)
+        queries.append((it["question"], ctx))
+    return queries
+
+
+def run(model, queries, batch_size: int):
+    scores, times = [], []
+    for q, ctx in queries:
+        t0 = time.perf_counter()
+        s = model.predict([(q, c) for c in ctx], batch_size=batch_size, show_progress_bar=False)
+        times.append((time.perf_counter() - t0) * 1000)
+        scores.append(np.asarray(s, dtype=np.float64))
+    return scores, np.array(times)
+
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    ra, rb = np.argsort(np.argsort(a)), np.argsort(np.argsort(b))
+    if ra.std() == 0 or rb.std() == 0:
+        return 1.0
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def parity(ref: list, other: list, k: int) -> dict:
+    diffs = np.concatenate([np.abs(a - b) for a, b in zip(ref, other)])
+    return {
+        "max_abs": float(diffs.max()),
+        "mean_abs": float(diffs.mean()),
+        "spearman": float(np.mean([spearman(a, b) for a, b in zip(ref, other)])),
+        "top1": float(np.mean([np.argmax(a) == np.argmax(b) for a, b in zip(ref, other)])),
+        f"top{k}": float(np.mean([
+            len(set(np.argsort(-a)[:k]) & set(np.argsort(-b)[:k])) / k for a, b in zip(ref, other)
+        ])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyTorch vs ONNX 리랭커 정확도/지연 비교")
+    parser.add_argument("--model", default=os.getenv("RERANKER_MODEL", "dragonkue/bge-reranker-v2-m3-ko"))
+    parser.add_argument("--input", type=Path, default=DEFAULT_INPUT)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--pairs", type=int, default=30, help="질문당 후보 수")
+    parser.add_argument("--k", type=int, default=6, help="top-k 겹침 기준 (평가 스크립트 bge_rerank k)")
+    parser.add_argument("--threads", type=int, default=0, help="0: CPU 코어 수")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--fp32", action="store_true", help="ONNX fp32 모델도 비교")
+    parser.add_argument("--export", action="store_true", help="ONNX 모델 다시 생성")
+    args = parser.parse_args()
+
+    import torch
+    from sentence_transformers import CrossEncoder
+
+    threads = args.threads or os.cpu_count() or 1
+    torch.set_num_threads(threads)
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        items = json.load(f)[: args.limit]
+    queries = build_queries(items, args.pairs)
+    n_pairs = sum(len(c) for _, c in queries)
+
+    model_dir = model_dir_for(args.model)
+    if args.export or not onnx_file(model_dir, True).exists():
+        export_onnx(args.model, model_dir, quantize=True)
+
+    backends = [("torch", CrossEncoder(args.model, device="cpu", max_length=args.max_length))]
+    if args.fp32:
+        backends.append(("onnx-fp32", OnnxCrossEncoder(model_dir, quantized=False, max_length=args.max_length,
+                                                        threads=threads)))
+    backends.append(("onnx-int8", OnnxCrossEncoder(model_dir, quantized=True, max_length=args.max_length,
+                                                    threads=threads)))
+
+    print(f"model={args.model} queries={len(queries)} pairs={n_pairs} threads={threads} max_length={args.max_length}")
+    results = {}
+    for name, model in backends:
+        run(model, queries[:2], args.batch_size)  # warmup
+        results[name] = run(model, queries, args.batch_size)
+
+    ref_scores, ref_times = results["torch"]
+    print(f"{'backend':<11}{'p50 ms':>9}{'p95 ms':>9}{'speedup':>9}{'max|Δ|':>9}{'mean|Δ|':>9}"
+          f"{'spearman':>10}{'top1':>7}{f'top{args.k}':>7}")
+    for name, (scores, times) in results.items():
+        p = parity(ref_scores, scores, args.k)
+        print(f"{name:<11}{np.percentile(times, 50):>9.1f}{np.percentile(times, 95):>9.1f}"
+              f"{np.median(ref_times) / np.median(times):>8.2f}x{p['max_abs']:>9.4f}{p['mean_abs']:>9.4f}"
+              f"{p['spearman']:>10.4f}{p['top1']:>7.2f}{p[f'top{args.k}']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
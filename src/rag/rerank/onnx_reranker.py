@@ -0,0 +1,133 @@
+#==============================================
+# 프로그램명: onnx_reranker.py
+# 폴더위치: ./src/rag/rerank/onnx_reranker.py
+# 프로그램 설명: GPU 없는 서버용 CPU 리랭커 (ONNX Runtime + 동적 int8 양자화)
+#   - export_onnx(): HF cross-encoder → ONNX (torch.onnx.export, 동적 batch/seq 축) → int8 동적 양자화(MatMul 가중치)
+#     · 저장 위치: RERANKER_ONNX_DIR/<모델명> (tokenizer, model.onnx, model_int8.onnx, meta.json)
+#     · 2GB 넘는 모델(bge-reranker-v2-m3 fp32)은 external data 형식으로 저장
+#     · export 는 eager attention 으로 수행 (sdpa 그래프는 ORT 최적화가 덜 적용됨)
+#   - OnnxCrossEncoder: CrossEncoder.predict 와 같은 인터페이스 (sigmoid 점수) → rerank_service.py 에서 그대로 사용
+#     · intra-op 스레드: RERANKER_ONNX_THREADS (0 이면 CPU 코어 수), inter-op 1, 그래프 최적화 ALL
+#     · 배치마다 해당 배치 최장 길이까지만 padding (rerank_service 의 길이 정렬과 함께 사용)
+#     · max_length 미지정 시 512 토큰 (CPU 서빙 기준, 긴 청크는 앞부분으로 판단)
+#   - 사용: RERANKER_BACKEND=onnx (rerank_service.get_rerank_service), 모델 파일이 없으면 첫 로드 시 export
+#   - 정확도/지연 비교: python -m src.rag.rerank.bench_onnx_reranker
+#   - 추가 패키지: onnxruntime (export 시 torch, transformers 필요)
+#==============================================
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+RERANKER_ONNX_DIR = Path(
+    os.getenv("RERANKER_ONNX_DIR")
+    or Path(__file__).resolve().parents[2] / "data" / "onnx_reranker"
+)
+RERANKER_ONNX_THREADS = int(os.getenv("RERANKER_ONNX_THREADS", "0"))
+RERANKER_ONNX_QUANTIZE = os.getenv("RERANKER_ONNX_QUANTIZE", "1") == "1"
+ONNX_OPSET = 17
+
+
+def model_dir_for(model_name: str) -> Path:
+    return RERANKER_ONNX_DIR / model_name.replace("/", "__")
+
+
+def onnx_file(model_dir: Path, quantized: bool) -> Path:
+    return Path(model_dir) / ("model_int8.onnx" if quantized else "model.onnx")
+
+
+def export_onnx(model_name: str, out_dir: str | Path | None = None, quantize: bool = True) -> Path:
+    """HF cross-encoder 를 ONNX 로 변환 (quantize=True 면 int8 모델도 생성), 저장 디렉터리 반환"""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    out_dir = Path(out_dir or model_dir_for(model_name))
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    # eager attention 으로 export 해야 ORT 가 attention 그래프를 최적화함 (sdpa export 는 CPU 에서 더 느림)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, attn_implementation="eager").eval()
+    tokenizer.save_pretrained(out_dir)
+
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in tokenizer.model_input_names]
+    dummy = tokenizer(["입찰 공고 사업 금액"], ["사업 예산은 10억원입니다."], return_tensors="pt")
+    axes = {n: {0: "batch", 1: "seq"} for n in input_names}
+    axes["logits"] = {0: "batch"}
+
+    print(f"[onnx_reranker.py] ONNX export: {model_name} → {out_dir}")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[n] for n in input_names),
+            str(out_dir / "model.onnx"),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=axes,
+            opset_version=ONNX_OPSET,
+            dynamo=False,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print("[onnx_reranker.py] int8 동적 양자화")
+        quantize_dynamic(
+            str(out_dir / "model.onnx"),
+            str(onnx_file(out_dir, True)),
+            weight_type=QuantType.QInt8,
+            use_external_data_format=True,
+        )
+
+    with open(out_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"model_name": model_name, "opset": ONNX_OPSET, "quantized": quantize,
+                   "input_names": input_names}, f, ensure_ascii=False, indent=2)
+    return out_dir
+
+
+class OnnxCrossEncoder:
+    def __init__(self, model_dir: str | Path, quantized: bool = True, max_length: int | None = 512,
+                 threads: int = RERANKER_ONNX_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_dir = Path(model_dir)
+        self.quantized = quantized
+        self.max_length = max_length or 512
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = threads or os.cpu_count() or 1
+        so.inter_op_num_threads = 1
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(onnx_file(self.model_dir, quantized)), so, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def predict(self, pairs, batch_size: int = 16, show_progress_bar: bool = False) -> np.ndarray:
+        """[(질문, 문서), ...] → sigmoid 점수 (CrossEncoder.predict 기본값과 동일)"""
+        pairs = list(pairs)
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        out = []
+        for i in range(0, len(pairs), batch_size):
+            batch = pairs[i:i + batch_size]
+            enc = self.tokenizer(
+                [q for q, _ in batch], [p for _, p in batch],
+                padding=True, truncation=True, max_length=self.max_length, return_tensors="np",
+            )
+            feed = {n: enc[n].astype(np.int64) for n in self.input_names}
+            logits = self.session.run(None, feed)[0].reshape(len(batch), -1)[:, 0]
+            out.append(1.0 / (1.0 + np.exp(-logits)))
+        return np.concatenate(out).astype(np.float32)
+
+
+def load_onnx_reranker(model_name: str, max_length: int | None = None, quantized: bool = RERANKER_ONNX_QUANTIZE,
+                       threads: int = RERANKER_ONNX_THREADS) -> OnnxCrossEncoder:
+    model_dir = model_dir_for(model_name)
+    if not onnx_file(model_dir, quantized).exists():
+        export_onnx(model_name, model_dir, quantize=quantized)
+    return OnnxCrossEncoder(model_dir, quantized=quantized, max_length=max_length, threads=threads)
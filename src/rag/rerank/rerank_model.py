@@ -4,31 +4,45 @@
 # 프로그램 설명: 리랭크 모델 클래스
 # 작성이력: 2025.12.26 정예진 최초 작성
 # 25.12.29 한상준 LangSmith 추적 추가
+# 공용 리랭크 서비스(rerank_service.py) 사용: 점수 캐시 + 길이 정렬 배치, 캐시 통계 cache_stats()
+# rerank_docs() 추가 (정렬된 청크 리스트 반환, 프롬프트 패킹용), CONTEXT 를 리스트 repr 대신 문자열로 조립
 #==============================================
 from langchain_core.messages import HumanMessage
-from sentence_transformers import CrossEncoder
 from langsmith import traceable
 
+from src.rag.rerank.rerank_service import get_rerank_service
+
 class RerankModel:
     def __init__(self, model_name:str):
         super().__init__()
         try:
-            self.model = CrossEncoder(model_name)
+            self.service = get_rerank_service(model_name)  # 모듈 싱글턴 (rerun 사이 모델/캐시 유지)
+            self.model = self.service.model
         except OSError:
             raise Exception("[rerank_model.py] rerank 모델 이름이 존재하지 않습니다.")
 
     @traceable(run_type="chain", name="BGE_Reranking")
     def rerank(self, query:str, retrieval_results:list[dict], top_k:int=0):
+        return self._make_human_message(self.rerank_docs(query, retrieval_results, top_k), query)
+
+    def rerank_docs(self, query:str, retrieval_results:list[dict], top_k:int=0) -> list[dict]:
+        """rerank_score 를 채워 내림차순 상위 top_k 청크 반환"""
         if retrieval_results is None:
             raise Exception("[rerank_model.py] 벡터DB에서 유사도 검색한 결과가 존재하지 않습니다.")
         if len(retrieval_results) < top_k:
             top_k = len(retrieval_results)
-        pairs = [(query, r["content"]) for r in retrieval_results]
-        scores = self.model.predict(pairs, batch_size=16)
+        scores = self.service.score(
+            query,
+            [r["content"] for r in retrieval_results],
+            [r.get("chunk_id") for r in retrieval_results],
+        )
         for r, s in zip(retrieval_results, scores):
             r["rerank_score"] = float(s)
         retrieval_results.sort(key=lambda x: x["rerank_score"], reverse=True)
-        return self._make_human_message(retrieval_results[:top_k], query)
+        return retrieval_results[:top_k]
+
+    def cache_stats(self) -> dict:
+        return self.service.stats()
 
     def _make_human_message(self, retrieval_results: list[dict], query: str) -> HumanMessage:
         context = []
@@ -40,4 +54,4 @@ class RerankModel:
 
             context.append(
                 f"[chunk:{i}] rerank_score:{rerank_score} dense_score:{dense_score} meta:{meta}\ncontent:{content}\n\n")
-        return HumanMessage(content=f"[QUESTION]:{query}\n[CONTEXT]:{context}\n[INSTRUCTIONS]:CONTEXT에 있는 내용으로만 답할것")
+        return HumanMessage(content=f"[QUESTION]:{query}\n[CONTEXT]:{''.join(context)}\n[INSTRUCTIONS]:CONTEXT에 있는 내용으로만 답할것")
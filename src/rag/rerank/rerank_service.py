@@ -0,0 +1,302 @@
+#==============================================
+# 프로그램명: rerank_service.py
+# 폴더위치: ./src/rag/rerank/rerank_service.py
+# 프로그램 설명: CrossEncoder 리랭크 공용 서비스 (점수 캐시 + 길이 정렬 배치)
+#   - 캐시 키: (모델[@max_length], 질문 해시, 청크 키)
+#     · 질문 해시: normalize_query(질문) 의 sha1 → 공백만 다른 같은 질문은 같은 키
+#     · 청크 키  : chunk_id + 본문 해시 (재처리로 본문이 바뀌면 다른 키), chunk_id 없으면 본문 해시
+#   - 1차: 메모리 LRU (RERANK_CACHE_SIZE 쌍)
+#   - 2차(선택): SQLite 디스크 캐시 (RERANK_CACHE_PATH, RERANK_CACHE_DISK=0 이면 사용 안 함) → 평가 재실행에도 재사용
+#   - 캐시에 없는 쌍만 모델로 계산, 본문 길이순 정렬 후 배치 → 배치 내 padding 최소화
+#   - 본문 전처리 (RERANK_PASSAGE_MODE)
+#     · truncate(기본): 리랭커 tokenizer 로 (max_length - 질문 - 특수토큰) 토큰까지만 잘라서 입력
+#                       → 긴 청크 전체를 매번 토크나이즈하지 않음 (앞부분 문자만 토큰화)
+#     · window : 긴 청크를 겹치는 토큰 window 로 나눠 각각 점수 → max / mean (RERANK_WINDOW_AGG)
+#                window 간 겹침 RERANK_WINDOW_OVERLAP 토큰, 청크당 최대 RERANK_MAX_WINDOWS 개
+#     · raw    : 기존 방식 (문자열 그대로, 모델 내부에서 잘림)
+#     · 본문 토큰은 청크 키(chunk_id + 본문 해시) 기준 LRU 캐시 → 같은 청크는 재토크나이즈 없음
+#     · 최대 토큰 RERANK_MAX_TOKENS (기본 512, 모델 max_length 가 더 작으면 그 값)
+#   - hit/miss 카운터 제공 (stats)
+#   - get_rerank_service(model_name, ...): 모델/설정별 모듈 단위 싱글턴 (RerankModel / SupabaseManager / 평가 스크립트 공용)
+#   - RERANKER_BACKEND: torch(기본, sentence-transformers CrossEncoder) | onnx (CPU int8, onnx_reranker.py)
+#     · 백엔드마다 점수가 조금씩 달라 캐시 키의 모델명에 백엔드 포함
+#==============================================
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from src.rag.embed.query_cache import normalize_query
+
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_CACHE_DISK = os.getenv("RERANK_CACHE_DISK", "1") == "1"
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "torch")
+RERANK_PASSAGE_MODE = os.getenv("RERANK_PASSAGE_MODE", "truncate")
+RERANK_MAX_TOKENS = int(os.getenv("RERANK_MAX_TOKENS", "512"))
+RERANK_WINDOW_OVERLAP = int(os.getenv("RERANK_WINDOW_OVERLAP", "64"))
+RERANK_MAX_WINDOWS = int(os.getenv("RERANK_MAX_WINDOWS", "4"))
+RERANK_WINDOW_AGG = os.getenv("RERANK_WINDOW_AGG", "max")
+RERANK_TOKEN_CACHE_SIZE = int(os.getenv("RERANK_TOKEN_CACHE_SIZE", "5000"))
+HEAD_CHARS_PER_TOKEN = 8  # truncate 모드: 토큰 수 * 이 값 만큼의 앞부분 문자만 토큰화 (토큰당 문자 수 상한)
+RERANK_CACHE_PATH = Path(
+    os.getenv("RERANK_CACHE_PATH")
+    or Path(__file__).resolve().parents[2] / "data" / "rerank_cache.sqlite3"
+)
+
+
+def _sha1(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def passage_key(text: str, chunk_id=None) -> str:
+    h = _sha1(text)[:16]
+    return f"{chunk_id}#{h}" if chunk_id is not None else h
+
+
+class RerankScoreDB:
+    """(model, query_hash, passage_key) -> score SQLite 저장소"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rerank_scores (
+                    model TEXT NOT NULL,
+                    query_hash TEXT NOT NULL,
+                    passage_key TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    PRIMARY KEY (model, query_hash, passage_key)
+                )
+                """
+            )
+            self._conn.commit()
+
+    def get_many(self, model: str, query_hash: str, keys: list[str]) -> dict:
+        if not keys:
+            return {}
+        out = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT passage_key, score FROM rerank_scores WHERE model = ? AND query_hash = ? "
+                    f"AND passage_key IN ({','.join('?' * len(part))})",
+                    (model, query_hash, *part),
+                ).fetchall()
+                out.update(rows)
+        return out
+
+    def put_many(self, model: str, query_hash: str, items: dict):
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rerank_scores (model, query_hash, passage_key, score) VALUES (?, ?, ?, ?)",
+                [(model, query_hash, k, s) for k, s in items.items()],
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RerankService:
+    def __init__(self, model_name: str, device: str | None = None, max_length: int | None = None,
+                 cache_size: int = RERANK_CACHE_SIZE, batch_size: int = RERANK_BATCH_SIZE,
+                 db: RerankScoreDB | None = None, model=None, backend: str = "torch",
+                 passage_mode: str = RERANK_PASSAGE_MODE, max_tokens: int = RERANK_MAX_TOKENS,
+                 window_overlap: int = RERANK_WINDOW_OVERLAP, max_windows: int = RERANK_MAX_WINDOWS,
+                 window_agg: str = RERANK_WINDOW_AGG):
+        if passage_mode not in ("truncate", "window", "raw"):
+            raise ValueError(f"[rerank_service.py] 지원하지 않는 passage_mode: {passage_mode}")
+        if window_agg not in ("max", "mean"):
+            raise ValueError(f"[rerank_service.py] 지원하지 않는 window_agg: {window_agg}")
+        if model is None and backend == "onnx":
+            from src.rag.rerank.onnx_reranker import load_onnx_reranker
+            model = load_onnx_reranker(model_name, max_length=max_length)
+            max_length = model.max_length
+        elif model is None:
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(model_name, device=device, max_length=max_length)
+        self.model = model
+        self.model_name = model_name
+        self.backend = backend
+        # max_length / 백엔드가 다르면 점수도 다름 → 디스크 캐시 키에 포함
+        self.cache_model = model_name if max_length is None else f"{model_name}@{max_length}"
+        if backend != "torch":
+            self.cache_model += f"#{backend}" + ("-int8" if getattr(model, "quantized", False) else "")
+
+        self.tokenizer = getattr(model, "tokenizer", None)
+        self.passage_mode = passage_mode if self.tokenizer is not None else "raw"
+        model_max = getattr(model, "max_length", None) or max_tokens
+        self.max_tokens = min(max_tokens, model_max)
+        self.window_overlap = window_overlap
+        self.max_windows = max(1, max_windows)
+        self.window_agg = window_agg
+        if self.passage_mode == "truncate":
+            self.cache_model += f"|head{self.max_tokens}"
+        elif self.passage_mode == "window":
+            self.cache_model += f"|win{self.max_tokens}-{window_overlap}x{self.max_windows}-{window_agg}"
+        self._tokens = OrderedDict()  # 청크 키 -> 본문 token ids (특수 토큰 제외)
+        self._tokens_lock = threading.Lock()
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.db = db
+        self._cache = OrderedDict()  # (query_hash, passage_key) -> score
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.predict_ms = 0.0
+
+    def _put_memory(self, query_hash: str, items: dict):
+        with self._lock:
+            for k, s in items.items():
+                self._cache[(query_hash, k)] = s
+                self._cache.move_to_end((query_hash, k))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _passage_tokens(self, key: str, text: str) -> list[int]:
+        with self._tokens_lock:
+            ids = self._tokens.get(key)
+            if ids is not None:
+                self._tokens.move_to_end(key)
+                return ids
+        if self.passage_mode == "truncate":
+            text = text[: self.max_tokens * HEAD_CHARS_PER_TOKEN]
+        ids = self.tokenizer(text, add_special_tokens=False)["input_ids"]
+        with self._tokens_lock:
+            self._tokens[key] = ids
+            while len(self._tokens) > RERANK_TOKEN_CACHE_SIZE:
+                self._tokens.popitem(last=False)
+        return ids
+
+    def _passage_units(self, query: str, key: str, text: str) -> list[str]:
+        """모델 입력용 본문 조각 (raw: 원문, truncate: 1개, window: 1~max_windows 개)"""
+        if self.passage_mode == "raw":
+            return [text]
+        q_len = len(self.tokenizer(query, add_special_tokens=False)["input_ids"])
+        budget = self.max_tokens - q_len - self.tokenizer.num_special_tokens_to_add(pair=True)
+        budget = max(budget, 32)
+        ids = self._passage_tokens(key, text)
+        if len(ids) <= budget:
+            return [text]
+        if self.passage_mode == "truncate":
+            return [self.tokenizer.decode(ids[:budget])]
+        stride = max(budget - self.window_overlap, 1)
+        starts = list(range(0, len(ids) - self.window_overlap, stride))[: self.max_windows]
+        return [self.tokenizer.decode(ids[s:s + budget]) for s in starts]
+
+    def score(self, query: str, passages: list[str], chunk_ids: list | None = None) -> list[float]:
+        """passages 순서대로 (query, passage) 점수 반환, 캐시에 없는 쌍만 모델 계산"""
+        if not passages:
+            return []
+        chunk_ids = chunk_ids or [None] * len(passages)
+        qh = _sha1(normalize_query(query))
+        keys = [passage_key(p, c) for p, c in zip(passages, chunk_ids)]
+
+        scores = {}
+        with self._lock:
+            for k in keys:
+                s = self._cache.get((qh, k))
+                if s is not None:
+                    self._cache.move_to_end((qh, k))
+                    scores[k] = s
+        self.hits += len(scores)
+
+        missing = [k for k in dict.fromkeys(keys) if k not in scores]
+        if missing and self.db is not None:
+            found = self.db.get_many(self.cache_model, qh, missing)
+            if found:
+                self.disk_hits += len(found)
+                scores.update(found)
+                self._put_memory(qh, found)
+                missing = [k for k in missing if k not in found]
+
+        if missing:
+            self.misses += len(missing)
+            text_of = dict(zip(keys, passages))
+            units, owner = [], []
+            for k in missing:
+                for u in self._passage_units(query, k, text_of[k]):
+                    units.append(u)
+                    owner.append(k)
+            # 길이순 정렬 → 비슷한 길이끼리 같은 배치 (padding 낭비 감소)
+            order = sorted(range(len(units)), key=lambda i: len(units[i]), reverse=True)
+            t0 = time.perf_counter()
+            pred = self.model.predict(
+                [(query, units[i]) for i in order],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            self.predict_ms += (time.perf_counter() - t0) * 1000
+
+            per_key = {}
+            for i, s in zip(order, pred):
+                per_key.setdefault(owner[i], []).append(float(s))
+            agg = max if self.window_agg == "max" else (lambda v: sum(v) / len(v))
+            new = {k: agg(v) for k, v in per_key.items()}
+            scores.update(new)
+            self._put_memory(qh, new)
+            if self.db is not None:
+                self.db.put_many(self.cache_model, qh, new)
+
+        return [scores[k] for k in keys]
+
+    def rerank(self, query: str, docs: list[dict], top_k: int | None = None,
+               text_key: str = "text", id_key: str = "chunk_id") -> list[dict]:
+        """본문이 빈 문서는 제외, rerank_score 내림차순 상위 top_k"""
+        kept = [d for d in docs if (d.get(text_key) or "").strip()]
+        scores = self.score(query, [d[text_key].strip() for d in kept], [d.get(id_key) for d in kept])
+        for d, s in zip(kept, scores):
+            d["rerank_score"] = s
+        kept.sort(key=lambda d: d["rerank_score"], reverse=True)
+        return kept[:top_k] if top_k else kept
+
+    def stats(self) -> dict:
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._cache),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+            "predict_ms": self.predict_ms,
+            "token_cache": len(self._tokens),
+        }
+
+
+_services = {}
+_services_lock = threading.Lock()
+_db = None
+
+
+def get_rerank_service(model_name: str, device: str | None = None, max_length: int | None = None,
+                       backend: str = RERANKER_BACKEND) -> RerankService:
+    """backend=onnx 면 device 는 무시 (CPU 전용)"""
+    global _db
+    if backend == "onnx":
+        device = None
+    key = (model_name, device, max_length, backend)
+    with _services_lock:
+        svc = _services.get(key)
+        if svc is None:
+            if RERANK_CACHE_DISK and _db is None:
+                _db = RerankScoreDB(RERANK_CACHE_PATH)
+            svc = RerankService(model_name, device=device, max_length=max_length,
+                                db=_db if RERANK_CACHE_DISK else None, backend=backend)
+            _services[key] = svc
+        return svc
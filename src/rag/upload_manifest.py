@@ -0,0 +1,61 @@
+#==============================================
+# 프로그램명: upload_manifest.py
+# 폴더위치: ./src/rag/upload_manifest.py
+# 프로그램 설명: 청크 업로드 버전 매니페스트 (답변 캐시 무효화용, JSON 파일)
+#   - 형식: {"version": 전체 업로드 횟수, "epoch": 전체 재구축 횟수, "projects": {사업명: 마지막 업로드 version}, "updated_at"}
+#   - 쓰기: upload_chunks_final.py (upsert 된 사업명) → bump_versions(projects)
+#           build_local_index.py (로컬 인덱스 재구축)  → bump_versions(full=True)
+#   - 읽기: answer_cache.py → scope_version(manifest, filters)
+#     · project_name 필터 : (epoch, 해당 사업 version) → 다른 사업 업로드로는 무효화되지 않음
+#     · 그 외(전체/카테고리) : (epoch, 전체 version)     → 어떤 업로드든 무효화
+#   - 파일 교체는 임시 파일 + os.replace (읽는 쪽이 쓰다 만 파일을 보지 않음)
+#==============================================
+
+import json
+import os
+import time
+from pathlib import Path
+
+UPLOAD_MANIFEST_PATH = Path(
+    os.getenv("UPLOAD_MANIFEST_PATH")
+    or Path(__file__).resolve().parents[1] / "data" / "upload_manifest.json"
+)
+
+
+def empty_manifest() -> dict:
+    return {"version": 0, "epoch": 0, "projects": {}, "updated_at": None}
+
+
+def load_manifest(path: str | Path = UPLOAD_MANIFEST_PATH) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {**empty_manifest(), **json.load(f)}
+    except (OSError, ValueError):
+        return empty_manifest()
+
+
+def bump_versions(projects=(), full: bool = False, path: str | Path = UPLOAD_MANIFEST_PATH) -> dict:
+    """업로드 후 호출: 전체 version +1, 업로드된 사업들은 그 version 으로 기록 (full=True 면 epoch +1)"""
+    path = Path(path)
+    manifest = load_manifest(path)
+    manifest["version"] += 1
+    if full:
+        manifest["epoch"] += 1
+    for name in projects:
+        if name:
+            manifest["projects"][str(name)] = manifest["version"]
+    manifest["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return manifest
+
+
+def scope_version(manifest: dict, filters: dict | None) -> tuple:
+    project = (filters or {}).get("project_name")
+    if project:
+        return manifest["epoch"], manifest["projects"].get(str(project), 0)
+    return manifest["epoch"], manifest["version"]
@@ -0,0 +1,189 @@
+#==================================================================
+# 프로그램명: bm25_index.py
+# 폴더 위치    : src/retrieval/bm25_index.py
+# 프로그램 설명: 로컬 BM25 역색인 (match_documents_chunks_*_bm25_ngram RPC 대체)
+#             - 색인어: 한글/영문 문자 bigram (make_ngram(text, 2)와 같은 방식) + Kiwi 명사("n:" 접두어)
+#             - 점수: BM25 (k1=1.2, b=0.75), idf = ln(1 + (N - df + 0.5) / (df + 0.5))
+#             - postings: 색인어별 CSR 배열 (문서 id는 delta 인코딩, uint16/uint32 중 작은 쪽), tf는 uint16
+#             - 질의: 색인어별 postings 복원(cumsum) → np.bincount 누적 → argpartition 상위 k
+#             - 반환: RPC 와 같은 레코드 형태 (레코드 컬럼 + score)
+#             - 메타데이터 필터: 로컬 벡터 인덱스의 filter_rows 결과(rows)로 후보 제한
+#             - 저장 위치: 로컬 인덱스 디렉터리(local_index.py)의 bm25/ (records.jsonl 공용)
+#               빌드: python -m src.vectorstore.build_local_index (기본으로 함께 생성)
+#==================================================================
+
+import json
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+NOUN_PREFIX = "n:"
+
+_word_re = re.compile(r"[0-9A-Za-z가-힣]+")
+
+
+def char_bigrams(text: str) -> list[str]:
+    """공백/기호로 나눈 단어별 문자 bigram (1글자 단어는 그대로)"""
+    out = []
+    for w in _word_re.findall((text or "").lower()):
+        if len(w) == 1:
+            out.append(w)
+        else:
+            out.extend(w[i:i + 2] for i in range(len(w) - 1))
+    return out
+
+
+def doc_terms(text: str, nouns: list[str] | None = None) -> list[str]:
+    return char_bigrams(text) + [NOUN_PREFIX + n.lower() for n in (nouns or [])]
+
+
+class BM25Index:
+    def __init__(self, vocab: dict, offsets: np.ndarray, doc_deltas: np.ndarray, tfs: np.ndarray,
+                 doc_len: np.ndarray, records: list[dict] | None = None, k1: float = BM25_K1, b: float = BM25_B):
+        self.vocab = vocab            # 색인어 -> term id
+        self.offsets = offsets        # (V + 1,) int64
+        self.doc_deltas = doc_deltas  # (P,) 색인어 구간마다 첫 값은 문서 id, 이후는 차이
+        self.tfs = tfs                # (P,) uint16
+        self.doc_len = doc_len        # (N,) float32
+        self.records = records or []
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(doc_len)
+        avgdl = float(doc_len.mean()) if self.n_docs else 1.0
+        df = np.diff(offsets).astype(np.float64)
+        self.idf = np.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self.norm = (k1 * (1.0 - b + b * doc_len / max(avgdl, 1e-9))).astype(np.float32)
+
+    # -----------------------------
+    # 빌드 / 저장 / 로드
+    # -----------------------------
+    @classmethod
+    def build(cls, records: list[dict], nouns_per_doc=None, text_of=lambda r: r.get("text") or ""):
+        """
+        records    : 로컬 인덱스 레코드 (순서 = 문서 id)
+        nouns_per_doc: 레코드별 명사 리스트 iterable (None 이면 bigram 만 색인)
+        """
+        nouns_iter = iter(nouns_per_doc) if nouns_per_doc is not None else None
+        vocab = {}
+        term_ids, doc_ids, tf_vals = [], [], []
+        doc_len = np.zeros(len(records), dtype=np.float32)
+
+        for d, r in enumerate(records):
+            nouns = next(nouns_iter) if nouns_iter is not None else None
+            counts = Counter(doc_terms(text_of(r), nouns))
+            doc_len[d] = sum(counts.values())
+            term_ids.append(np.fromiter((vocab.setdefault(t, len(vocab)) for t in counts), dtype=np.int32, count=len(counts)))
+            tf_vals.append(np.fromiter(counts.values(), dtype=np.int64, count=len(counts)))
+            doc_ids.append(np.full(len(counts), d, dtype=np.int32))
+
+        term_ids = np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int32)
+        doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32)
+        tf_vals = np.concatenate(tf_vals) if tf_vals else np.zeros(0, dtype=np.int64)
+
+        # 색인어 순 정렬 (같은 색인어 안에서는 문서 id 오름차순 유지)
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, tf_vals = term_ids[order], doc_ids[order], tf_vals[order]
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(vocab)))]).astype(np.int64)
+
+        # delta 인코딩: 색인어 구간의 첫 값은 문서 id 그대로
+        deltas = np.diff(doc_ids.astype(np.int64), prepend=0)
+        firsts = offsets[:-1][np.diff(offsets) > 0]
+        deltas[firsts] = doc_ids[firsts]
+        delta_dtype = np.uint16 if len(deltas) == 0 or deltas.max() <= np.iinfo(np.uint16).max else np.uint32
+        tfs = np.minimum(tf_vals, np.iinfo(np.uint16).max).astype(np.uint16)
+
+        return cls(vocab, offsets, deltas.astype(delta_dtype), tfs, doc_len, records)
+
+    def save(self, out_dir: str | Path):
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        np.savez(out_dir / "postings.npz", offsets=self.offsets, doc_deltas=self.doc_deltas,
+                 tfs=self.tfs, doc_len=self.doc_len)
+        terms = [None] * len(self.vocab)
+        for t, i in self.vocab.items():
+            terms[i] = t
+        with open(out_dir / "vocab.json", "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": terms}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, out_dir: str | Path, records: list[dict] | None = None):
+        out_dir = Path(out_dir)
+        if not (out_dir / "postings.npz").exists():
+            raise FileNotFoundError(f"[bm25_index.py] BM25 인덱스 없음: {out_dir} (build_local_index 먼저 실행)")
+        p = np.load(out_dir / "postings.npz")
+        with open(out_dir / "vocab.json", "r", encoding="utf-8") as f:
+            v = json.load(f)
+        if records is None:
+            with open(out_dir.parent / "records.jsonl", "r", encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        vocab = {t: i for i, t in enumerate(v["terms"])}
+        return cls(vocab, p["offsets"], p["doc_deltas"], p["tfs"], p["doc_len"], records, v["k1"], v["b"])
+
+    def __len__(self):
+        return self.n_docs
+
+    # -----------------------------
+    # 검색
+    # -----------------------------
+    def postings(self, term_id: int):
+        s, e = self.offsets[term_id], self.offsets[term_id + 1]
+        docs = np.cumsum(self.doc_deltas[s:e], dtype=np.int64)
+        return docs, self.tfs[s:e]
+
+    def score(self, terms: list[str]) -> np.ndarray:
+        """질의 색인어 -> 문서별 BM25 점수 (N,)"""
+        q = Counter(t for t in terms if t in self.vocab)
+        if not q:
+            return np.zeros(self.n_docs, dtype=np.float32)
+        all_docs, all_w = [], []
+        for t, qtf in q.items():
+            tid = self.vocab[t]
+            docs, tf = self.postings(tid)
+            tf = tf.astype(np.float32)
+            all_docs.append(docs)
+            all_w.append(qtf * self.idf[tid] * tf * (self.k1 + 1.0) / (tf + self.norm[docs]))
+        return np.bincount(np.concatenate(all_docs), weights=np.concatenate(all_w), minlength=self.n_docs)
+
+    def search(self, query: str, top_k: int = 20, nouns: list[str] | None = None,
+               rows: np.ndarray | None = None) -> list[dict]:
+        """
+        query : 질의 문자열 (bigram 색인어 생성)
+        nouns : 질의 명사 (있으면 명사 색인어도 사용)
+        rows  : 후보 문서 id 제한 (로컬 벡터 인덱스 filter_rows 결과, 레코드 순서 공유)
+        """
+        scores = self.score(doc_terms(query, nouns))
+        if rows is not None:
+            cand = rows[scores[rows] > 0]
+        else:
+            cand = np.flatnonzero(scores > 0)
+        if len(cand) == 0:
+            return []
+        if len(cand) > top_k:
+            cand = cand[np.argpartition(-scores[cand], top_k - 1)[:top_k]]
+        cand = cand[np.argsort(-scores[cand], kind="stable")]
+        return [{**self.records[i], "score": float(scores[i])} for i in cand]
+
+
+_bm25 = None
+_bm25_lock = threading.Lock()
+
+
+def get_bm25_index() -> BM25Index:
+    """로컬 인덱스 디렉터리의 bm25/ 를 프로세스당 1회 로드 (로컬 벡터 인덱스 레코드 공유)"""
+    global _bm25
+    with _bm25_lock:
+        if _bm25 is None:
+            from src.rag.local_index import DEFAULT_INDEX_DIR, get_retrieval_backend
+
+            index_dir = Path(os.getenv("LOCAL_INDEX_DIR") or DEFAULT_INDEX_DIR)
+            records = None
+            if os.getenv("RAG_BACKEND", "supabase") == "local":
+                records = get_retrieval_backend().records
+            _bm25 = BM25Index.load(index_dir / "bm25", records)
+        return _bm25
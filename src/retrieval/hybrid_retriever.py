@@ -0,0 +1,155 @@
+#==================================================================
+# 프로그램명: hybrid_retriever.py
+# 폴더 위치    : src/retrieval/hybrid_retriever.py
+# 프로그램 설명: Vector + BM25 하이브리드 검색 (app.py / 평가 스크립트 공용)
+#             - 두 검색을 스레드 풀에서 동시에 실행 → 지연 = max(vector, bm25) + fusion
+#             - 결합 방식 (HYBRID_FUSION)
+#               · rrf      : sum(w / (HYBRID_RRF_K + rank))  (기본, 점수 스케일 무관)
+#               · weighted : 검색기별 점수 min-max 정규화 후 가중합 (HYBRID_VECTOR_WEIGHT, bm25 = 1 - w)
+#             - 반환 문서: 원본 레코드 + source, vector_score/rank, bm25_score/rank, hybrid_score
+#               · score 는 처음 찾은 검색기의 원 점수 (vector 에도 있으면 vector 유사도, BM25 단독이면 BM25 점수)
+#                 검색기 구분은 vector_score / bm25_score, 융합 순위는 hybrid_score
+#             - timings: vector_ms, bm25_ms, fusion_ms, total_ms
+#             - BM25 실패(timeout 등)는 경고 후 vector 결과만 사용, vector 실패는 예외 전달
+#             - 검색 함수 시그니처: fn(query, top_k, filters) -> list[dict]
+#               · make_vector_search(embedding_model) : EmbeddingModel.search 래핑
+#               · make_bm25_search(backend)           : 로컬 BM25(bm25_index.py) 또는 BM25 RPC
+#                 (RPC 는 RAG_CHUNKS_TABLE 기준 → vector 와 chunk_id 가 같은 테이블이어야 융합 가능)
+#                 (메타데이터 필터는 vector RPC 와 같은 인자로 RPC 안에서 적용, filters.to_rpc_params)
+#             - 검색기별 후보 수: search(candidate_k=...) 지정값, 없으면 max(top_k, HYBRID_CANDIDATE_K)
+#==================================================================
+
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.rag.chunk_table import rpc_name
+from src.rag.filters import normalize_filters, to_rpc_params
+from src.retrieval.korean_tokenizer import extract_nouns
+
+HYBRID_FUSION = os.getenv("HYBRID_FUSION", "rrf")
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "0.5"))
+HYBRID_CANDIDATE_K = int(os.getenv("HYBRID_CANDIDATE_K", "20"))  # 검색기별 후보 수
+BM25_RPC = os.getenv("BM25_RPC") or rpc_name("bm25_ngram")  # vector RPC(db.py)와 같은 테이블 (chunk_table.py)
+
+# 프로세스 공용 스레드 풀 (질의마다 생성하지 않음)
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("HYBRID_WORKERS", "8")), thread_name_prefix="hybrid")
+
+
+def fuse(results: dict, method: str = "rrf", rrf_k: int = HYBRID_RRF_K, weights: dict | None = None) -> list[dict]:
+    """
+    results : {검색기 이름: 점수 내림차순 문서 리스트}
+    반환    : chunk_id 기준 병합, hybrid_score 내림차순
+    """
+    if method not in ("rrf", "weighted"):
+        raise ValueError(f"[hybrid_retriever.py] 지원하지 않는 fusion: {method}")
+    weights = weights or {}
+    merged, fused = {}, {}
+
+    for name, docs in results.items():
+        w = weights.get(name, 1.0)
+        scores = [float(d.get("score") or 0.0) for d in docs]
+        lo, hi = min(scores, default=0.0), max(scores, default=0.0)
+
+        for rank, (d, s) in enumerate(zip(docs, scores), start=1):
+            key = str(d["chunk_id"])
+            if method == "rrf":
+                contrib = w / (rrf_k + rank)
+            else:
+                contrib = w * ((s - lo) / (hi - lo) if hi > lo else 1.0)
+
+            doc = merged.get(key)
+            if doc is None:
+                doc = merged[key] = {**d, "sources": []}
+            doc["sources"].append(name)
+            doc[f"{name}_score"] = s
+            doc[f"{name}_rank"] = rank
+            fused[key] = fused.get(key, 0.0) + contrib
+
+    out = []
+    for key, doc in merged.items():
+        srcs = doc.pop("sources")
+        doc["source"] = srcs[0] if len(srcs) == 1 else f"hybrid({'+'.join(srcs)})"
+        doc["hybrid_score"] = fused[key]
+        out.append(doc)
+    out.sort(key=lambda d: d["hybrid_score"], reverse=True)
+    return out
+
+
+class HybridRetriever:
+    def __init__(self, vector_fn, bm25_fn, fusion: str = HYBRID_FUSION, rrf_k: int = HYBRID_RRF_K,
+                 vector_weight: float = HYBRID_VECTOR_WEIGHT, candidate_k: int = HYBRID_CANDIDATE_K):
+        self.fns = {"vector": vector_fn, "bm25": bm25_fn}
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.weights = {"vector": vector_weight, "bm25": 1.0 - vector_weight}
+        self.candidate_k = candidate_k
+
+    @staticmethod
+    def _timed(fn, query, top_k, filters):
+        t0 = time.perf_counter()
+        docs = fn(query, top_k, filters)
+        return docs or [], (time.perf_counter() - t0) * 1000
+
+    def search(self, query: str, top_k: int = 20, filters: dict | None = None,
+               candidate_k: int | None = None) -> tuple[list[dict], dict]:
+        """반환: (융합 상위 top_k 문서, 단계별 시간 ms), candidate_k: 검색기별 후보 수"""
+        t0 = time.perf_counter()
+        candidate_k = candidate_k or max(top_k, self.candidate_k)
+        # contextvars 복사: LangSmith 추적(@traceable) 부모 run 을 작업 스레드에서도 유지
+        futures = {
+            name: _executor.submit(contextvars.copy_context().run, self._timed, fn, query, candidate_k, filters)
+            for name, fn in self.fns.items()
+        }
+
+        results, timings = {}, {}
+        for name, fut in futures.items():
+            try:
+                results[name], timings[f"{name}_ms"] = fut.result()
+            except Exception as e:
+                if name == "vector":
+                    raise
+                print(f"⚠️ {name} 검색 실패 → vector 결과만 사용: {e!r}")
+                results[name], timings[f"{name}_ms"] = [], None
+
+        t1 = time.perf_counter()
+        docs = fuse(results, self.fusion, self.rrf_k, self.weights)[:top_k]
+        timings["fusion_ms"] = (time.perf_counter() - t1) * 1000
+        timings["total_ms"] = (time.perf_counter() - t0) * 1000
+        return docs, timings
+
+
+# -----------------------------
+# 검색 함수 (fn(query, top_k, filters))
+# -----------------------------
+def make_vector_search(embedding_model, threshold: float = 0.3):
+    def vector_search(query, top_k, filters):
+        return embedding_model.search(query=query, result_count=top_k, threshold=threshold, filters=filters)
+    return vector_search
+
+
+def make_bm25_search(backend, rpc_name: str = BM25_RPC):
+    """
+    backend: get_retrieval_backend() 결과
+      - LocalVectorIndex → 로컬 BM25 역색인 (필터는 filter_rows 로 후보 제한)
+      - Supabase         → BM25 RPC (필터는 RPC 인자로 전달)
+    """
+    from src.rag.local_index import LocalVectorIndex
+
+    def bm25_search(query, top_k, filters):
+        nouns = extract_nouns(query)
+        if not nouns:
+            return []
+        noun_query = " ".join(nouns)
+        f = normalize_filters(filters)
+
+        if isinstance(backend, LocalVectorIndex):
+            from src.retrieval.bm25_index import get_bm25_index
+            return get_bm25_index().search(noun_query, top_k, nouns=nouns, rows=backend.filter_rows(f))
+
+        params = {"query": noun_query, "match_count": top_k, **to_rpc_params(f)}
+        return backend.client.rpc(rpc_name, params).execute().data or []
+
+    return bm25_search
@@ -0,0 +1,106 @@
+#==================================================================
+# 프로그램명: korean_tokenizer.py
+# 폴더 위치    : src/retrieval/korean_tokenizer.py
+# 프로그램 설명: Kiwi 형태소 분석기 공용 서비스 (BM25 질의 / 로컬 BM25 색인 공용)
+#             - Kiwi() 는 첫 사용 시 1회만 생성 (import 시 생성하지 않음), warmup() 으로 미리 로드 가능
+#             - 명사 기준: 품사 NN* (NNG, NNP, NNB 등), 2글자 이상
+#             - nouns(text)       : 질의 명사 추출, LRU 캐시 (KIWI_NOUN_CACHE_SIZE, 기본 4096)
+#             - nouns_batch(texts): 문서 배치 명사 추출 (Kiwi 내부 멀티스레드, KIWI_NUM_WORKERS), 캐시 미사용
+#             - 사용처: hybrid_retriever.py, evaluate_goldendataset_*.py, build_local_index.py
+#==================================================================
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+KIWI_NUM_WORKERS = int(os.getenv("KIWI_NUM_WORKERS", "-1"))  # -1: 사용 가능한 모든 코어, 0: 단일 스레드
+KIWI_NOUN_CACHE_SIZE = int(os.getenv("KIWI_NOUN_CACHE_SIZE", "4096"))
+WARMUP_TEXT = "2025년 공공기관 정보시스템 구축 사업 입찰 공고의 제안요청서를 분석합니다."
+
+
+def _is_noun(token) -> bool:
+    return token.tag.startswith("NN") and len(token.form) > 1
+
+
+class KoreanTokenizer:
+    def __init__(self, num_workers: int = KIWI_NUM_WORKERS, cache_size: int = KIWI_NOUN_CACHE_SIZE):
+        self.num_workers = num_workers
+        self.cache_size = cache_size
+        self._kiwi = None
+        self._init_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def kiwi(self):
+        if self._kiwi is None:
+            with self._init_lock:
+                if self._kiwi is None:
+                    from kiwipiepy import Kiwi
+                    self._kiwi = Kiwi(num_workers=self.num_workers)
+        return self._kiwi
+
+    def warmup(self) -> float:
+        """모델 로드 + 첫 분석까지 수행, 소요 시간(초) 반환 (이미 로드됐으면 거의 0)"""
+        t0 = time.perf_counter()
+        self.kiwi.tokenize(WARMUP_TEXT)
+        return time.perf_counter() - t0
+
+    def nouns(self, text: str) -> list[str]:
+        if not text:
+            return []
+        with self._cache_lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return list(cached)
+            self.misses += 1
+
+        nouns = tuple(t.form for t in self.kiwi.tokenize(text) if _is_noun(t))
+        with self._cache_lock:
+            self._cache[text] = nouns
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return list(nouns)
+
+    def noun_query(self, text: str) -> str:
+        """BM25 n-gram 질의 문자열 (명사 공백 연결)"""
+        return " ".join(self.nouns(text))
+
+    def nouns_batch(self, texts):
+        """
+        texts 순서대로 명사 리스트를 yield (Kiwi 가 num_workers 스레드로 병렬 분석)
+        - 색인용 대량 문서는 캐시에 넣지 않음
+        """
+        for tokens in self.kiwi.tokenize(t or "" for t in texts):
+            yield [t.form for t in tokens if _is_noun(t)]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "loaded": self._kiwi is not None,
+        }
+
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer() -> KoreanTokenizer:
+    global _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            _tokenizer = KoreanTokenizer()
+        return _tokenizer
+
+
+def extract_nouns(text: str) -> list[str]:
+    return get_tokenizer().nouns(text)
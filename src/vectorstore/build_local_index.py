@@ -0,0 +1,134 @@
+#==================================================================
+# 프로그램명: build_local_index.py
+# 폴더 위치    : src/vectorstore/build_local_index.py
+# 프로그램 설명: 청크 JSONL + 임베딩 저장소로 로컬 벡터 인덱스(src/rag/local_index.py) 생성
+#             - 입력: upload_chunks_final.py 와 같은 chunks_all_pdfs_final.jsonl / final_classification_hierarchy.csv
+#             - 임베딩: embedding_store.py 에서 (모델, embedding 입력 해시)로 조회
+#               · upload_chunks_final.py 를 한 번 돌렸다면 OpenAI 호출 없이 생성됨
+#               · 저장소에 없는 청크는 건너뜀 (--embed-missing 지정 시 OpenAI로 임베딩)
+#             - 레코드: DB upsert 행과 같은 컬럼(embedding / ngram_text 제외), 파일 단위로 연속 배치
+#             - --nlist : IVF(근사 검색) 리스트 수 (0이면 exact 전용, 기본 sqrt(N))
+#             - 같은 레코드로 로컬 BM25 역색인(src/retrieval/bm25_index.py, 문자 bigram + Kiwi 명사)도 생성 (--no-bm25 로 생략)
+#               · 명사 추출은 korean_tokenizer.py 배치 모드 (질의 쪽과 같은 분석기/기준)
+#             - 빌드 후 exact / ivf 검색 지연과 ivf recall@10 을 간단히 출력
+#             - 저장 후 업로드 매니페스트 epoch 증가 (src/rag/upload_manifest.py, 앱 답변 캐시 전체 무효화)
+#             - 실행방법: python -m src.vectorstore.build_local_index [--out 디렉터리] [--embed-missing]
+#             - 실행결과: LOCAL_INDEX_DIR (기본 src/data/local_index) 에 인덱스 파일 저장
+#==================================================================
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+
+from src.processing import upload_chunks_final as up
+from src.processing.embedding_batch import EMBED_MODEL, iter_token_batches
+from src.rag.embed.embedding_store import get_embedding_store
+from src.rag.local_index import DEFAULT_INDEX_DIR, LocalVectorIndex
+from src.rag.upload_manifest import bump_versions
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.korean_tokenizer import get_tokenizer
+
+
+def iter_index_jobs(chunks_path: Path, csv_path: Path):
+    stem_map, loose_map = up.build_csv_meta_map(csv_path)
+    chunks = up.iter_sorted_by_file(up.iter_chunks(chunks_path))
+    yield from up.iter_upload_jobs(chunks, stem_map, loose_map, set())
+
+
+def build_record(chunk: dict, csv_meta: dict | None) -> dict:
+    row = up.build_db_row(chunk, csv_meta, None)
+    row.pop("embedding", None)
+    row.pop("ngram_text", None)  # 로컬 BM25 는 bm25_index 에서 직접 색인
+    return row
+
+
+def collect(chunks_path: Path, csv_path: Path, embed_missing: bool):
+    store = get_embedding_store()
+    records, blocks = [], []
+    skipped = 0
+
+    jobs = iter_index_jobs(chunks_path, csv_path)
+    for batch in tqdm(iter_token_batches(jobs, text_of=lambda j: j[2]), desc="Collecting", unit="batch"):
+        inputs = [emb_input for _, _, emb_input in batch]
+        if embed_missing:
+            vecs = up.embed_texts_batch(inputs)
+        else:
+            vecs = store.get_many(EMBED_MODEL, inputs)
+
+        keep = [(job, v) for job, v in zip(batch, vecs) if v is not None]
+        skipped += len(batch) - len(keep)
+        if not keep:
+            continue
+        records.extend(build_record(chunk, csv_meta) for (chunk, csv_meta, _), _ in keep)
+        blocks.append(np.asarray([v for _, v in keep], dtype=np.float32))
+
+    vectors = np.vstack(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+    return records, vectors, skipped
+
+
+def build_bm25(index: LocalVectorIndex, out_dir: Path):
+    t0 = time.perf_counter()
+    texts = (r.get("text") or "" for r in index.records)
+    nouns = tqdm(get_tokenizer().nouns_batch(texts), total=len(index.records), desc="BM25", unit="chunk")
+    bm25 = BM25Index.build(index.records, nouns)
+    bm25.save(out_dir / "bm25")
+    print(f"bm25 built: {len(bm25.vocab)} terms, {len(bm25.tfs)} postings ({time.perf_counter() - t0:.1f}s)")
+    return bm25
+
+
+def quick_bench(index: LocalVectorIndex, n_queries: int = 50, k: int = 10, seed: int = 0):
+    if len(index) == 0:
+        return
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(index), min(n_queries, len(index)), replace=False)
+    queries = index.vectors[rows] + rng.normal(0, 0.02, (len(rows), index.vectors.shape[1])).astype(np.float32)
+
+    def run(mode):
+        t0 = time.perf_counter()
+        out = [index.query(q, k, match_threshold=-1.0, mode=mode) for q in queries]
+        return (time.perf_counter() - t0) / len(queries) * 1000, out
+
+    exact_ms, exact = run("exact")
+    print(f"exact: {exact_ms:.3f} ms/query")
+    if index.centroids is not None:
+        ivf_ms, ivf = run("ivf")
+        recall = np.mean([
+            len({r["chunk_id"] for r in a} & {r["chunk_id"] for r in b}) / max(len(a), 1)
+            for a, b in zip(exact, ivf)
+        ])
+        print(f"ivf  : {ivf_ms:.3f} ms/query (nlist={index.meta.get('nlist')}, recall@{k}={recall:.3f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 벡터 인덱스 생성")
+    parser.add_argument("--chunks", type=Path, default=up.CHUNKS_JSON_PATH)
+    parser.add_argument("--csv", type=Path, default=up.CSV_PATH)
+    parser.add_argument("--out", type=Path, default=Path(os.getenv("LOCAL_INDEX_DIR") or DEFAULT_INDEX_DIR))
+    parser.add_argument("--nlist", type=int, default=None, help="IVF 리스트 수 (0: IVF 생략)")
+    parser.add_argument("--embed-missing", action="store_true", help="저장소에 없는 청크는 OpenAI로 임베딩")
+    parser.add_argument("--no-bm25", action="store_true", help="BM25 역색인 생략")
+    args = parser.parse_args()
+
+    records, vectors, skipped = collect(args.chunks, args.csv, args.embed_missing)
+    print("records:", len(records), "skipped(no embedding):", skipped)
+
+    index = LocalVectorIndex.build(records, vectors, model=EMBED_MODEL)
+    if args.nlist != 0 and len(index):
+        t0 = time.perf_counter()
+        index.build_ivf(args.nlist)
+        print(f"ivf built: nlist={index.meta['nlist']} ({time.perf_counter() - t0:.1f}s)")
+
+    index.save(args.out)
+    if not args.no_bm25:
+        build_bm25(index, args.out)
+    print("saved:", args.out)
+    print("upload manifest epoch:", bump_versions(full=True)["epoch"])
+    quick_bench(index)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,8 @@ from openai import OpenAI
 import os
 from pathlib import Path
 
+from src.rag.embed.embedding_store import get_embedding_store
+
 # -----------------------------------
 # 1. 프로젝트 루트 기준으로 .env 로드
 # -----------------------------------
@@ -42,14 +44,19 @@ supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
 # -----------------------------------
-# 4. embedding 함수
+# 4. embedding 함수 (임베딩 저장소에 있으면 재사용)
 # -----------------------------------
-def embed_text(text: str) -> list[float]:
+EMBED_MODEL = "text-embedding-3-small"
+
+def _embed_openai(texts: list[str]) -> list[list[float]]:
     response = openai_client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
+        model=EMBED_MODEL,
+        input=texts
     )
-    return response.data[0].embedding
+    return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+def embed_text(text: str) -> list[float]:
+    return get_embedding_store().get_or_embed(EMBED_MODEL, [text], _embed_openai)[0]
 
 # -----------------------------------
 # 5. insert 대상 데이터